@@ -1,12 +1,94 @@
 import logging
 # Copyright (c) 2025 Rex Ackermann. All rights reserved.
 # Licensed under the MIT License.
+import asyncio
 import subprocess
-from typing import Optional, List
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, List, Dict, AsyncIterator, Iterator
 from config import cfg
+from device_caps import PROBE_SCRIPT, parse_probe, shared_capability_cache
+from file_sync import DirectorySync
+from pointer_injector import PointerInjector
+from logcat import LogEntry, LogFilter, LogRingBuffer, parse_line
+from screen_capture import ScreenFrame, FrameStream, parse_raw, parse_png_size, frame_to_png
 
 logger = logging.getLogger(__name__)
 
+def parse_track_devices(stream) -> Iterator[Dict[str, str]]:
+    """
+    Yield serial -> state maps from an `adb track-devices` byte stream.
+    Each update is a 4-hex-digit length followed by "serial\tstate\n" lines.
+    """
+    while True:
+        length = stream.read(4)
+        if len(length) < 4:
+            return
+        try:
+            payload = stream.read(int(length, 16)).decode(errors="replace")
+        except ValueError:
+            return
+        states = {}
+        for line in payload.splitlines():
+            serial, _, state = line.partition("\t")
+            if serial:
+                states[serial] = state.strip()
+        yield states
+
+class DeviceTracker:
+    """
+    Follows `adb track-devices` in a background thread and keeps the
+    current transport state (device/offline/unauthorized) per serial.
+    """
+
+    def __init__(self, adb_path: str):
+        self.adb_path = adb_path
+        self.states: Dict[str, str] = {}
+        self._process: Optional[subprocess.Popen] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()  # Concurrent first connects must not spawn two trackers
+        self.disabled = False  # Set after a failed start (e.g. adb missing); connects then skip tracking
+
+    def start(self):
+        with self._start_lock:
+            if self.disabled or (self._thread and self._thread.is_alive()):
+                return
+            try:
+                self._process = subprocess.Popen(
+                    [self.adb_path, "track-devices"],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL
+                )
+            except Exception as e:
+                logger.error(f"Failed to start adb track-devices, transport tracking disabled: {e}")
+                self.disabled = True
+                return
+            self._thread = threading.Thread(target=self._read_loop, args=(self._process.stdout,),
+                                            name="adb-track-devices", daemon=True)
+            self._thread.start()
+
+    def _read_loop(self, stream):
+        for states in parse_track_devices(stream):
+            with self._lock:
+                self.states = states
+        with self._lock:
+            self.states = {}
+
+    def is_running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def state(self, serial: str) -> Optional[str]:
+        with self._lock:
+            return self.states.get(serial)
+
+    def stop(self):
+        if self._process:
+            self._process.terminate()
+            self._process = None
+
 class ADBController:
     """
     Optional ADB controller for advanced features like Screen Mirroring,
@@ -17,8 +99,26 @@ class ADBController:
         self.adb_path = cfg.get("adb_path", "adb")
         self.connected_device_ip: Optional[str] = None
         self._shell_process: Optional[subprocess.Popen] = None
+        # Connects finish on worker threads while input is sent from the UI thread
+        self._shell_lock = threading.RLock()
+        # PNG encoding of raw captures happens here, never on the UI thread
+        self._encode_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="adb-encode")
+        self.last_capture_stats: Optional[dict] = None
+        self.caps_cache = shared_capability_cache()
+        self._fingerprint_checked = set()  # Addresses whose cached build was confirmed this connection
+        self.log_buffer = LogRingBuffer(cfg.get("logcat", {}).get("buffer_size", 5000))
+
+        # Transport state tracking / connect de-duplication
+        self.tracker = DeviceTracker(self.adb_path)
+        self._connect_lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._connect_latency = 0.0  # Seconds, EWMA of real `adb connect` calls
+        self.connect_stats = {"calls": 0, "spawned": 0, "avoided": 0, "shared": 0, "saved_seconds": 0.0}
+
+    def _serial(self) -> str:
+        return f"{self.connected_device_ip}:5555"
     
-    def _run_command(self, cmd_args: List[str]) -> tuple[bool, str]:
+    def _run_command(self, cmd_args: List[str], timeout: float = 10) -> tuple[bool, str]:
         """Run an ADB command."""
         try:
             full_cmd = [self.adb_path] + cmd_args
@@ -26,7 +126,7 @@ class ADBController:
                 full_cmd, 
                 capture_output=True, 
                 text=True, 
-                timeout=10
+                timeout=timeout
             )
             return result.returncode == 0, result.stdout.strip()
         except FileNotFoundError:
@@ -36,51 +136,141 @@ class ADBController:
             logger.error(f"ADB command failed: {e}")
             return False, str(e)
 
+    def _run_binary(self, cmd_args: List[str], timeout: float = 10) -> tuple[bool, bytes]:
+        """Run an ADB command and return its raw stdout bytes."""
+        try:
+            result = subprocess.run(
+                [self.adb_path] + cmd_args,
+                capture_output=True,
+                timeout=timeout
+            )
+            return result.returncode == 0, result.stdout
+        except FileNotFoundError:
+            logger.error("ADB binary not found")
+            return False, b""
+        except Exception as e:
+            logger.error(f"ADB command failed: {e}")
+            return False, b""
+
     def connect(self, ip_address: str) -> bool:
-        """Connect to device via ADB TCP/IP."""
+        """
+        Connect to device via ADB TCP/IP.
+        Returns immediately if the transport is already attached; concurrent
+        callers for the same device share a single in-flight connect.
+        The device becomes the target of all ADB features.
+        """
+        connected = self._connect_future(ip_address).result()
+        if connected:
+            self._set_connected(ip_address)
+        return connected
+
+    async def async_connect(self, ip_address: str) -> bool:
+        """Non-blocking connect for use from the event loop."""
+        connected = await asyncio.wrap_future(self._connect_future(ip_address))
+        if connected:
+            self._set_connected(ip_address)
+        return connected
+
+    def attach(self, ip_address: str) -> bool:
+        """
+        `adb connect` only: make sure a transport to the device exists
+        without making it the active device (used for pre-warming).
+        """
+        return self._connect_future(ip_address).result()
+
+    def _connect_future(self, ip_address: str) -> Future:
+        serial = f"{ip_address}:5555"
+        self.tracker.start()
+
+        with self._connect_lock:
+            self.connect_stats["calls"] += 1
+
+            if self.tracker.is_running() and self.tracker.state(serial) == "device":
+                self.connect_stats["avoided"] += 1
+                self.connect_stats["saved_seconds"] += self._connect_latency
+                done = Future()
+                done.set_result(True)
+                return done
+
+            future = self._inflight.get(serial)
+            if future:
+                self.connect_stats["shared"] += 1
+                return future
+
+            future = Future()
+            self._inflight[serial] = future
+            self.connect_stats["spawned"] += 1
+
+        threading.Thread(target=self._do_connect, args=(ip_address, future), daemon=True).start()
+        return future
+
+    def _do_connect(self, ip_address: str, future: Future):
+        serial = f"{ip_address}:5555"
         logger.info(f"ADB connecting to {ip_address}...")
-        success, output = self._run_command(["connect", f"{ip_address}:5555"])
-        
-        if success and ("connected" in output or "already" in output):
+        started = time.perf_counter()
+        try:
+            success, output = self._run_command(["connect", serial])
+            connected = success and ("connected" in output or "already" in output)
+            if connected:
+                elapsed = time.perf_counter() - started
+                self._connect_latency = elapsed if not self._connect_latency else 0.7 * self._connect_latency + 0.3 * elapsed
+        except Exception as e:
+            logger.error(f"ADB connect failed: {e}")
+            connected = False
+        finally:
+            with self._connect_lock:
+                self._inflight.pop(serial, None)
+        future.set_result(connected)
+
+    def _set_connected(self, ip_address: str):
+        self._fingerprint_checked.discard(f"{ip_address}:5555")  # May have rebooted into an update
+        with self._shell_lock:
+            if self.connected_device_ip != ip_address:
+                self._close_shell()  # Shell belongs to the previous device
             self.connected_device_ip = ip_address
             # Pre-start persistent shell for fast input
             self._ensure_shell()
-            return True
-        return False
 
     def _ensure_shell(self):
         """Ensure a persistent shell is running for fast input."""
-        if not self.connected_device_ip:
-            return
-            
-        if self._shell_process and self._shell_process.poll() is None:
-            return # Already running
-            
-        try:
-            logger.info("Starting persistent ADB shell process...")
-            cmd = [self.adb_path, "-s", f"{self.connected_device_ip}:5555", "shell"]
-            self._shell_process = subprocess.Popen(
-                cmd,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1 # Line buffered
-            )
-        except Exception as e:
-            logger.error(f"Failed to start persistent shell: {e}")
+        with self._shell_lock:
+            if not self.connected_device_ip:
+                return
+
+            if self._shell_process and self._shell_process.poll() is None:
+                return # Already running
+
+            try:
+                logger.info("Starting persistent ADB shell process...")
+                cmd = [self.adb_path, "-s", f"{self.connected_device_ip}:5555", "shell"]
+                self._shell_process = subprocess.Popen(
+                    cmd,
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    text=True,
+                    bufsize=1 # Line buffered
+                )
+            except Exception as e:
+                logger.error(f"Failed to start persistent shell: {e}")
 
     def close(self):
         """Closes the persistent shell process."""
-        if self._shell_process:
-            try:
-                self._shell_process.stdin.write("exit\n")
-                self._shell_process.stdin.flush()
-                self._shell_process.terminate()
-                self._shell_process.wait(timeout=1)
-            except:
-                pass
-            self._shell_process = None
+        self._close_shell()
+        self.tracker.stop()
+        self._encode_pool.shutdown(wait=False)
+
+    def _close_shell(self):
+        with self._shell_lock:
+            if self._shell_process:
+                try:
+                    self._shell_process.stdin.write("exit\n")
+                    self._shell_process.stdin.flush()
+                    self._shell_process.terminate()
+                    self._shell_process.wait(timeout=1)
+                except:
+                    pass
+                self._shell_process = None
 
     def is_available(self) -> bool:
         """Check if ADB tool is available."""
@@ -96,6 +286,8 @@ class ADBController:
             "-s", f"{self.connected_device_ip}:5555", 
             "install", "-r", apk_path
         ])
+        if success:
+            self.caps_cache.invalidate(self._serial())  # Package list changed
         return success
 
     def push_file(self, local_path: str, remote_path: str) -> bool:
@@ -109,70 +301,248 @@ class ADBController:
         ])
         return success
 
-    def take_screenshot(self, local_path: str) -> bool:
-        """Take screenshot and pull to local path."""
+    def sync_dir(self, local_dir: str, remote_dir: str, delete: bool = False, streams: int = 4) -> Optional[dict]:
+        """
+        Incrementally sync a local directory to the device.
+        Only new or changed files are pushed; returns transfer stats
+        (bytes_transferred vs bytes_skipped).
+        """
+        if not self.connected_device_ip:
+            return None
+        return DirectorySync(self._run_command, self._serial(), streams=streams).sync(local_dir, remote_dir, delete)
+
+    def open_pointer_injector(self) -> Optional[PointerInjector]:
+        """Create a touch injector sized to the device screen (call `await injector.start()`)."""
+        caps = self.get_capabilities()
+        if not caps or not caps["resolution"]:
+            return None
+        refresh_hz = cfg.get("pointer", {}).get("refresh_hz", 60)
+        return PointerInjector(self.adb_path, self._serial(), tuple(caps["resolution"]), refresh_hz)
+
+    async def async_open_pointer_injector(self) -> Optional[PointerInjector]:
+        """open_pointer_injector for the event loop: a capability cache miss runs the device probe."""
+        return await asyncio.get_running_loop().run_in_executor(None, self.open_pointer_injector)
+
+    async def logcat(self, tags: Optional[List[str]] = None, level: str = "V",
+                     pattern: Optional[str] = None, clear: bool = False) -> AsyncIterator[LogEntry]:
+        """
+        Stream parsed logcat entries as they arrive.
+        Tag/level filters are also passed to logcat so the TV drops
+        unwanted lines; every yielded entry is kept in log_buffer.
+        """
+        if not self.connected_device_ip:
+            return
+
+        log_filter = LogFilter(tags, level, pattern)
+        if clear:
+            self._run_command(["-s", self._serial(), "logcat", "-c"])
+
+        proc = await asyncio.create_subprocess_exec(
+            self.adb_path, "-s", self._serial(), "logcat", "-v", "threadtime", *log_filter.logcat_args(),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            limit=1024 * 1024
+        )
+        try:
+            async for raw in proc.stdout:
+                entry = parse_line(raw.decode(errors="replace").rstrip("\r\n"))
+                if entry and log_filter.matches(entry):
+                    self.log_buffer.append(entry)
+                    yield entry
+        finally:
+            if proc.returncode is None:
+                proc.terminate()
+                await proc.wait()
+
+    def _screencap_args(self, raw: bool) -> List[str]:
+        # exec-out streams stdout untouched (no pty CRLF mangling), straight into memory
+        cmd = ["-s", self._serial(), "exec-out", "screencap"]
+        if not raw:
+            cmd.append("-p")
+        return cmd
+
+    def _build_frame(self, raw: bool, data: bytes, started: float) -> Optional[ScreenFrame]:
+        if raw:
+            frame = parse_raw(data)
+        else:
+            size = parse_png_size(data)
+            frame = ScreenFrame(size[0], size[1], "png", data, transferred=len(data)) if size else None
+        if not frame:
+            return None
+        frame.latency = time.perf_counter() - started
+        self.last_capture_stats = frame.stats()
+        logger.debug(f"Screen capture: {self.last_capture_stats}")
+        return frame
+
+    def capture_screen(self, raw: bool = True) -> Optional[ScreenFrame]:
+        """
+        Capture the screen into memory via `exec-out screencap`.
+        raw=True skips PNG compression on the TV (lowest device CPU);
+        raw=False has the TV encode PNG (fewer bytes on the wire).
+        """
+        if not self.connected_device_ip:
+            return None
+
+        started = time.perf_counter()
+        success, data = self._run_binary(self._screencap_args(raw), timeout=15)
+        if not success or not data:
+            return None
+        return self._build_frame(raw, data, started)
+
+    async def async_capture_screen(self, raw: bool = True) -> Optional[ScreenFrame]:
+        """Non-blocking variant of capture_screen for use from the event loop."""
         if not self.connected_device_ip:
+            return None
+
+        started = time.perf_counter()
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                self.adb_path, *self._screencap_args(raw),
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL
+            )
+            data, _ = await asyncio.wait_for(proc.communicate(), timeout=15)
+        except FileNotFoundError:
+            logger.error("ADB binary not found")
+            return None
+        except Exception as e:
+            logger.error(f"Screen capture failed: {e}")
+            return None
+
+        if proc.returncode != 0 or not data:
+            return None
+        return self._build_frame(raw, data, started)
+
+    async def async_take_screenshot(self, local_path: Optional[str] = None, raw: bool = True) -> Optional[bytes]:
+        """
+        Capture a PNG screenshot without touching the TV's storage.
+        Encoding and the optional file write run in the encoder pool.
+        Returns the PNG bytes so the UI can display them directly.
+        """
+        frame = await self.async_capture_screen(raw=raw)
+        if not frame:
+            return None
+
+        loop = asyncio.get_running_loop()
+        try:
+            png = await loop.run_in_executor(self._encode_pool, frame_to_png, frame)
+            if local_path:
+                await loop.run_in_executor(self._encode_pool, Path(local_path).write_bytes, png)
+        except RuntimeError as e:
+            # Encoder pool already shut down by close()
+            logger.error(f"Screenshot after close: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"Failed to save screenshot: {e}")
+            return None
+        return png
+
+    def take_screenshot(self, local_path: str, raw: bool = True) -> bool:
+        """Take screenshot and write it to local path."""
+        frame = self.capture_screen(raw=raw)
+        if not frame:
             return False
-            
-        remote_path = "/sdcard/screenshot.png"
-        
-        # 1. Take screencap
-        success, _ = self._run_command([
-            "-s", f"{self.connected_device_ip}:5555",
-            "shell", "screencap", "-p", remote_path
-        ])
-        if not success:
+
+        try:
+            png = self._encode_pool.submit(frame_to_png, frame).result()
+            Path(local_path).write_bytes(png)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to save screenshot: {e}")
             return False
-            
-        # 2. Pull file
-        success, _ = self._run_command([
-            "-s", f"{self.connected_device_ip}:5555",
-            "pull", remote_path, local_path
-        ])
-        
-        # 3. Cleanup remote file
-        self._run_command([
-            "-s", f"{self.connected_device_ip}:5555",
-            "shell", "rm", remote_path
-        ])
-        
-        return success
+
+    def get_capabilities(self, refresh: bool = False) -> Optional[dict]:
+        """
+        Device properties, resolution, packages and encoders.
+        Served from the on-disk cache when fresh; otherwise probed in a
+        single `adb shell` round trip.
+        """
+        if not self.connected_device_ip:
+            return None
+
+        address = self._serial()
+        if not refresh:
+            # One cheap getprop per connection catches OTA updates before the TTL does
+            fingerprint = None
+            if address not in self._fingerprint_checked:
+                success, output = self._run_command(["-s", address, "shell", "getprop", "ro.build.fingerprint"], timeout=5)
+                fingerprint = output if success and output else None
+            caps = self.caps_cache.get(address, fingerprint)
+            if caps:
+                if fingerprint:
+                    self._fingerprint_checked.add(address)
+                return caps
+
+        success, output = self._run_command(["-s", address, "shell", PROBE_SCRIPT], timeout=20)
+        if not success or not output:
+            return None
+        caps = parse_probe(output)
+        self.caps_cache.put(address, caps)
+        self._fingerprint_checked.add(address)
+        logger.info(f"Probed {caps['model']} (SDK {caps['sdk']}, {caps['resolution']}, "
+                    f"{len(caps['packages'])} packages, {len(caps['encoders'])} encoders)")
+        return caps
+
+    def get_sdk_level(self) -> Optional[int]:
+        """Android SDK level of the connected device."""
+        caps = self.get_capabilities()
+        return caps["sdk"] if caps else None
+
+    def has_package(self, package: str) -> bool:
+        """Check if a package is installed, using cached capabilities."""
+        caps = self.get_capabilities()
+        return bool(caps) and package in caps["packages"]
+
+    def open_frame_stream(self, interval: float = 0.0) -> Optional[FrameStream]:
+        """Create a persistent raw frame stream (call `await stream.start()`)."""
+        if not self.connected_device_ip:
+            return None
+        return FrameStream(self.adb_path, self._serial(), interval, sdk=self.get_sdk_level())
+
+    async def async_open_frame_stream(self, interval: float = 0.0) -> Optional[FrameStream]:
+        """open_frame_stream for the event loop: the SDK lookup may need an adb round-trip."""
+        if not self.connected_device_ip:
+            return None
+        sdk = await asyncio.get_running_loop().run_in_executor(None, self.get_sdk_level)
+        return FrameStream(self.adb_path, self._serial(), interval, sdk=sdk)
 
     def send_text(self, text: str) -> bool:
         """Send text using high-speed persistent shell."""
         if not self.connected_device_ip:
             return False
         
-        self._ensure_shell()
-        if not self._shell_process:
-            return False
-            
-        try:
-            # Persistent shell is much faster as it avoids spawning process per letter
-            escaped_text = text.replace(" ", "%s").replace("'", "\\'")
-            self._shell_process.stdin.write(f"input text '{escaped_text}'\n")
-            self._shell_process.stdin.flush()
-            return True
-        except Exception as e:
-            logger.error(f"Failed to send text via persistent shell: {e}")
-            self._shell_process = None # Force restart on next call
-            return False
+        # Persistent shell is much faster as it avoids spawning process per letter
+        escaped_text = text.replace(" ", "%s").replace("'", "\\'")
+        with self._shell_lock:
+            self._ensure_shell()
+            if not self._shell_process:
+                return False
+
+            try:
+                self._shell_process.stdin.write(f"input text '{escaped_text}'\n")
+                self._shell_process.stdin.flush()
+                return True
+            except Exception as e:
+                logger.error(f"Failed to send text via persistent shell: {e}")
+                self._shell_process = None # Force restart on next call
+                return False
 
     def send_key(self, keycode: int) -> bool:
         """Send keyevent using high-speed persistent shell."""
         if not self.connected_device_ip:
             return False
             
-        self._ensure_shell()
-        if not self._shell_process:
-            return False
-            
-        try:
-            self._shell_process.stdin.write(f"input keyevent {keycode}\n")
-            self._shell_process.stdin.flush()
-            return True
-        except Exception as e:
-            logger.error(f"Failed to send key via persistent shell: {e}")
-            self._shell_process = None
-            return False
+        with self._shell_lock:
+            self._ensure_shell()
+            if not self._shell_process:
+                return False
+
+            try:
+                self._shell_process.stdin.write(f"input keyevent {keycode}\n")
+                self._shell_process.stdin.flush()
+                return True
+            except Exception as e:
+                logger.error(f"Failed to send key via persistent shell: {e}")
+                self._shell_process = None
+                return False
 
@@ -1,11 +1,13 @@
 # Copyright (c) 2025 Rex Ackermann. All rights reserved.
 # Licensed under the MIT License.
+import time
 import asyncio
 import logging
 from pathlib import Path
 from typing import Optional, Callable
 from androidtvremote2 import AndroidTVRemote
 from config import cfg
+from paired_devices import PairedDeviceRegistry
 
 logger = logging.getLogger(__name__)
 
@@ -98,6 +100,7 @@ class AndroidTVController:
         # Paths for keys
         self.cert_path = str(cfg.KEYS_DIR / "cert.pem")
         self.key_path = str(cfg.KEYS_DIR / "key.pem")
+        self.paired = PairedDeviceRegistry()
 
     async def connect(self, ip_address: str, wait_for_ready: bool = True) -> bool:
         """Connect to Android TV at the given IP."""
@@ -122,7 +125,9 @@ class AndroidTVController:
 
             # 2. Diagnostic check for Remote Protocol (Port 6466)
             logger.info(f"Running network diagnostics (Port 6466) for {ip_address}...")
+            probe_started = time.perf_counter()
             is_reachable = await self._check_port(ip_address, 6466)
+            rtt_ms = (time.perf_counter() - probe_started) * 1000
             if not is_reachable:
                 # We log it but if wait_for_ready=False (likely pairing flow), we might still want to return
                 if wait_for_ready:
@@ -192,6 +197,7 @@ class AndroidTVController:
                     
                     self.client.keep_reconnecting()
                     cfg.set("last_connected_device_ip", ip_address)
+                    self.paired.record_connection(ip_address, rtt_ms)
                     return True
                             
                 except Exception as e:
@@ -238,15 +244,11 @@ class AndroidTVController:
 
     def is_paired(self, ip_address: str) -> bool:
         """Check if a device is known to be paired."""
-        paired_list = cfg.get("paired_devices", [])
-        return ip_address in paired_list
+        return self.paired.is_paired(ip_address)
 
-    def mark_paired(self, ip_address: str):
+    def mark_paired(self, ip_address: str, identity: Optional[str] = None):
         """Mark a device as paired in config."""
-        paired_list = cfg.get("paired_devices", [])
-        if ip_address not in paired_list:
-            paired_list.append(ip_address)
-            cfg.set("paired_devices", paired_list)
+        self.paired.mark_paired(ip_address, identity)
 
     def send_key(self, key_code: str, direction: str = "SHORT", use_adb: bool = False):
         """
@@ -320,7 +322,7 @@ class AndroidTVController:
             if key.exists(): key.unlink()
             
             # Also clear paired devices list
-            cfg.set("paired_devices", [])
+            self.paired.clear()
             
             logger.info("Keys successfully reset.")
             return True
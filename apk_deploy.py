@@ -0,0 +1,132 @@
+# Copyright (c) 2025 Rex Ackermann. All rights reserved.
+# Licensed under the MIT License.
+import re
+import time
+import asyncio
+import logging
+from pathlib import Path
+from typing import Optional, Callable, List, Dict
+from config import cfg
+from device_caps import CapabilityCache, shared_capability_cache
+
+logger = logging.getLogger(__name__)
+
+# `cmd package install-write` with stdin streaming needs Android 7.0+
+# (also the first release with the shell v2 protocol that forwards stdin)
+STREAMING_MIN_SDK = 24
+
+class ApkDeployer:
+    """
+    Installs one or more APKs (split APKs included) onto many devices at once.
+    Each APK is read from disk once and the same bytes are streamed to every
+    device through `cmd package install-write`, with no temp file on the TV.
+    Older devices fall back to `adb install-multiple`.
+    """
+
+    def __init__(self, apk_paths: List[str], max_parallel: int = 4,
+                 on_progress: Optional[Callable[[str, str], None]] = None,
+                 caps_cache: Optional[CapabilityCache] = None):
+        self.adb_path = cfg.get("adb_path", "adb")
+        self.apk_paths = [Path(p) for p in apk_paths]
+        self.max_parallel = max_parallel
+        self.on_progress = on_progress
+        self._apks: List[tuple] = []  # (name, bytes), loaded once
+        self.results: Dict[str, dict] = {}
+        self.caps_cache = caps_cache or shared_capability_cache()
+
+    def _load(self):
+        if not self._apks:
+            self._apks = [(path.name, path.read_bytes()) for path in self.apk_paths]
+            total = sum(len(data) for _, data in self._apks)
+            logger.info(f"Loaded {len(self._apks)} APK(s), {total / (1024 * 1024):.1f} MiB")
+
+    def _report(self, serial: str, message: str):
+        logger.info(f"[{serial}] {message}")
+        if self.on_progress:
+            self.on_progress(serial, message)
+
+    async def _adb(self, serial: Optional[str], *args: str, stdin: Optional[bytes] = None,
+                   timeout: float = 120) -> tuple[bool, str]:
+        """Run an adb command asynchronously, optionally feeding stdin."""
+        cmd = [self.adb_path] + (["-s", serial] if serial else []) + list(args)
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdin=asyncio.subprocess.PIPE if stdin is not None else asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT
+            )
+            out, _ = await asyncio.wait_for(proc.communicate(stdin), timeout=timeout)
+            return proc.returncode == 0, out.decode(errors="replace").strip()
+        except FileNotFoundError:
+            return False, "ADB binary not found"
+        except Exception as e:
+            return False, str(e)
+
+    async def _install_streaming(self, serial: str) -> tuple[bool, str]:
+        total = sum(len(data) for _, data in self._apks)
+        ok, out = await self._adb(serial, "exec-out", "cmd", "package", "install-create", "-r", "-S", str(total))
+        match = re.search(r"\[(\d+)\]", out)
+        if not ok or not match:
+            return False, out
+        session = match.group(1)
+
+        for index, (name, data) in enumerate(self._apks, 1):
+            self._report(serial, f"Uploading {name} ({index}/{len(self._apks)})")
+            # exec-out never forwards host stdin; `shell -T` does and still returns pm's reply
+            ok, out = await self._adb(
+                serial, "shell", "-T", "cmd", "package", "install-write",
+                "-S", str(len(data)), session, f"{index}_{name}", "-",
+                stdin=data
+            )
+            if not ok or "Success" not in out:
+                await self._adb(serial, "exec-out", "cmd", "package", "install-abandon", session)
+                return False, out
+
+        self._report(serial, "Committing")
+        ok, out = await self._adb(serial, "exec-out", "cmd", "package", "install-commit", session)
+        return ok and "Success" in out, out
+
+    async def _install_legacy(self, serial: str) -> tuple[bool, str]:
+        self._report(serial, "Installing (legacy adb install)")
+        paths = [str(p) for p in self.apk_paths]
+        verb = "install-multiple" if len(paths) > 1 else "install"
+        ok, out = await self._adb(serial, verb, "-r", *paths, timeout=300)
+        return ok and "Success" in out, out
+
+    async def _deploy_one(self, device: str, semaphore: asyncio.Semaphore):
+        serial = device if ":" in device else f"{device}:5555"
+        async with semaphore:
+            started = time.perf_counter()
+            self._report(serial, "Connecting")
+            ok, out = await self._adb(None, "connect", serial, timeout=10)
+            if not ok or not ("connected" in out or "already" in out):
+                success, output = False, out
+            else:
+                _, sdk = await self._adb(serial, "shell", "getprop", "ro.build.version.sdk", timeout=10)
+                if sdk.isdigit() and int(sdk) >= STREAMING_MIN_SDK:
+                    success, output = await self._install_streaming(serial)
+                    if not success and "Failure [" not in output:
+                        # Transport problem rather than a package manager verdict
+                        logger.warning(f"[{serial}] Streaming install failed ({output}), retrying with adb install")
+                        success, output = await self._install_legacy(serial)
+                else:
+                    success, output = await self._install_legacy(serial)
+
+            if success:
+                self.caps_cache.invalidate(serial)  # Package list changed
+
+            self.results[serial] = {
+                "success": success,
+                "output": output,
+                "duration": round(time.perf_counter() - started, 2),
+            }
+            self._report(serial, "Installed" if success else f"Failed: {output}")
+
+    async def deploy(self, devices: List[str]) -> Dict[str, dict]:
+        """Install onto all devices (IPs or serials), at most max_parallel at a time."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._load)
+        semaphore = asyncio.Semaphore(self.max_parallel)
+        await asyncio.gather(*(self._deploy_one(d, semaphore) for d in devices))
+        return self.results
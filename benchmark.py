@@ -0,0 +1,566 @@
+import sys
+import time
+import asyncio
+import tempfile
+import logging
+
+from adb_controller import ADBController
+from apk_deploy import ApkDeployer
+from screen_capture import CapturePipeline, frame_to_png
+from logcat import LogFilter, LogRingBuffer, parse_line
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def bench_screenshot(ip_address, rounds=5):
+    """Compare capture latency and bytes transferred for raw and PNG screencap."""
+    adb = ADBController()
+    if not adb.connect(ip_address):
+        print(f"ADB connect to {ip_address} failed")
+        return
+
+    for raw in (True, False):
+        mode = "raw" if raw else "png"
+        latencies = []
+        transferred = 0
+        for _ in range(rounds):
+            frame = adb.capture_screen(raw=raw)
+            if not frame:
+                print(f"[{mode}] capture failed")
+                break
+            latencies.append(frame.latency)
+            transferred = frame.transferred
+        if latencies:
+            avg_ms = sum(latencies) / len(latencies) * 1000
+            print(f"[{mode}] avg latency {avg_ms:.1f} ms, {transferred / 1024:.0f} KiB per frame")
+
+    # Local PNG encoding cost for the raw path
+    frame = adb.capture_screen(raw=True)
+    if frame:
+        start = time.perf_counter()
+        frame_to_png(frame)
+        print(f"[raw] local PNG encode {(time.perf_counter() - start) * 1000:.1f} ms")
+    adb.close()
+
+def bench_timelapse(ip_address, frames=20, interval=0.0):
+    """Run a burst capture and report achieved FPS, drops and memory high-water mark."""
+    adb = ADBController()
+    if not adb.connect(ip_address):
+        print(f"ADB connect to {ip_address} failed")
+        return
+
+    async def run():
+        stream = adb.open_frame_stream(float(interval))
+        with tempfile.TemporaryDirectory() as out_dir:
+            pipeline = CapturePipeline(stream, out_dir, max_frames=int(frames))
+            await pipeline.start()
+            await pipeline.wait()
+            await pipeline.stop()
+            print(f"[timelapse] {pipeline.stats()}")
+
+    asyncio.run(run())
+    adb.close()
+
+def bench_deploy(apk_path, *ip_addresses):
+    """Install one APK onto several TVs in parallel and report per-device timing."""
+    deployer = ApkDeployer([apk_path])
+    start = time.perf_counter()
+    results = asyncio.run(deployer.deploy(list(ip_addresses)))
+    for serial, result in results.items():
+        print(f"[deploy] {serial}: {'ok' if result['success'] else 'FAILED'} in {result['duration']} s")
+    print(f"[deploy] {len(results)} device(s) in {time.perf_counter() - start:.2f} s")
+
+def bench_sync(ip_address, local_dir, remote_dir):
+    """Sync a directory twice; the second pass should transfer (almost) nothing."""
+    adb = ADBController()
+    if not adb.connect(ip_address):
+        print(f"ADB connect to {ip_address} failed")
+        return
+    for attempt in ("first", "second"):
+        stats = adb.sync_dir(local_dir, remote_dir)
+        print(f"[sync {attempt}] {stats['bytes_transferred'] / 1024:.0f} KiB transferred, "
+              f"{stats['bytes_skipped'] / 1024:.0f} KiB skipped in {stats['duration']} s")
+    adb.close()
+
+def bench_connect(ip_address, calls=20):
+    """Repeated and concurrent ADB connects; most should be served from tracked state."""
+    from concurrent.futures import ThreadPoolExecutor
+    adb = ADBController()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda _: adb.connect(ip_address), range(4)))
+    print(f"[connect] 4 concurrent calls -> {results} in {(time.perf_counter() - start) * 1000:.0f} ms")
+    time.sleep(0.5)  # Let track-devices report the new transport
+
+    start = time.perf_counter()
+    for _ in range(int(calls)):
+        adb.connect(ip_address)
+    print(f"[connect] {calls} sequential calls in {(time.perf_counter() - start) * 1000:.1f} ms")
+    print(f"[connect] {adb.connect_stats}")
+    adb.close()
+
+def bench_logcat(lines=200000):
+    """Parse/filter/buffer throughput on synthetic logcat lines (no device needed)."""
+    sample = [
+        f"01-31 12:34:56.{i % 1000:03d}  {1000 + i % 50}  {2000 + i % 7} {'VDIWE'[i % 5]} Tag{i % 20}: message {i}"
+        for i in range(1000)
+    ]
+    log_filter = LogFilter(tags=["Tag1", "Tag2"], level="I", pattern=r"message \d+")
+    buffer = LogRingBuffer(5000)
+    start = time.perf_counter()
+    for i in range(int(lines)):
+        entry = parse_line(sample[i % 1000])
+        if entry and log_filter.matches(entry):
+            buffer.append(entry)
+    elapsed = time.perf_counter() - start
+    print(f"[logcat] {int(lines) / elapsed:,.0f} lines/s, {buffer.total} matched, {len(buffer)} buffered")
+
+def bench_pointer(ip_address, seconds=3, sample_hz=240):
+    """Drive a synthetic drag at a high sample rate; report injection rate and lag."""
+    import math
+    adb = ADBController()
+    if not adb.connect(ip_address):
+        print(f"ADB connect to {ip_address} failed")
+        return
+
+    async def run():
+        injector = await adb.async_open_pointer_injector()
+        if not injector or not await injector.start():
+            print("[pointer] injector failed to start")
+            return
+        injector.submit("down", 0.5, 0.5)
+        steps = int(float(seconds) * int(sample_hz))
+        for i in range(steps):
+            angle = 2 * math.pi * i / steps
+            injector.submit("move", 0.5 + 0.3 * math.cos(angle), 0.5 + 0.3 * math.sin(angle))
+            await asyncio.sleep(1 / int(sample_hz))
+        injector.submit("up", 0.8, 0.5)
+        await asyncio.sleep(0.5)
+        print(f"[pointer] {injector.stats()}")
+        await injector.stop()
+
+    asyncio.run(run())
+    adb.close()
+
+def bench_link(ip_address):
+    """Probe throughput/RTT to the TV and show the mirroring rung it maps to."""
+    from link_probe import QUALITY_LADDER, probe_link, choose_rung
+    adb = ADBController()
+    if not adb.connect(ip_address):
+        print(f"ADB connect to {ip_address} failed")
+        return
+    link = probe_link(adb.adb_path, f"{ip_address}:5555")
+    if link:
+        print(f"[link] {link['throughput_bps'] / 1e6:.1f} Mbit/s, RTT {link['rtt_ms']} ms "
+              f"-> {QUALITY_LADDER[choose_rung(link)]}")
+    adb.close()
+
+def bench_profiles(ip_address, seconds=10):
+    """Startup-to-first-frame time and steady fps per mirroring profile."""
+    from scrcpy_manager import ScrcpyManager
+    from scrcpy_profiles import PROFILES
+    adb = ADBController()
+    if not adb.connect(ip_address):
+        print(f"ADB connect to {ip_address} failed")
+        return
+    manager = ScrcpyManager()
+    link = manager.link_profiles.get(f"{ip_address}:5555") or {}
+    for profile in PROFILES:
+        if not manager.start_mirroring(ip_address, profile=profile):
+            print(f"[{profile}] scrcpy failed to start")
+            continue
+        time.sleep(float(seconds))
+        metrics = manager.metrics()
+        settings = metrics["settings"]
+        manager.stop_mirroring()
+        # Glass-to-glass latency is not observable from here; report its controllable parts
+        buffered_ms = settings["video_buffer"] + 1000 / settings["max_fps"]
+        print(f"[{profile}] {settings['video_codec']} ({settings['video_encoder']}) "
+              f"{settings['bitrate'] / 1e6:.1f} Mbit/s, first frame {metrics['time_to_first_frame']} s, "
+              f"{metrics['avg_fps']} fps, {metrics['frames_skipped']} skipped, "
+              f"~{buffered_ms + link.get('rtt_ms', 0):.0f} ms buffer+RTT")
+    adb.close()
+
+def bench_supervisor(*ip_addresses, seconds=10):
+    """Time-to-first-frame cold vs. pre-warmed, and scrcpy CPU/RSS per device session."""
+    from scrcpy_manager import MirrorSupervisor
+    adb = ADBController()
+    supervisor = MirrorSupervisor(adb)
+    for warm in (False, True):
+        for ip_address in ip_addresses:
+            if warm:
+                supervisor.prewarm(ip_address)
+                time.sleep(5)  # Let the background probes finish
+            started = time.perf_counter()
+            if not supervisor.start(ip_address):
+                print(f"[{ip_address}] scrcpy failed to start")
+                continue
+            print(f"[{ip_address}] {'warm' if warm else 'cold'} start call {time.perf_counter() - started:.2f} s")
+        time.sleep(float(seconds))
+        for ip_address, stats in supervisor.stats().items():
+            metrics = supervisor.manager(ip_address).metrics()
+            print(f"[{ip_address}] first frame {metrics['time_to_first_frame']} s, {stats}")
+        supervisor.stop_all()
+    adb.close()
+
+def bench_discovery(count=20, timeout=15):
+    """Time-to-first and time-to-all devices against a loopback mDNS responder."""
+    import socket
+    from zeroconf import ServiceInfo
+    from zeroconf.asyncio import AsyncZeroconf
+    from pathlib import Path
+    from device_discovery import DeviceDiscovery, SERVICE_V2
+    from device_registry import DeviceRegistry
+    count = int(count)
+
+    async def run():
+        responder = AsyncZeroconf(interfaces=["127.0.0.1"])
+        services = [
+            ServiceInfo(
+                SERVICE_V2, f"Bench TV {i}.{SERVICE_V2}",
+                addresses=[socket.inet_aton(f"127.0.1.{i + 1}")], port=6466,
+                properties={"bt": f"00:11:22:33:{i // 256:02x}:{i % 256:02x}"},
+                server=f"bench-tv-{i}.local."
+            )
+            for i in range(count)
+        ]
+        await asyncio.gather(*[await responder.async_register_service(info, strict=False) for info in services])
+
+        found = asyncio.Event()
+        discovery = DeviceDiscovery(
+            lambda info: len(discovery.discovered_devices) >= count and found.set(),
+            lambda info: None,
+            interfaces=["127.0.0.1"],
+            registry=DeviceRegistry(Path(tempfile.mkdtemp()) / "devices.json")
+        )
+        await discovery.async_start()
+        try:
+            await asyncio.wait_for(found.wait(), float(timeout))
+        except asyncio.TimeoutError:
+            print(f"[discovery] timed out")
+        print(f"[discovery] {discovery.stats()}")
+        await discovery.async_stop()
+        await responder.async_close()
+
+    asyncio.run(run())
+
+def bench_scan(hosts=254, listeners=10):
+    """Sweep a loopback /24 with a few listening "TVs" and report time and attempts."""
+    from subnet_scanner import SubnetScanner
+    hosts, listeners = int(hosts), int(listeners)
+
+    async def run():
+        servers = [
+            await asyncio.start_server(lambda r, w: w.close(), f"127.0.2.{i + 1}", port)
+            for i in range(listeners) for port in (6466, 5555)
+        ]
+        found = []
+        scanner = SubnetScanner()
+        await scanner.scan([f"127.0.2.{i + 1}" for i in range(hosts)],
+                           lambda ip, ports: found.append((ip, ports)))
+        print(f"[scan] {len(found)}/{listeners} found, {scanner.stats()}")
+        for server in servers:
+            server.close()
+
+    asyncio.run(run())
+
+def bench_refresh(count=20, rounds=5):
+    """Refresh latency and thread count: recreating discovery vs. refreshing the shared engine."""
+    import socket
+    import threading
+    from pathlib import Path
+    from zeroconf import ServiceInfo
+    from zeroconf.asyncio import AsyncZeroconf
+    from device_discovery import DeviceDiscovery, SERVICE_V2
+    from device_registry import DeviceRegistry
+    count, rounds = int(count), int(rounds)
+
+    async def run():
+        responder = AsyncZeroconf(interfaces=["127.0.0.1"])
+        for i in range(count):
+            await responder.async_register_service(ServiceInfo(
+                SERVICE_V2, f"Bench TV {i}.{SERVICE_V2}",
+                addresses=[socket.inet_aton(f"127.0.1.{i + 1}")], port=6466,
+                server=f"bench-tv-{i}.local."
+            ), strict=False)
+
+        found = set()
+
+        async def until_all(start):
+            found.clear()
+            started = time.perf_counter()
+            await start()
+            while len(found) < count:
+                await asyncio.sleep(0.001)
+            return time.perf_counter() - started
+
+        def make():
+            # Fresh registry: measure what mDNS delivers, not the on-disk list
+            return DeviceDiscovery(lambda info: found.add(info["ip"]), lambda info: None,
+                                   interfaces=["127.0.0.1"],
+                                   registry=DeviceRegistry(Path(tempfile.mkdtemp()) / "devices.json"))
+
+        for mode in ("recreate", "refresh"):
+            discovery = make()
+            await until_all(discovery.async_start)
+
+            async def refresh():
+                discovery.refresh()
+
+            latencies = []
+            for _ in range(rounds):
+                if mode == "recreate":
+                    # Old behaviour: tear down the whole engine and start from scratch
+                    await discovery.async_stop(close_engine=True)
+                    discovery = make()
+                    latencies.append(await until_all(discovery.async_start))
+                else:
+                    latencies.append(await until_all(refresh))
+            print(f"[{mode}] avg {sum(latencies) / rounds * 1000:.1f} ms to all {count} devices, "
+                  f"{threading.active_count()} threads")
+            await discovery.async_stop(close_engine=True)
+        await responder.async_close()
+
+    asyncio.run(run())
+
+def bench_noisy(total=500, tvs=10, seconds=5):
+    """Discovery cost on a network of `total` cast services of which `tvs` are TVs, with and without the pre-resolve filter."""
+    import socket
+    from pathlib import Path
+    from zeroconf import ServiceInfo
+    from zeroconf.asyncio import AsyncZeroconf
+    from device_discovery import DeviceDiscovery, SERVICE_V2, SERVICE_CAST, close_shared_zeroconf
+    from device_registry import DeviceRegistry
+    total, tvs = int(total), int(tvs)
+
+    def service(service_type, name, i, port, properties):
+        return ServiceInfo(service_type, f"{name}.{service_type}",
+                           addresses=[socket.inet_aton(f"127.{1 + i // 250}.{i % 250}.1")], port=port,
+                           properties=properties, server=f"host-{i}.local.")
+
+    async def run():
+        responder = AsyncZeroconf(interfaces=["127.0.0.1"])
+        services = []
+        for i in range(total):
+            if i < tvs:
+                services.append(service(SERVICE_V2, f"TV {i}", i, 6466, {"bt": f"00:00:{i:04x}"}))
+                services.append(service(SERVICE_CAST, f"Chromecast-{i:032x}", i, 8009, {"id": f"{i:032x}", "ca": "201221"}))
+            elif i % 2:
+                services.append(service(SERVICE_CAST, f"Google-Nest-Mini-{i:032x}", i, 8009, {"ca": "199172"}))
+            else:
+                # Speaker with a user-chosen name: only the TXT capabilities give it away
+                services.append(service(SERVICE_CAST, f"Kitchen-Speaker-{i:032x}", i, 8009, {"ca": "2052"}))
+        # Cooperating responders: skip the name probing, which would take minutes for 500 services
+        broadcasts = await asyncio.gather(*[
+            responder.async_register_service(info, strict=False, cooperating_responders=True)
+            for info in services
+        ])
+        await asyncio.gather(*broadcasts)
+
+        for prefilter in (False, True):
+            await close_shared_zeroconf()  # Cold record cache for each run
+            discovery = DeviceDiscovery(lambda info: None, lambda info: None, interfaces=["127.0.0.1"],
+                                        registry=DeviceRegistry(Path(tempfile.mkdtemp()) / "devices.json"),
+                                        prefilter=prefilter)
+            cpu = time.process_time()
+            await discovery.async_start()
+            await asyncio.sleep(float(seconds))
+            cpu = time.process_time() - cpu
+            print(f"[prefilter={prefilter}] {len(discovery.devices)} devices, "
+                  f"CPU {cpu * 1000:.0f} ms, {discovery.stats()}")
+            await discovery.async_stop(close_engine=True)
+        await responder.async_close()
+
+    asyncio.run(run())
+
+def bench_config(calls=1000):
+    """set() latency: synchronous whole-file saves vs. write-behind (no device needed)."""
+    from pathlib import Path
+    from config import Config
+    calls = int(calls)
+
+    class BenchConfig(Config):
+        CONFIG_DIR = Path(tempfile.mkdtemp())
+        CONFIG_FILE = CONFIG_DIR / "config.json"
+        KEYS_DIR = CONFIG_DIR / "keys"
+
+    config = BenchConfig()
+    for mode in ("sync", "write-behind"):
+        writes = config.writes
+        latencies = []
+        for i in range(calls):
+            started = time.perf_counter()
+            config.set("last_connected_device_ip", f"10.0.0.{i % 250}")
+            if mode == "sync":
+                config.save_config()  # What every set() used to do
+            latencies.append(time.perf_counter() - started)
+        config.flush()
+        latencies.sort()
+        print(f"[{mode}] set() avg {sum(latencies) / calls * 1e6:.0f} us, "
+              f"p99 {latencies[int(calls * 0.99)] * 1e6:.0f} us, {config.writes - writes} file writes")
+
+def bench_kinetics(flicks=10000, samples=20):
+    """CPU per pointer sample and per release, and keys a flick produces after release (no device needed)."""
+    import random
+    from touchpad_kinetics import KineticEngine
+    engine = KineticEngine()
+    flicks, samples = int(flicks), int(samples)
+    move_time = release_time = 0.0
+    coasted = []
+    for n in range(flicks):
+        t = n * 10.0
+        speed = random.uniform(200, 3000)  # px/s
+        engine.press(t, 0, 0)
+        started = time.process_time()
+        for i in range(1, samples):
+            dt = i / 120  # 120 Hz pointer events
+            engine.move(t + dt, speed * dt + random.uniform(-2, 2), random.uniform(-2, 2))
+        move_time += time.process_time() - started
+        started = time.process_time()
+        engine.release(t + samples / 120, speed * samples / 120, 0)
+        release_time += time.process_time() - started
+        coasted.append(len(engine.scheduler))
+        engine.scheduler.pop_due(t + 10.0)
+    print(f"[kinetics] move {move_time / (flicks * (samples - 1)) * 1e6:.2f} us, "
+          f"release {release_time / flicks * 1e6:.2f} us, "
+          f"keys after release avg {sum(coasted) / flicks:.1f} (was 0), max {max(coasted)}")
+    print(f"[kinetics] {engine.stats()}")
+
+def bench_paint(frames=500):
+    """Touchpad paint time: background rebuilt every frame (old behaviour) vs. cached, with and without the trail overlay."""
+    import os
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt6.QtWidgets import QApplication
+    from PyQt6.QtGui import QPixmap
+    from touchpad_widget import TouchpadWidget
+    app = QApplication.instance() or QApplication(sys.argv)
+    widget = TouchpadWidget()
+    widget.resize(400, 260)
+    target = QPixmap(widget.size())
+    frames = int(frames)
+
+    def run(label, before_frame):
+        latencies = []
+        for i in range(frames):
+            before_frame(i)
+            started = time.perf_counter()
+            widget.render(target)
+            latencies.append(time.perf_counter() - started)
+        latencies.sort()
+        print(f"[{label}] paint avg {sum(latencies) / frames * 1e6:.0f} us, "
+              f"p99 {latencies[int(frames * 0.99)] * 1e6:.0f} us")
+
+    def drag(i):
+        widget.recognizer.kinetics.move(i / 120, 50 + (i * 3) % 300, 130)
+
+    run("uncached", lambda i: widget._invalidate_background())
+    widget.background_renders = 0
+    run("cached", lambda i: None)
+    widget.recognizer.kinetics.press(0, 50, 130)
+    widget.recognizer.repeat_key = "DPAD_RIGHT"
+    run("cached+overlay", drag)
+    print(f"[paint] background renders while cached: {widget.background_renders}")
+
+def _synthetic_gestures(hz=120):
+    """A small corpus of touchpad traces ([t, kind, x, y, button]) at `hz` samples/s."""
+    def stroke(path, duration, start=(200, 130), button="left"):
+        steps = max(1, int(duration * hz))
+        trace = [[0.0, "press", start[0], start[1], button]]
+        for i in range(1, steps + 1):
+            x, y = path(i / steps)
+            trace.append([i / hz, "move", start[0] + x, start[1] + y, "other"])
+        x, y = path(1.0)
+        trace.append([steps / hz + 0.005, "release", start[0] + x, start[1] + y, button])
+        return trace
+
+    def reversal(u):  # Right for 0.6 s, then back left while still right of the start
+        return (120 * u / 0.6, 0) if u < 0.6 else (120 - 100 * (u - 0.6) / 0.4, 0)
+
+    return {
+        "tap": stroke(lambda u: (0, 0), 0.08),
+        "back": stroke(lambda u: (0, 0), 0.08, button="right"),
+        "long_press": stroke(lambda u: (1, 1), 0.8),
+        "swipe_right": stroke(lambda u: (150 * u, 4 * u), 0.25),
+        "flick_up": stroke(lambda u: (3 * u, -90 * u), 0.06),
+        "hold_pull_down": stroke(lambda u: (0, min(80, 400 * u)), 1.5),
+        "drag_reversal": stroke(reversal, 1.0),
+        "corner": stroke(lambda u: (240 * min(u, 0.5), 240 * max(0, u - 0.5)), 1.0),
+    }
+
+def bench_gestures(trace_dir=None, rounds=50):
+    """Replay recorded (or synthetic) touchpad traces: keys emitted, reaction latency to direction changes, CPU per 1000 events."""
+    from pathlib import Path
+    from gesture_recognizer import GestureRecognizer, load_trace, replay
+    from touchpad_kinetics import direction_key
+    if trace_dir:
+        corpus = {path.stem: load_trace(path) for path in sorted(Path(trace_dir).glob("*.json"))}
+    else:
+        corpus = _synthetic_gestures()
+    rounds = int(rounds)
+
+    def latencies(trace, emitted):
+        """Time from the onset of each new movement direction to its first key."""
+        onsets = {}
+        previous, last_direction = None, None
+        for t, kind, x, y, _ in trace:
+            if kind == "move" and previous and (x, y) != previous:
+                direction = direction_key(x - previous[0], y - previous[1])
+                if direction != last_direction:
+                    onsets.setdefault(direction, []).append(t)
+                    last_direction = direction
+            previous = (x, y)
+        result, last_key = [], None
+        for t, action, key in emitted:
+            if action == "swipe" and key != last_key:
+                last_key = key
+                starts = [onset for onset in onsets.get(key, []) if onset <= t]
+                if starts:
+                    result.append(t - starts[-1])
+        return result
+
+    total_events = total_cpu = 0.0
+    for name, trace in corpus.items():
+        emitted = replay(trace, GestureRecognizer())
+        started = time.process_time()
+        for _ in range(rounds):
+            replay(trace, GestureRecognizer())
+        cpu = time.process_time() - started
+        total_events += len(trace) * rounds
+        total_cpu += cpu
+
+        counts = {}
+        for _, action, key in emitted:
+            counts[key or action] = counts.get(key or action, 0) + 1
+        reaction = latencies(trace, emitted)
+        reaction_text = ", ".join(f"{r * 1000:.0f}" for r in reaction) or "-"
+        print(f"[{name}] {len(trace)} events -> {counts or 'nothing'}; "
+              f"reaction ms: {reaction_text}; cpu {cpu / (len(trace) * rounds) * 1e6 * 1000:.0f} us/1000 events")
+    print(f"[gestures] {len(corpus)} traces, {total_cpu / total_events * 1e6 * 1000:.0f} us CPU per 1000 events")
+
+BENCHMARKS = {
+    "screenshot": bench_screenshot,
+    "timelapse": bench_timelapse,
+    "deploy": bench_deploy,
+    "sync": bench_sync,
+    "connect": bench_connect,
+    "logcat": bench_logcat,
+    "pointer": bench_pointer,
+    "link": bench_link,
+    "profiles": bench_profiles,
+    "supervisor": bench_supervisor,
+    "discovery": bench_discovery,
+    "scan": bench_scan,
+    "refresh": bench_refresh,
+    "noisy": bench_noisy,
+    "config": bench_config,
+    "kinetics": bench_kinetics,
+    "paint": bench_paint,
+    "gestures": bench_gestures,
+}
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print(f"Usage: python benchmark.py <{'|'.join(BENCHMARKS)}> [TV_IP] [args...]")
+        sys.exit(1)
+
+    BENCHMARKS[sys.argv[1]](*sys.argv[2:])
@@ -1,9 +1,27 @@
 # Copyright (c) 2025 Rex Ackermann. All rights reserved.
 # Licensed under the MIT License.
 import os
+import copy
 import json
+import time
+import atexit
+import logging
+import threading
+import weakref
+from contextlib import contextmanager
 from pathlib import Path
 
+try:
+    import fcntl  # POSIX
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt  # Windows
+except ImportError:
+    msvcrt = None
+
+logger = logging.getLogger(__name__)
+
 class Config:
     APP_NAME = "Android TV Remote"
     VERSION = "1.0.0"
@@ -16,28 +34,63 @@ class Config:
     # Default settings
     DEFAULT_CONFIG = {
         "last_connected_device_ip": None,
-        "paired_devices": [], # List of IPs that have been paired
+        "paired_devices": {}, # identity -> pairing metadata (see paired_devices.py)
         "theme": "dark",
         "screen_mirroring": {
             "enabled": False,
             "max_size": 1024,
             "bitrate": 8000000,
             "max_fps": 30,
+            "adaptive": True,  # Pick quality from a link probe instead of the values above
+            "profile": "balanced",  # low-latency | balanced | high-quality
             "stay_awake": True
         },
+        "capture": {
+            "interval": 1.0,  # Seconds between timelapse frames
+            "queue_size": 8,
+            "encoders": 2
+        },
+        "pointer": {
+            "refresh_hz": 60  # Touch move events are coalesced to this rate
+        },
+        "logcat": {
+            "buffer_size": 5000  # Entries kept for the log view / export
+        },
+        "discovery": {
+            "subnet_scan": True  # Sweep local subnets when mDNS finds nothing
+        },
         "audio_forwarding": True,
         "input": {
             "mouse_sensitivity": 1.0,
             "scroll_sensitivity": 1.0,
-            "tap_to_click": True
+            "tap_to_click": True,
+            "trace_dir": None  # Record touchpad gestures here for `benchmark.py gestures`
         },
         "adb_path": "adb",  # Assumes 'adb' is in PATH by default
         "scrcpy_path": "scrcpy"  # Assumes 'scrcpy' is in PATH by default
     }
 
+    # Debounce window for write-behind saves; a burst of set() calls is
+    # written once, at most FLUSH_MAX_DELAY after the first change
+    FLUSH_DELAY = 0.5
+    FLUSH_MAX_DELAY = 2.0
+
+    _instances = weakref.WeakSet()
+
     def __init__(self):
+        self._lock = threading.RLock()
+        self._timer = None
+        self._dirty_since = None
+        self._last_change = 0.0
+        self.writes = 0
+        self._dirty_keys = set()
+        self._disk = {}  # File contents as of our last read/write
+        self._signature = None  # (mtime_ns, size, inode) of that file
+        self._subscribers = []
+        self._watcher = None
         self._ensure_config_dir()
         self.settings = self._load_config()
+        Config._instances.add(self)
 
     def _ensure_config_dir(self):
         """Ensure configuration directories exist."""
@@ -46,19 +99,22 @@ class Config:
 
     def _load_config(self):
         """Load configuration from file or create with defaults."""
+        # Pending writes from other instances in this process must land first
+        Config.flush_all()
         if not self.CONFIG_FILE.exists():
-            return self.save_config(self.DEFAULT_CONFIG)
+            return self.save_config(copy.deepcopy(self.DEFAULT_CONFIG))
         
         try:
             with open(self.CONFIG_FILE, 'r') as f:
                 saved_config = json.load(f)
+                self._disk, self._signature = saved_config, self._stat()
                 # Merge with defaults to ensure all keys exist
-                config = self.DEFAULT_CONFIG.copy()
+                config = copy.deepcopy(self.DEFAULT_CONFIG)
                 self._recursive_update(config, saved_config)
                 return config
         except Exception as e:
-            print(f"Error loading config: {e}")
-            return self.DEFAULT_CONFIG
+            logger.error(f"Error loading config: {e}")
+            return copy.deepcopy(self.DEFAULT_CONFIG)
 
     def _recursive_update(self, d, u):
         """Recursively update dictionary d with values from u."""
@@ -69,27 +125,179 @@ class Config:
                 d[k] = v
         return d
 
-    def save_config(self, settings=None):
-        """Save current settings to file."""
-        if settings:
-            self.settings = settings
-        
+    def _stat(self):
         try:
-            with open(self.CONFIG_FILE, 'w') as f:
-                json.dump(self.settings, f, indent=4)
-            return self.settings
-        except Exception as e:
-            print(f"Error saving config: {e}")
-            return self.settings
+            st = os.stat(self.CONFIG_FILE)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    @contextmanager
+    def _file_lock(self):
+        # Serializes read-merge-write across processes (flock on POSIX, byte lock on Windows)
+        with open(self.CONFIG_FILE.with_suffix(".lock"), 'a') as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            elif msvcrt:
+                lock.seek(0)
+                msvcrt.locking(lock.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+                elif msvcrt:
+                    lock.seek(0)
+                    msvcrt.locking(lock.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _merge_external(self) -> dict:
+        """
+        Pull in keys another process changed on disk since we last saw the
+        file. Keys with pending local changes keep the local value.
+        Returns {key: new value} for the keys that were taken over.
+        """
+        signature = self._stat()
+        if signature is None or signature == self._signature:
+            return {}
+        try:
+            with open(self.CONFIG_FILE, 'r') as f:
+                disk = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        changed = {}
+        for key, value in disk.items():
+            if key not in self._dirty_keys and self._disk.get(key) != value:
+                self.settings[key] = value
+                changed[key] = value
+        self._disk, self._signature = disk, signature
+        return changed
+
+    def save_config(self, settings=None):
+        """Save current settings to file now (atomic: temp file, fsync, rename)."""
+        with self._lock:
+            if settings:
+                self.settings = settings
+                self._dirty_keys.update(settings)
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+            dirty_since, self._dirty_since = self._dirty_since, None
+
+            try:
+                with self._file_lock():
+                    # Don't clobber what other processes wrote since our last look
+                    changed = self._merge_external()
+                    self._write()
+                self._dirty_keys.clear()
+            except Exception as e:
+                # e.g. a nested dict mutated during json.dumps; keep the change pending and retry
+                logger.error(f"Error saving config: {e}")
+                if self._dirty_keys:
+                    self._dirty_since = dirty_since or time.monotonic()
+                    self._start_timer(self.FLUSH_MAX_DELAY)
+                return self.settings
+        self._notify(changed)
+        return self.settings
+
+    def _write(self):
+        data = json.dumps(self.settings, indent=4)
+        tmp = self.CONFIG_FILE.with_suffix(".tmp")
+        with open(tmp, 'w') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.CONFIG_FILE)
+        self.writes += 1
+        self._disk, self._signature = json.loads(data), self._stat()
+
+    def flush(self):
+        """Write pending changes, if any."""
+        with self._lock:
+            if self._dirty_since is not None:
+                self.save_config()
+
+    @classmethod
+    def flush_all(cls):
+        for instance in list(cls._instances):
+            instance.flush()
+
+    def _schedule_flush(self):
+        with self._lock:
+            now = time.monotonic()
+            self._last_change = now
+            if self._dirty_since is None:
+                self._dirty_since = now
+            if not self._timer:
+                self._start_timer(self.FLUSH_DELAY)
+
+    def _start_timer(self, delay):
+        self._timer = threading.Timer(delay, self._on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+            if self._dirty_since is None:
+                return
+            # Keep waiting while changes keep coming, but not past the max delay
+            now = time.monotonic()
+            wait = min(self._last_change + self.FLUSH_DELAY, self._dirty_since + self.FLUSH_MAX_DELAY) - now
+            if wait > 0:
+                self._start_timer(wait)
+            else:
+                self.save_config()
 
     def get(self, key, default=None):
         """Get a configuration value."""
         return self.settings.get(key, default)
 
     def set(self, key, value):
-        """Set a configuration value and save."""
-        self.settings[key] = value
-        self.save_config()
+        """Set a configuration value; it is saved in the background shortly after."""
+        with self._lock:
+            self.settings[key] = value
+            self._dirty_keys.add(key)
+            self._schedule_flush()
+
+    def subscribe(self, callback, keys=None):
+        """
+        Call `callback(key, value)` when another process changes a key
+        (all keys, or only those in `keys`). Called from the watcher thread.
+        """
+        self._subscribers.append((callback, set(keys) if keys else None))
+
+    def _notify(self, changed: dict):
+        for key, value in changed.items():
+            for callback, keys in self._subscribers:
+                if keys is None or key in keys:
+                    try:
+                        callback(key, value)
+                    except Exception as e:
+                        logger.error(f"Config subscriber failed for {key}: {e}")
+
+    def reload_if_changed(self) -> dict:
+        """Merge external changes to the file, if any, and notify subscribers."""
+        with self._lock:
+            changed = self._merge_external()
+        self._notify(changed)
+        return changed
+
+    def watch(self, interval: float = 1.0):
+        """Poll the file's mtime/size/inode and merge changes made by other processes."""
+        if self._watcher:
+            return
+
+        def poll():
+            while True:
+                time.sleep(interval)
+                if self._stat() != self._signature:
+                    changed = self.reload_if_changed()
+                    if changed:
+                        logger.info(f"Config changed externally: {', '.join(changed)}")
+
+        self._watcher = threading.Thread(target=poll, name="config-watch", daemon=True)
+        self._watcher.start()
 
 # Global config instance
 cfg = Config()
+atexit.register(Config.flush_all)
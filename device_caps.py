@@ -0,0 +1,160 @@
+# Copyright (c) 2025 Rex Ackermann. All rights reserved.
+# Licensed under the MIT License.
+import os
+import re
+import json
+import time
+import logging
+import threading
+from pathlib import Path
+from typing import Optional, Dict
+from config import cfg
+
+logger = logging.getLogger(__name__)
+
+SECTION_MARK = "@@@CAPS@@@"
+
+# Everything is gathered in one `adb shell` invocation; sections are split on SECTION_MARK.
+PROBE_SCRIPT = "; ".join([
+    "getprop",
+    f"echo {SECTION_MARK}",
+    "wm size",
+    f"echo {SECTION_MARK}",
+    "pm list packages",
+    f"echo {SECTION_MARK}",
+    "for f in /vendor/etc/media_codecs*.xml /odm/etc/media_codecs*.xml /system/etc/media_codecs*.xml; do "
+    "[ -f \"$f\" ] && sed -n '/<Encoders>/,/<\\/Encoders>/p' \"$f\"; done 2>/dev/null",
+    f"echo {SECTION_MARK}",
+    "nproc",
+])
+
+PROP_LINE = re.compile(r"^\[([^\]]+)\]: \[(.*)\]$")
+ENCODER_LINE = re.compile(r'<MediaCodec\s+name="([^"]+)"\s+type="([^"]+)"')
+
+
+def parse_probe(output: str) -> dict:
+    """Turn the combined probe output into a capabilities dict."""
+    sections = output.replace("\r", "").split(SECTION_MARK)
+    sections += [""] * (5 - len(sections))
+    props_raw, wm_raw, packages_raw, encoders_raw, nproc_raw = sections[:5]
+
+    props = {}
+    for line in props_raw.splitlines():
+        match = PROP_LINE.match(line.strip())
+        if match:
+            props[match.group(1)] = match.group(2)
+
+    resolution = None
+    for line in wm_raw.splitlines():
+        # "Override size" wins over "Physical size" when present
+        match = re.search(r"(Physical|Override) size: (\d+)x(\d+)", line)
+        if match and (resolution is None or match.group(1) == "Override"):
+            resolution = [int(match.group(2)), int(match.group(3))]
+
+    packages = sorted(
+        line.strip()[len("package:"):] for line in packages_raw.splitlines()
+        if line.strip().startswith("package:")
+    )
+
+    encoders = []
+    for name, mime in ENCODER_LINE.findall(encoders_raw):
+        entry = {"name": name, "mime": mime}
+        if entry not in encoders:
+            encoders.append(entry)
+
+    sdk = props.get("ro.build.version.sdk", "")
+    cpus = nproc_raw.strip()
+    return {
+        "serial": props.get("ro.serialno", ""),
+        "fingerprint": props.get("ro.build.fingerprint", ""),
+        "model": props.get("ro.product.model", ""),
+        "manufacturer": props.get("ro.product.manufacturer", ""),
+        "sdk": int(sdk) if sdk.isdigit() else None,
+        "release": props.get("ro.build.version.release", ""),
+        "abi": props.get("ro.product.cpu.abi", ""),
+        "cpu_cores": int(cpus) if cpus.isdigit() else None,
+        "hardware": props.get("ro.hardware", ""),
+        "resolution": resolution,
+        "encoders": encoders,
+        "packages": packages,
+        "props": props,
+    }
+
+
+class CapabilityCache:
+    """
+    On-disk cache of probed device capabilities.
+    Entries are keyed by serial + build fingerprint (an OTA update yields a new key),
+    with an address index so lookups from an IP need no full probe. Pass the
+    device's current fingerprint to get() to catch an OTA update early.
+    Use shared_capability_cache() so every component sees the same entries.
+    """
+
+    def __init__(self, path: Optional[Path] = None, ttl: float = 24 * 3600):
+        self.path = path or cfg.CONFIG_DIR / "device_caps.json"
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data = {"devices": {}, "addresses": {}}
+        try:
+            self._data = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            pass
+
+    @staticmethod
+    def key(caps: dict) -> str:
+        return f"{caps.get('serial', '')}|{caps.get('fingerprint', '')}"
+
+    def get(self, address: str, fingerprint: Optional[str] = None) -> Optional[dict]:
+        """
+        Cached capabilities for an address, or None if missing, expired or,
+        when `fingerprint` is given, probed on a different build.
+        """
+        with self._lock:
+            key = self._data["addresses"].get(address)
+            caps = self._data["devices"].get(key) if key else None
+            if not caps or time.time() - caps.get("probed_at", 0) > self.ttl:
+                return None
+            if fingerprint is None or caps.get("fingerprint") == fingerprint:
+                return caps
+        logger.info(f"{address} was updated to {fingerprint}, re-probing capabilities")
+        self.invalidate(address)
+        return None
+
+    def put(self, address: str, caps: dict):
+        with self._lock:
+            caps["probed_at"] = time.time()
+            key = self.key(caps)
+            # Drop entries for older builds of the same device
+            serial = caps.get("serial", "")
+            for old_key in [k for k in self._data["devices"] if k != key and serial and k.startswith(f"{serial}|")]:
+                del self._data["devices"][old_key]
+            self._data["devices"][key] = caps
+            self._data["addresses"][address] = key
+            self._save()
+
+    def invalidate(self, address: str):
+        with self._lock:
+            key = self._data["addresses"].pop(address, None)
+            if key:
+                self._data["devices"].pop(key, None)
+                self._save()
+
+    def _save(self):
+        # Called with the lock held
+        try:
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(self._data))
+            os.replace(tmp, self.path)
+        except Exception as e:
+            logger.error(f"Failed to save capability cache: {e}")
+
+
+_shared_cache: Optional[CapabilityCache] = None
+
+
+def shared_capability_cache() -> CapabilityCache:
+    """The process-wide cache; separate instances would overwrite each other's file."""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = CapabilityCache()
+    return _shared_cache
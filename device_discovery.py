@@ -1,91 +1,474 @@
-from zeroconf import Zeroconf, ServiceBrowser, ServiceStateChange
-import threading
 # Copyright (c) 2025 Rex Ackermann. All rights reserved.
 # Licensed under the MIT License.
-import socket
+import re
+import time
+import asyncio
 import logging
-from typing import Callable, Dict
+from typing import Callable, Dict, List, Optional, Set
+from zeroconf import ServiceStateChange
+from zeroconf.asyncio import AsyncZeroconf, AsyncServiceBrowser, AsyncServiceInfo
+from device_registry import DeviceRegistry, is_alive
+from subnet_scanner import SubnetScanner
+from config import cfg
 
 logger = logging.getLogger(__name__)
 
+# The service types for Android TV Remote Protocol
+# v2 is the standard for modern apps
+SERVICE_V2 = "_androidtvremote2._tcp.local."
+# v1 might still be active on some older devices
+SERVICE_V1 = "_androidtvremote._tcp.local."
+# googlecast can help identify the device even if remote protocol is blocked
+SERVICE_CAST = "_googlecast._tcp.local."
+SERVICE_TYPES = [SERVICE_V2, SERVICE_V1, SERVICE_CAST]
+
+RESOLVE_TIMEOUT_MS = 3000
+
+# Cast instance names of devices that cannot be Android TVs (speakers, displays, groups)
+NON_TV_CAST_NAME = re.compile(
+    r"^(Google-(Home|Nest)(?!-TV)|Nest-(Audio|Mini|Hub|Wifi)|Chromecast-Audio|Google-Cast-Group)",
+    re.IGNORECASE
+)
+# Cast TXT "ca" capability bit for video output
+CAST_CAP_VIDEO_OUT = 0x01
+# Non-TV services are not looked at again for this long
+NEGATIVE_TTL = 15 * 60
+# Updates (TXT changes, re-announcements) of a service are re-resolved at most this often
+MIN_RESOLVE_INTERVAL = 30.0
+# Stable per-device TXT fields: remote v2 "bt" (Bluetooth MAC), cast "id" (device UUID)
+IDENTITY_KEYS = ("bt", "id")
+# Fall back to a subnet sweep if mDNS has found nothing after this long
+SCAN_AFTER = 3.0
+
+
+def decode_properties(info) -> Dict[str, str]:
+    properties = {}
+    for key, value in info.properties.items():
+        try:
+            properties[key.decode('utf-8')] = value.decode('utf-8') if value else ""
+        except:
+            pass
+    return properties
+
+
+def looks_like_tv(service_type: str, name: str, properties: Optional[dict] = None) -> bool:
+    """
+    Cheap pre-resolve check. Remote protocol services are always TVs;
+    cast services are ruled out by instance name or, once TXT is known,
+    by the missing video-out capability.
+    """
+    if service_type != SERVICE_CAST:
+        return True
+    if NON_TV_CAST_NAME.match(name):
+        return False
+    if properties and properties.get("ca", "").isdigit():
+        return bool(int(properties["ca"]) & CAST_CAP_VIDEO_OUT)
+    return True
+
+
+# One Zeroconf engine per interface set for the whole process: sockets,
+# threads and the record cache survive discovery restarts and refreshes
+_engines: Dict[Optional[tuple], AsyncZeroconf] = {}
+
+
+def shared_zeroconf(interfaces=None) -> AsyncZeroconf:
+    key = tuple(interfaces) if interfaces else None
+    if key not in _engines:
+        _engines[key] = AsyncZeroconf(interfaces=interfaces) if interfaces else AsyncZeroconf()
+    return _engines[key]
+
+
+async def close_shared_zeroconf():
+    """Close all shared engines (at application exit)."""
+    while _engines:
+        _, aiozc = _engines.popitem()
+        await aiozc.async_close()
+
+
 class DeviceDiscovery:
     """
     Discovers Android TV devices on the local network using mDNS (Zeroconf).
     Looking for _androidtvremote2._tcp.local. service.
+    Runs on the asyncio (Qt) loop; services are resolved concurrently,
+    at most `max_resolves` at a time. Devices from the on-disk registry are
+    reported first and then confirmed by mDNS or a unicast liveness probe.
+    If multicast is blocked, the local subnets are swept for TV ports instead.
+    Records from all service types are merged into one device by identity
+    (TXT ids, shared addresses); devices are dropped when their records expire.
     """
-    
-    def __init__(self, on_device_found: Callable, on_device_lost: Callable):
-        self.zeroconf = Zeroconf()
-        self.browser = None
+
+    def __init__(self, on_device_found: Callable, on_device_lost: Callable,
+                 max_resolves: int = 8, interfaces=None,
+                 registry: Optional[DeviceRegistry] = None, prefilter: bool = True):
+        self.aiozc: Optional[AsyncZeroconf] = None
+        self.browser: Optional[AsyncServiceBrowser] = None
         self.on_device_found = on_device_found
         self.on_device_lost = on_device_lost
-        self.discovered_devices: Dict[str, dict] = {} # ip -> info
+        self.discovered_devices: Dict[str, dict] = {} # primary ip -> info
+        self.devices: Dict[str, dict] = {}  # identity -> merged device
+        self._index: Dict[str, str] = {}  # "bt:..", "id:..", "addr:..", "service:.." -> identity
+        self.interfaces = interfaces
+        self.registry = registry if registry is not None else DeviceRegistry()
+        self._resolve_slots = asyncio.Semaphore(max_resolves)
+        self._tasks: Set[asyncio.Task] = set()  # Resolves, probes, scans; cancelled on stop
+        self.prefilter = prefilter
+        self._negative: Dict[str, float] = {}  # service name -> expiry (monotonic)
+        self._last_resolve: Dict[str, float] = {}  # service name -> last resolve (monotonic)
+        self._resolving: Set[str] = set()  # Service names with a resolve in flight
+
+        # Stats
+        self.started_at: Optional[float] = None
+        self.first_device_at: Optional[float] = None
+        self.last_device_at: Optional[float] = None
+        self.resolves = 0
+        self.resolve_failures = 0
+        self.resolves_skipped = 0
+        self.filtered = 0
+        self.rate_limited = 0
 
     def start_discovery(self):
-        """Start scanning for devices."""
+        """Start scanning for devices (scheduled on the running asyncio loop)."""
+        asyncio.ensure_future(self.async_start())
+
+    async def async_start(self):
         logger.info("Starting device discovery...")
-        # The service types for Android TV Remote Protocol
-        # v2 is the standard for modern apps
-        service_v2 = "_androidtvremote2._tcp.local."
-        # v1 might still be active on some older devices
-        service_v1 = "_androidtvremote._tcp.local."
-        # googlecast can help identify the device even if remote protocol is blocked
-        service_cast = "_googlecast._tcp.local."
-        
-        self.browser = ServiceBrowser(
-            self.zeroconf, 
-            [service_v2, service_v1, service_cast], 
+        self.started_at = time.perf_counter()
+        self.aiozc = shared_zeroconf(self.interfaces)
+        self._start_browser()
+        self._emit_cached()
+        self._spawn(self._reconcile())
+        if cfg.get("discovery", {}).get("subnet_scan", True):
+            self._spawn(self._scan_if_quiet())
+
+    def _spawn(self, coro):
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _start_browser(self):
+        # A new browser queries all service types at once and replays cached records
+        self.browser = AsyncServiceBrowser(
+            self.aiozc.zeroconf,
+            SERVICE_TYPES,
             handlers=[self._on_service_state_change]
         )
 
-    def stop_discovery(self):
-        """Stop scanning."""
+    def refresh(self):
+        """
+        Re-report known devices at once and query the network again,
+        reusing the running engine and its record cache.
+        """
+        started = time.perf_counter()
+        for device_info in list(self.discovered_devices.values()):
+            self.on_device_found(device_info)
+        logger.debug(f"Re-reported {len(self.discovered_devices)} devices in "
+                     f"{(time.perf_counter() - started) * 1000:.1f} ms")
+        self._spawn(self.async_refresh())
+
+    async def async_refresh(self):
+        if not self.aiozc:
+            await self.async_start()
+            return
         if self.browser:
-            self.browser.cancel()
+            await self.browser.async_cancel()
+        self._start_browser()
+        self._spawn(self._reconcile())
+        if cfg.get("discovery", {}).get("subnet_scan", True):
+            self._spawn(self._scan_if_quiet())
+
+    def stop_discovery(self, close_engine: bool = False):
+        """Stop scanning. The shared engine stays up unless `close_engine` (app exit)."""
+        asyncio.ensure_future(self.async_stop(close_engine))
+
+    async def async_stop(self, close_engine: bool = False):
+        for task in list(self._tasks):
+            task.cancel()
+        if self.browser:
+            await self.browser.async_cancel()
             self.browser = None
-        self.zeroconf.close()
+        self.aiozc = None
+        if close_engine:
+            await close_shared_zeroconf()
+        self.registry.flush()
+
+    @staticmethod
+    def _from_record(record: dict) -> dict:
+        return {
+            "name": record.get("name", record["ip"]),
+            "ip": record["ip"],
+            "port": record["ports"][0] if record["ports"] else None,
+            "model": record.get("model", "Unknown Model"),
+            "manufacturer": record.get("manufacturer", "Unknown"),
+            "cached": True,
+        }
+
+    def _emit_cached(self):
+        """Report remembered devices right away, before mDNS answers."""
+        for record in self.registry.devices():
+            self.on_device_found(self._from_record(record))
+
+    async def _reconcile(self):
+        """Probe remembered devices that mDNS has not confirmed yet."""
+        records = [r for r in self.registry.devices() if f"addr:{r['ip']}" not in self._index]
+
+        async def check(record):
+            alive = await is_alive(record["ip"])
+            if f"addr:{record['ip']}" in self._index:
+                return  # mDNS answered meanwhile
+            if alive:
+                self._on_host_found(record["ip"], record["ports"] or [6466])
+            else:
+                self.registry.mark_unreachable(record["ip"])
+                self.on_device_lost(self._from_record(record))
+
+        await asyncio.gather(*[check(record) for record in records])
+
+    async def _scan_if_quiet(self):
+        await asyncio.sleep(SCAN_AFTER)
+        if not self.devices and self.aiozc:
+            await self.scan_subnets()
+
+    async def scan_subnets(self):
+        """Sweep the local subnets and report hosts with TV ports open."""
+        scanner = SubnetScanner()
+        await scanner.scan_local(self._on_host_found)
+        logger.info(f"Subnet scan finished: {scanner.stats()}")
+
+    def _on_host_found(self, ip: str, open_ports):
+        """A host answered on TV ports without mDNS (liveness probe or subnet scan)."""
+        if f"addr:{ip}" in self._index:
+            return
+        record = self.registry.get(ip) or {}
+        device = self._merge([], [ip], {
+            "name": record.get("name"),
+            "model": record.get("model"),
+            "manufacturer": record.get("manufacturer"),
+        })
+        device["ports"]["tcp"] = 6466 if 6466 in open_ports else open_ports[0]
+        logger.info(f"Found device without mDNS: {ip} {open_ports}")
+        self._report(device)
 
     def _on_service_state_change(self, zeroconf, service_type, name, state_change):
-        """Callback for Zeroconf service changes."""
-        if state_change is ServiceStateChange.Added:
-            info = zeroconf.get_service_info(service_type, name)
-            if info:
-                self._process_service_info(info)
-        
+        """Callback for Zeroconf service changes (runs on the event loop, must not block)."""
+        if state_change in (ServiceStateChange.Added, ServiceStateChange.Updated):
+            update = state_change is ServiceStateChange.Updated
+            if not update and f"service:{name}" in self._index:
+                self.resolves_skipped += 1
+                return
+            if not self._should_resolve(service_type, name, update):
+                return
+            self._spawn(self._resolve(service_type, name))
+
         elif state_change is ServiceStateChange.Removed:
-            # name is like "Living Room TV._androidtvremote2._tcp.local."
-            # We assume unique names map to devices we track
-            pass
+            # Goodbye packet or the records' TTL ran out
+            self._remove_service(name)
+
+    def _should_resolve(self, service_type: str, name: str, update: bool = False) -> bool:
+        """
+        Negative cache and name heuristics (with the prefilter), at most one
+        resolve in flight per service, and a rate limit for updates. A new
+        appearance is always resolved, so a TV that said goodbye and came
+        back (reboot, Wi-Fi blip) shows up again right away.
+        """
+        now = time.monotonic()
+        if self.prefilter:
+            if self._negative.get(name, 0) > now:
+                self.filtered += 1
+                return False
+            if not looks_like_tv(service_type, name):
+                self._reject(name, now)
+                return False
+        if name in self._resolving or (
+                update and now - self._last_resolve.get(name, -MIN_RESOLVE_INTERVAL) < MIN_RESOLVE_INTERVAL):
+            self.rate_limited += 1
+            return False
+        self._resolving.add(name)
+        self._last_resolve[name] = now
+        if len(self._last_resolve) > 4096:
+            self._last_resolve = {n: t for n, t in self._last_resolve.items()
+                                  if now - t < MIN_RESOLVE_INTERVAL}
+        return True
+
+    def _reject(self, name: str, now: float):
+        self.filtered += 1
+        self._negative[name] = now + NEGATIVE_TTL
+        if len(self._negative) > 4096:
+            self._negative = {n: t for n, t in self._negative.items() if t > now}
+
+    async def _resolve(self, service_type: str, name: str):
+        try:
+            await self._resolve_service(service_type, name)
+        finally:
+            self._resolving.discard(name)
+
+    async def _resolve_service(self, service_type: str, name: str):
+        info = AsyncServiceInfo(service_type, name)
+        # Announcements usually carry SRV/TXT/A records, so the cache often answers
+        cached = info.load_from_cache(self.aiozc.zeroconf)
+        if self.prefilter and not looks_like_tv(service_type, name, decode_properties(info)):
+            self._reject(name, time.monotonic())
+            return
+        if cached:
+            self.resolves_skipped += 1
+        elif any(f"addr:{a}" in self._index for a in info.parsed_addresses()):
+            # Partial record of a device we already know: enough to merge it
+            self.resolves_skipped += 1
+        else:
+            async with self._resolve_slots:
+                self.resolves += 1
+                if not await info.async_request(self.aiozc.zeroconf, RESOLVE_TIMEOUT_MS):
+                    self.resolve_failures += 1
+                    self._last_resolve.pop(name, None)  # Let the next announcement retry
+                    logger.debug(f"Could not resolve {name}")
+                    return
+            if self.prefilter and not looks_like_tv(service_type, name, decode_properties(info)):
+                self._reject(name, time.monotonic())
+                return
+        self._process_service_info(info)
 
     def _process_service_info(self, info):
-        """Extract details from service info."""
-        addresses = [socket.inet_ntoa(addr) for addr in info.addresses]
+        """Extract details from service info and merge them into the device index."""
+        addresses = info.parsed_addresses()
         if not addresses:
             return
-            
-        ip = addresses[0]
-        port = info.port
-        server_name = info.server
-        
+
         # Decode properties if available (often contains model info)
-        properties = {}
-        for key, value in info.properties.items():
-            try:
-                properties[key.decode('utf-8')] = value.decode('utf-8') if value else ""
-            except:
-                pass
-
-        device_name = properties.get("n", server_name.split('.')[0])
-        
-        device_info = {
-            "name": device_name,
-            "ip": ip,
+        properties = decode_properties(info)
+
+        keys = [f"{key}:{properties[key].lower()}" for key in IDENTITY_KEYS if properties.get(key)]
+        device = self._merge(keys, addresses, {
+            "name": properties.get("n") or properties.get("fn"),
+            "model": properties.get("m") or properties.get("md"),
+            "manufacturer": properties.get("mf"),
+        }, info.type, info.port, info.name)
+        if not device["name"] and info.server:
+            device["name"] = info.server.split('.')[0]
+
+        logger.info(f"Discovered {info.type} on {device['identity']}: {addresses}")
+        self._report(device, info.type)
+
+    def _merge(self, keys: List[str], addresses: List[str], fields: dict,
+               service_type: Optional[str] = None, port: Optional[int] = None,
+               service: Optional[str] = None) -> dict:
+        """Find the device any of the keys/addresses belongs to (or create it) and fold the record in."""
+        keys = keys + [f"addr:{address}" for address in addresses]
+        # The record may tie together devices seen separately so far (e.g. one
+        # known by Bluetooth MAC, another only by address): fold them into the first
+        identities = list(dict.fromkeys(self._index[key] for key in keys if key in self._index))
+        identities = [i for i in identities if i in self.devices]
+        identity = identities[0] if identities else None
+        device = self.devices.get(identity)
+        if device is None:
+            identity = keys[0]
+            device = {
+                "identity": identity, "name": None, "model": None, "manufacturer": None,
+                "addresses": [], "ports": {}, "services": set(),
+            }
+            self.devices[identity] = device
+        for other in identities[1:]:
+            self._absorb(device, self.devices.pop(other))
+        for key in keys:
+            self._index[key] = identity
+
+        for address in addresses:
+            if address not in device["addresses"]:
+                device["addresses"].append(address)
+        # IPv4 first: it is what the remote protocol and ADB connect to
+        device["addresses"].sort(key=lambda address: ":" in address)
+        for key, value in fields.items():
+            if value and not device[key]:
+                device[key] = value
+        if service_type and port:
+            device["ports"][service_type] = port
+        if service:
+            device["services"].add(service)
+            self._index[f"service:{service}"] = identity
+        return device
+
+    def _absorb(self, device: dict, other: dict):
+        """Fold a duplicate device into `device`; its row is withdrawn if it was reported."""
+        for key, value in self._index.items():
+            if value == other["identity"]:
+                self._index[key] = device["identity"]
+        for address in other["addresses"]:
+            if address not in device["addresses"]:
+                device["addresses"].append(address)
+        for key in ("name", "model", "manufacturer"):
+            device[key] = device[key] or other[key]
+        for service_type, port in other["ports"].items():
+            device["ports"].setdefault(service_type, port)
+        device["services"] |= other["services"]
+        previous = other.get("reported_ip")
+        if previous and not device.get("reported_ip"):
+            device["reported_ip"] = previous  # _report() replaces the row if the primary address differs
+        elif previous and previous != device["reported_ip"]:
+            self.discovered_devices.pop(previous, None)
+            self.on_device_lost(dict(self._device_info(other), ip=previous))
+        logger.info(f"Merged duplicate device {other['identity']} into {device['identity']}")
+
+    def _device_info(self, device: dict) -> dict:
+        ports = device["ports"]
+        port = next((ports[t] for t in (SERVICE_V2, SERVICE_V1, "tcp") if t in ports),
+                    next(iter(ports.values()), None))
+        return {
+            "name": device["name"] or device["addresses"][0],
+            "ip": device["addresses"][0],
+            "addresses": list(device["addresses"]),
             "port": port,
-            "model": properties.get("m", "Unknown Model"),
-            "manufacturer": properties.get("mf", "Unknown")
+            "model": device["model"] or "Unknown Model",
+            "manufacturer": device["manufacturer"] or "Unknown",
+            "identity": device["identity"],
+            "cached": False,
         }
-        
-        logger.info(f"Discovered device: {device_info}")
+
+    def _report(self, device: dict, service_type: Optional[str] = None):
+        device_info = self._device_info(device)
+        ip = device_info["ip"]
+        previous = device.get("reported_ip")
+        if previous and previous != ip:
+            # Primary address changed (e.g. IPv4 arrived after IPv6)
+            self.discovered_devices.pop(previous, None)
+            self.on_device_lost(dict(device_info, ip=previous))
+        device["reported_ip"] = ip
+
+        now = time.perf_counter()
+        if ip not in self.discovered_devices:
+            self.first_device_at = self.first_device_at or now
+            self.last_device_at = now
         self.discovered_devices[ip] = device_info
+        self.registry.update(device_info, service_type)
         self.on_device_found(device_info)
 
+    def _remove_service(self, name: str):
+        self._last_resolve.pop(name, None)  # A comeback is resolved without waiting
+        identity = self._index.pop(f"service:{name}", None)
+        device = self.devices.get(identity)
+        if not device:
+            return
+        device["services"].discard(name)
+        if not device["services"]:
+            self._evict(device)
+
+    def _evict(self, device: dict):
+        identity = device["identity"]
+        self.devices.pop(identity, None)
+        for key in [k for k, v in self._index.items() if v == identity]:
+            del self._index[key]
+        device_info = self._device_info(device)
+        self.discovered_devices.pop(device_info["ip"], None)
+        logger.info(f"Device gone: {device_info['name']} ({device_info['ip']})")
+        self.on_device_lost(device_info)
+
+    def stats(self) -> dict:
+        def since_start(t):
+            return round(t - self.started_at, 3) if t and self.started_at else None
+        return {
+            "devices": len(self.discovered_devices),
+            "resolves": self.resolves,
+            "resolve_failures": self.resolve_failures,
+            "resolves_skipped": self.resolves_skipped,
+            "filtered": self.filtered,
+            "rate_limited": self.rate_limited,
+            "time_to_first_device": since_start(self.first_device_at),
+            "time_to_all_devices": since_start(self.last_device_at),
+        }
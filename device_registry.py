@@ -0,0 +1,138 @@
+# Copyright (c) 2025 Rex Ackermann. All rights reserved.
+# Licensed under the MIT License.
+import os
+import json
+import time
+import asyncio
+import threading
+import logging
+from pathlib import Path
+from typing import Optional, List, Dict, Iterable
+from config import cfg
+
+logger = logging.getLogger(__name__)
+
+# Remote v2 pairing/control and ADB; any of them answering means the TV is up
+LIVENESS_PORTS = (6466, 6467, 5555)
+# Records are dropped after this many failed startup probes in a row, or when not seen for this long
+MAX_FAILED_PROBES = 3
+MAX_AGE = 30 * 24 * 3600
+
+
+async def is_alive(ip: str, ports: Iterable[int] = LIVENESS_PORTS, timeout: float = 0.5) -> bool:
+    """Unicast liveness check: True if any of the ports accepts a TCP connection."""
+    async def attempt(port):
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+        except (OSError, asyncio.TimeoutError):
+            return False
+        writer.close()
+        return True
+
+    results = await asyncio.gather(*[attempt(port) for port in ports])
+    return any(results)
+
+
+class DeviceRegistry:
+    """
+    Devices seen before, persisted so the device list can be shown at
+    startup before mDNS answers. Updates are batched: the file is written
+    atomically at most once per `flush_delay` seconds. Records are keyed
+    by IP but follow a device's stable identity across DHCP address
+    changes; dead ones expire after repeated failed probes or MAX_AGE.
+    """
+
+    def __init__(self, path: Optional[Path] = None, flush_delay: float = 2.0):
+        self.path = path or cfg.CONFIG_DIR / "devices.json"
+        self.flush_delay = flush_delay
+        self._devices: Dict[str, dict] = {}  # ip -> record
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self.writes = 0
+        try:
+            self._devices = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            pass
+        cutoff = time.time() - MAX_AGE
+        for ip in [ip for ip, d in self._devices.items() if d.get("last_seen", 0) < cutoff]:
+            del self._devices[ip]
+
+    def devices(self) -> List[dict]:
+        """Known devices, most recently seen first."""
+        with self._lock:
+            return sorted((dict(d) for d in self._devices.values()),
+                          key=lambda d: d.get("last_seen", 0), reverse=True)
+
+    def get(self, ip: str) -> Optional[dict]:
+        return self._devices.get(ip)
+
+    def update(self, device_info: dict, service_type: Optional[str] = None):
+        """Merge a discovery result into the registry and schedule a write."""
+        ip = device_info["ip"]
+        # Address-only identities ("addr:...") say nothing beyond the IP itself
+        identity = device_info.get("identity")
+        if identity and identity.startswith("addr:"):
+            identity = None
+        with self._lock:
+            record = self._devices.get(ip)
+            if record is None:
+                moved = next((old for old, d in self._devices.items()
+                              if identity and d.get("identity") == identity), None)
+                if moved:
+                    # Same TV on a new DHCP lease: re-key instead of leaving a dead entry
+                    record = self._devices.pop(moved)
+                    logger.info(f"Registry: {moved} moved to {ip}")
+                    record.update(ip=ip, addresses=[])
+                else:
+                    record = {"ip": ip, "addresses": [], "ports": [], "service_types": []}
+                self._devices[ip] = record
+            if identity:
+                record["identity"] = identity
+            record.pop("failed_probes", None)
+            for key in ("name", "model", "manufacturer"):
+                if device_info.get(key) and not device_info[key].startswith("Unknown"):
+                    record[key] = device_info[key]
+            for address in device_info.get("addresses", [device_info["ip"]]):
+                if address not in record["addresses"]:
+                    record["addresses"].append(address)
+            for key, value in (("ports", device_info.get("port")),
+                               ("service_types", service_type)):
+                if value is not None and value not in record[key]:
+                    record[key].append(value)
+            record["last_seen"] = time.time()
+            self._schedule_flush()
+
+    def mark_unreachable(self, ip: str) -> bool:
+        """Record a failed liveness probe; returns True if the record was dropped."""
+        with self._lock:
+            record = self._devices.get(ip)
+            if not record:
+                return False
+            record["failed_probes"] = record.get("failed_probes", 0) + 1
+            dropped = record["failed_probes"] >= MAX_FAILED_PROBES
+            if dropped:
+                del self._devices[ip]
+                logger.info(f"Registry: dropped {ip} after {MAX_FAILED_PROBES} failed probes")
+            self._schedule_flush()
+            return dropped
+
+    def _schedule_flush(self):
+        if self._timer is None:
+            self._timer = threading.Timer(self.flush_delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """Write pending changes now (atomic replace)."""
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+            data = json.dumps(self._devices)
+        try:
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(data)
+            os.replace(tmp, self.path)
+            self.writes += 1
+        except Exception as e:
+            logger.error(f"Failed to save device registry: {e}")
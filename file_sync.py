@@ -0,0 +1,205 @@
+# Copyright (c) 2025 Rex Ackermann. All rights reserved.
+# Licensed under the MIT License.
+import os
+import json
+import time
+import shlex
+import hashlib
+import logging
+import threading
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from config import cfg
+
+logger = logging.getLogger(__name__)
+
+# Files pushed per `adb push` invocation (same remote directory)
+PUSH_BATCH = 32
+
+class HashCache:
+    """
+    On-disk cache of file hashes keyed by path, size and mtime, so unchanged
+    files are never re-read. Used for both local files and remote listings.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._entries: Dict[str, list] = {}  # key -> [size, mtime, md5]
+        self._lock = threading.Lock()
+        self._dirty = False
+        try:
+            self._entries = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            pass
+
+    def get(self, key: str, size: int, mtime: int) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry and entry[0] == size and entry[1] == mtime:
+            return entry[2]
+        return None
+
+    def put(self, key: str, size: int, mtime: int, digest: str):
+        with self._lock:
+            self._entries[key] = [size, mtime, digest]
+            self._dirty = True
+
+    def save(self):
+        if not self._dirty:
+            return
+        with self._lock:
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(self._entries))
+            os.replace(tmp, self.path)
+            self._dirty = False
+
+
+def md5_file(path: Path) -> str:
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DirectorySync:
+    """
+    Incremental one-way sync of a local directory to a path on the TV.
+    Files are compared by size, then mtime, then MD5 (local hashes come from
+    the cache; remote hashes are only computed for same-size files whose
+    mtime differs). Changed files are pushed over parallel adb streams.
+    """
+
+    def __init__(self, run_command: Callable[..., tuple], serial: str,
+                 cache: Optional[HashCache] = None, streams: int = 4):
+        self._run = run_command
+        self.serial = serial
+        self.cache = cache or HashCache(cfg.CONFIG_DIR / "sync_cache.json")
+        self.streams = streams
+
+    def _shell(self, command: str, timeout: float = 60) -> tuple[bool, str]:
+        return self._run(["-s", self.serial, "shell", command], timeout=timeout)
+
+    def list_local(self, local: Path) -> Dict[str, tuple]:
+        """relative path -> (size, mtime)"""
+        files = {}
+        for root, _, names in os.walk(local):
+            for name in names:
+                full = Path(root) / name
+                st = full.stat()
+                files[full.relative_to(local).as_posix()] = (st.st_size, int(st.st_mtime))
+        return files
+
+    def list_remote(self, remote: str) -> Dict[str, tuple]:
+        """relative path -> (size, mtime), from a single `find`/`stat` round trip."""
+        ok, out = self._shell(
+            f"find {shlex.quote(remote)} -type f -exec stat -c '%s %Y %n' {{}} + 2>/dev/null"
+        )
+        files = {}
+        prefix = remote.rstrip("/") + "/"
+        for line in out.splitlines():
+            parts = line.rstrip("\r").split(" ", 2)
+            if len(parts) != 3 or not parts[0].isdigit() or not parts[2].startswith(prefix):
+                continue
+            files[parts[2][len(prefix):]] = (int(parts[0]), int(parts[1]))
+        return files
+
+    def remote_hashes(self, remote: str, rel_paths: List[str], remote_files: Dict[str, tuple]) -> Dict[str, str]:
+        """MD5 of remote files, reusing cached digests for unchanged size/mtime."""
+        hashes, missing = {}, []
+        for rel in rel_paths:
+            size, mtime = remote_files[rel]
+            cached = self.cache.get(f"{self.serial}:{remote}/{rel}", size, mtime)
+            if cached:
+                hashes[rel] = cached
+            else:
+                missing.append(rel)
+
+        prefix = remote.rstrip("/") + "/"
+        for i in range(0, len(missing), 64):
+            batch = " ".join(shlex.quote(prefix + rel) for rel in missing[i:i + 64])
+            ok, out = self._shell(f"md5sum {batch}", timeout=300)
+            for line in out.splitlines():
+                digest, _, path = line.rstrip("\r").partition("  ")
+                if path.startswith(prefix):
+                    rel = path[len(prefix):]
+                    hashes[rel] = digest
+                    size, mtime = remote_files[rel]
+                    self.cache.put(f"{self.serial}:{remote}/{rel}", size, mtime, digest)
+        return hashes
+
+    def local_hash(self, local: Path, rel: str, size: int, mtime: int) -> str:
+        full = local / rel
+        key = str(full.resolve())
+        digest = self.cache.get(key, size, mtime)
+        if not digest:
+            digest = md5_file(full)
+            self.cache.put(key, size, mtime, digest)
+        return digest
+
+    def _push_batch(self, local: Path, remote_dir: str, rel_paths: List[str]) -> bool:
+        sources = [str(local / rel) for rel in rel_paths]
+        self._shell(f"mkdir -p {shlex.quote(remote_dir)}")
+        ok, out = self._run(["-s", self.serial, "push", *sources, remote_dir + "/"], timeout=3600)
+        if not ok:
+            logger.error(f"Push to {remote_dir} failed: {out}")
+        return ok
+
+    def sync(self, local_dir: str, remote_dir: str, delete: bool = False) -> dict:
+        started = time.perf_counter()
+        local = Path(local_dir)
+        remote = remote_dir.rstrip("/")
+        local_files = self.list_local(local)
+        remote_files = self.list_remote(remote)
+
+        changed, ambiguous = [], []
+        for rel, (size, mtime) in local_files.items():
+            remote_stat = remote_files.get(rel)
+            if not remote_stat or remote_stat[0] != size:
+                changed.append(rel)
+            elif remote_stat[1] != mtime:
+                ambiguous.append(rel)  # Same size, different mtime: compare content
+
+        if ambiguous:
+            remote_digests = self.remote_hashes(remote, ambiguous, remote_files)
+            with ThreadPoolExecutor(max_workers=self.streams) as pool:
+                local_digests = dict(zip(ambiguous, pool.map(
+                    lambda rel: self.local_hash(local, rel, *local_files[rel]), ambiguous)))
+            changed += [rel for rel in ambiguous if remote_digests.get(rel) != local_digests[rel]]
+
+        # Group by remote directory so one adb push carries many files
+        batches: Dict[str, List[str]] = {}
+        for rel in changed:
+            parent = posixpath.dirname(rel)
+            batches.setdefault(posixpath.join(remote, parent) if parent else remote, []).append(rel)
+        jobs = [(d, rels[i:i + PUSH_BATCH]) for d, rels in batches.items() for i in range(0, len(rels), PUSH_BATCH)]
+
+        failed = set()
+        with ThreadPoolExecutor(max_workers=self.streams) as pool:
+            for (target, rels), ok in zip(jobs, pool.map(lambda job: self._push_batch(local, *job), jobs)):
+                if not ok:
+                    failed.update(rels)
+
+        deleted = 0
+        if delete:
+            extras = [rel for rel in remote_files if rel not in local_files]
+            for i in range(0, len(extras), 64):
+                batch = " ".join(shlex.quote(f"{remote}/{rel}") for rel in extras[i:i + 64])
+                if self._shell(f"rm -f {batch}")[0]:
+                    deleted += len(extras[i:i + 64])
+
+        self.cache.save()
+        pushed = [rel for rel in changed if rel not in failed]
+        changed = set(changed)
+        stats = {
+            "files": len(local_files),
+            "pushed": len(pushed),
+            "failed": len(failed),
+            "deleted": deleted,
+            "bytes_transferred": sum(local_files[rel][0] for rel in pushed),
+            "bytes_skipped": sum(size for rel, (size, _) in local_files.items() if rel not in changed),
+            "duration": round(time.perf_counter() - started, 2),
+        }
+        logger.info(f"Sync {local_dir} -> {remote_dir}: {stats}")
+        return stats
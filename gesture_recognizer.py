@@ -0,0 +1,247 @@
+# Copyright (c) 2025 Rex Ackermann. All rights reserved.
+# Licensed under the MIT License.
+import json
+import logging
+from pathlib import Path
+from typing import List, Optional, Tuple
+from touchpad_kinetics import KineticEngine, direction_key
+
+logger = logging.getLogger(__name__)
+
+# States
+IDLE = "idle"
+PRESSED = "pressed"    # Down, not moved far enough to be a drag yet
+DRAGGING = "dragging"  # D-pad direction follows the finger, with accelerating repeats
+HOLDING = "holding"    # Long press fired; OK repeats until release
+
+CLICK = "CLICK"  # repeat_key while holding
+
+Action = Tuple[str, Optional[str]]  # ("swipe", "DPAD_UP"), ("click", None), ("long_click", None), ("back", None)
+
+
+class GestureRecognizer:
+    """
+    Touchpad gesture state machine driven by timestamped samples, with no
+    Qt dependency. press/move/release return the actions they trigger;
+    time-based actions (long press, repeats, inertia) come from tick(t),
+    which the owner calls at next_deadline(). Times are in seconds.
+    """
+
+    def __init__(self, kinetics: Optional[KineticEngine] = None, swipe_threshold: float = 30,
+                 drag_threshold: float = 15, reversal_threshold: float = 10,
+                 tap_timeout: float = 0.2, tap_slop: float = 10, long_press_timeout: float = 0.35,
+                 first_repeat: float = 0.25, click_repeat: float = 0.1):
+        self.kinetics = kinetics or KineticEngine()
+        self.swipe_threshold = swipe_threshold
+        self.drag_threshold = drag_threshold
+        self.reversal_threshold = reversal_threshold
+        self.tap_timeout = tap_timeout
+        self.tap_slop = tap_slop
+        self.long_press_timeout = long_press_timeout
+        self.first_repeat = first_repeat
+        self.click_repeat = click_repeat
+
+        self.state = IDLE
+        self.press_pos = (0.0, 0.0)  # Moves to the current position on direction changes
+        self.last_pos = (0.0, 0.0)
+        self.press_time = 0.0
+        self.direction_start = 0.0  # Time acceleration restarts on reversal
+        self.repeat_key: Optional[str] = None
+        self._long_press_at: Optional[float] = None
+        self._repeat_at: Optional[float] = None
+
+        # Stats
+        self.samples = 0
+        self.actions = 0
+
+    def reset(self):
+        self.state = IDLE
+        self.repeat_key = None
+        self._long_press_at = None
+        self._repeat_at = None
+        self.kinetics.stop()
+
+    def next_deadline(self) -> Optional[float]:
+        deadlines = [d for d in (self._long_press_at, self._repeat_at, self.kinetics.scheduler.next_due())
+                     if d is not None]
+        return min(deadlines) if deadlines else None
+
+    def press(self, t: float, x: float, y: float) -> List[Action]:
+        self.samples += 1
+        self.kinetics.press(t, x, y)
+        self.state = PRESSED
+        self.press_pos = self.last_pos = (x, y)
+        self.press_time = self.direction_start = t
+        self.repeat_key = None
+        self._repeat_at = None
+        self._long_press_at = t + self.long_press_timeout
+        return []
+
+    def move(self, t: float, x: float, y: float) -> List[Action]:
+        if self.state == IDLE:
+            return []
+        self.samples += 1
+        self.kinetics.move(t, x, y)
+        actions = []
+        total_x, total_y = x - self.press_pos[0], y - self.press_pos[1]
+        instant_x, instant_y = x - self.last_pos[0], y - self.last_pos[1]
+
+        if self.state != HOLDING and abs(total_x) + abs(total_y) > self.drag_threshold:
+            self.state = DRAGGING
+            self._long_press_at = None
+
+            # 1. Direction from the TOTAL movement since press (or the last direction change)
+            new_key = None
+            if max(abs(total_x), abs(total_y)) > self.swipe_threshold:
+                new_key = direction_key(total_x, total_y)
+
+            # 2. A significant INSTANT push against the current direction flips it,
+            # even while the total movement still points the original way
+            if self.repeat_key and self._is_reversal(instant_x, instant_y):
+                new_key = direction_key(instant_x, instant_y)
+
+            if new_key:
+                if new_key != self.repeat_key:
+                    self.repeat_key = new_key
+                    # Reset distance and time acceleration for the new direction
+                    self.press_pos = (x, y)
+                    self.direction_start = t
+                    actions.append(("swipe", new_key))
+                if self._repeat_at is None:
+                    self._repeat_at = t + self.first_repeat
+
+        self.last_pos = (x, y)
+        self.actions += len(actions)
+        return actions
+
+    def _is_reversal(self, dx: float, dy: float) -> bool:
+        limit = self.reversal_threshold
+        return ((self.repeat_key == "DPAD_RIGHT" and dx < -limit) or
+                (self.repeat_key == "DPAD_LEFT" and dx > limit) or
+                (self.repeat_key == "DPAD_UP" and dy > limit) or
+                (self.repeat_key == "DPAD_DOWN" and dy < -limit))
+
+    def release(self, t: float, x: float, y: float, button: str = "left") -> List[Action]:
+        if self.state == IDLE:
+            return []
+        self.samples += 1
+        state = self.state
+        had_repeat = self._repeat_at is not None or self.repeat_key is not None
+        self.state = IDLE
+        self.repeat_key = None
+        self._long_press_at = None
+        self._repeat_at = None
+
+        if state == HOLDING:
+            self.kinetics.samples.clear()
+            return []
+        if had_repeat:
+            # Letting go of a drag while still moving keeps it coasting
+            self.kinetics.release(t, x, y)
+            return []
+
+        actions = []
+        delta_x, delta_y = x - self.press_pos[0], y - self.press_pos[1]
+        if (t - self.press_time < self.tap_timeout and
+                abs(delta_x) < self.tap_slop and abs(delta_y) < self.tap_slop):
+            if button == "left":
+                actions.append(("click", None))
+            elif button == "right":
+                actions.append(("back", None))
+            self.kinetics.samples.clear()
+        else:
+            # Quick flick released before any repeat started
+            if max(abs(delta_x), abs(delta_y)) > self.swipe_threshold:
+                actions.append(("swipe", direction_key(delta_x, delta_y)))
+            # Inertia: a fast flick keeps scrolling with decaying repeats
+            self.kinetics.release(t, x, y)
+        self.actions += len(actions)
+        return actions
+
+    def tick(self, t: float) -> List[Action]:
+        """Actions whose deadline is at or before `t`."""
+        actions = []
+        if self._long_press_at is not None and t >= self._long_press_at:
+            at = self._long_press_at
+            self._long_press_at = None
+            if self.state == PRESSED:
+                self.state = HOLDING
+                self.repeat_key = CLICK
+                self.direction_start = at
+                self._repeat_at = at + self.click_repeat
+                actions.append(("long_click", None))
+
+        while self._repeat_at is not None and t >= self._repeat_at:
+            at = self._repeat_at
+            if self.repeat_key == CLICK:
+                actions.append(("click", None))
+                interval = self.click_repeat
+            else:
+                # Acceleration: distance from the direction start, then time held in it
+                distance = abs(self.last_pos[0] - self.press_pos[0]) + abs(self.last_pos[1] - self.press_pos[1])
+                interval = max(0.05, 0.35 - distance * 0.003)
+                interval = max(0.03, interval - (at - self.direction_start) * 0.125)
+                actions.append(("swipe", self.repeat_key))
+            self._repeat_at = at + interval
+
+        actions.extend(("swipe", key) for key in self.kinetics.scheduler.pop_due(t))
+        self.actions += len(actions)
+        return actions
+
+    def stats(self) -> dict:
+        return {"samples": self.samples, "actions": self.actions, **self.kinetics.stats()}
+
+
+class TraceRecorder:
+    """Timestamped touchpad input, saved as JSON for replay()."""
+
+    def __init__(self):
+        self.events: List[list] = []  # [t, kind, x, y, button], t relative to the first event
+        self._origin: Optional[float] = None
+
+    def record(self, t: float, kind: str, x: float, y: float, button: str = "left"):
+        if self._origin is None:
+            self._origin = t
+        self.events.append([round(t - self._origin, 4), kind, x, y, button])
+
+    def save(self, path: Path):
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(self.events))
+        except OSError as e:
+            logger.error(f"Failed to save gesture trace: {e}")
+
+
+def load_trace(path: Path) -> List[list]:
+    return json.loads(Path(path).read_text())
+
+
+def replay(trace: List[list], recognizer: Optional[GestureRecognizer] = None,
+           settle: float = 5.0) -> List[Tuple[float, str, Optional[str]]]:
+    """
+    Feed a recorded trace through a recognizer, ticking at every deadline
+    in between samples as the widget's timer would. Returns the actions as
+    (time, action, key), including inertia up to `settle` seconds after
+    the last sample.
+    """
+    recognizer = recognizer or GestureRecognizer()
+    emitted = []
+
+    def advance(until):
+        deadline = recognizer.next_deadline()
+        while deadline is not None and deadline <= until:
+            emitted.extend((deadline, action, key) for action, key in recognizer.tick(deadline))
+            deadline = recognizer.next_deadline()
+
+    for t, kind, x, y, button in trace:
+        advance(t)
+        if kind == "press":
+            actions = recognizer.press(t, x, y)
+        elif kind == "move":
+            actions = recognizer.move(t, x, y)
+        else:
+            actions = recognizer.release(t, x, y, button)
+        emitted.extend((t, action, key) for action, key in actions)
+    if trace:
+        advance(trace[-1][0] + settle)
+    return emitted
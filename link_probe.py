@@ -0,0 +1,125 @@
+# Copyright (c) 2025 Rex Ackermann. All rights reserved.
+# Licensed under the MIT License.
+import os
+import json
+import time
+import threading
+import subprocess
+import logging
+from pathlib import Path
+from typing import Optional
+from config import cfg
+
+logger = logging.getLogger(__name__)
+
+# Highest quality first; mirroring starts at the best rung the link can carry
+QUALITY_LADDER = [
+    {"name": "1080p60", "max_size": 1920, "bitrate": 16000000, "max_fps": 60},
+    {"name": "1080p30", "max_size": 1920, "bitrate": 8000000, "max_fps": 30},
+    {"name": "720p30", "max_size": 1280, "bitrate": 4000000, "max_fps": 30},
+    {"name": "540p30", "max_size": 960, "bitrate": 2000000, "max_fps": 30},
+    {"name": "480p24", "max_size": 854, "bitrate": 1000000, "max_fps": 24},
+]
+
+# Share of the measured throughput the video stream may use
+LINK_HEADROOM = 0.5
+# Above this RTT, frame rate is capped to keep latency manageable
+HIGH_RTT_MS = 40
+
+
+def probe_link(adb_path: str, serial: str, size: int = 2 * 1024 * 1024) -> Optional[dict]:
+    """
+    Measure RTT (best of three tiny round trips) and throughput
+    (a timed `exec-out` transfer of `size` bytes) to the device.
+    """
+    try:
+        rtts = []
+        for _ in range(3):
+            started = time.perf_counter()
+            subprocess.run([adb_path, "-s", serial, "exec-out", "echo"],
+                           capture_output=True, timeout=5, check=True)
+            rtts.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        result = subprocess.run([adb_path, "-s", serial, "exec-out", f"head -c {size} /dev/zero"],
+                                capture_output=True, timeout=30, check=True)
+        elapsed = time.perf_counter() - started - min(rtts)
+    except Exception as e:
+        logger.error(f"Link probe failed for {serial}: {e}")
+        return None
+
+    received = len(result.stdout)
+    if not received or elapsed <= 0:
+        return None
+    return {
+        "throughput_bps": int(received * 8 / elapsed),
+        "rtt_ms": round(min(rtts) * 1000, 1),
+    }
+
+
+def choose_rung(link: dict) -> int:
+    """Index of the best ladder rung that fits the measured link."""
+    budget = link["throughput_bps"] * LINK_HEADROOM
+    for index, rung in enumerate(QUALITY_LADDER):
+        if rung["bitrate"] > budget:
+            continue
+        if link["rtt_ms"] > HIGH_RTT_MS and rung["max_fps"] > 30:
+            continue
+        return index
+    return len(QUALITY_LADDER) - 1
+
+
+class LinkProfileCache:
+    """Per-device link measurements and chosen ladder rung, persisted with a TTL."""
+
+    def __init__(self, path: Optional[Path] = None, ttl: float = 3600):
+        self.path = path or cfg.CONFIG_DIR / "link_profiles.json"
+        self.ttl = ttl
+        self._profiles = {}
+        self._lock = threading.Lock()  # Probes for several devices run on worker threads
+        try:
+            self._profiles = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            pass
+
+    def get(self, serial: str) -> Optional[dict]:
+        profile = self._profiles.get(serial)
+        if not profile or time.time() - profile.get("measured_at", 0) > self.ttl:
+            return None
+        return profile
+
+    def put(self, serial: str, link: dict, rung: int) -> dict:
+        profile = dict(link, rung=rung, measured_at=time.time())
+        with self._lock:
+            self._profiles[serial] = profile
+            self._save()
+        return profile
+
+    def demote(self, serial: str) -> Optional[int]:
+        """Move a device one rung down; returns the new rung or None if already lowest."""
+        with self._lock:
+            profile = self._profiles.get(serial)
+            if not profile or profile["rung"] >= len(QUALITY_LADDER) - 1:
+                return None
+            profile["rung"] += 1
+            self._save()
+            return profile["rung"]
+
+    def _save(self):
+        try:
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(self._profiles))
+            os.replace(tmp, self.path)
+        except Exception as e:
+            logger.error(f"Failed to save link profiles: {e}")
+
+
+_shared_profiles: Optional[LinkProfileCache] = None
+
+
+def shared_link_profile_cache() -> LinkProfileCache:
+    """The process-wide cache; separate instances would overwrite each other's file."""
+    global _shared_profiles
+    if _shared_profiles is None:
+        _shared_profiles = LinkProfileCache()
+    return _shared_profiles
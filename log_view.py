@@ -0,0 +1,122 @@
+# Copyright (c) 2025 Rex Ackermann. All rights reserved.
+# Licensed under the MIT License.
+import asyncio
+import logging
+from typing import Optional, List
+from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPlainTextEdit,
+                            QLineEdit, QComboBox, QPushButton, QFileDialog, QLabel)
+from PyQt6.QtCore import QTimer, pyqtSignal
+from PyQt6.QtGui import QFont
+
+from logcat import LEVELS
+
+logger = logging.getLogger(__name__)
+
+class LogViewWidget(QWidget):
+    """
+    Live logcat viewer.
+    Entries are queued and appended once per frame in a single batch,
+    and the text view is capped to a fixed number of lines.
+    """
+    startRequested = pyqtSignal()
+
+    FLUSH_INTERVAL = 16  # ms, ~one frame
+    MAX_LINES = 5000
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._pending: List[str] = []
+        self._task: Optional[asyncio.Task] = None
+        self._adb = None
+
+        layout = QVBoxLayout(self)
+
+        filters = QHBoxLayout()
+        self.txt_tags = QLineEdit()
+        self.txt_tags.setPlaceholderText("Tags (comma separated)")
+        self.cmb_level = QComboBox()
+        self.cmb_level.addItems(list(LEVELS))
+        self.txt_regex = QLineEdit()
+        self.txt_regex.setPlaceholderText("Message regex")
+        filters.addWidget(self.txt_tags)
+        filters.addWidget(self.cmb_level)
+        filters.addWidget(self.txt_regex)
+        layout.addLayout(filters)
+
+        buttons = QHBoxLayout()
+        self.btn_toggle = QPushButton("Start")
+        self.btn_toggle.clicked.connect(self._toggle)
+        btn_export = QPushButton("Export")
+        btn_export.clicked.connect(self.export_snapshot)
+        self.lbl_count = QLabel("")
+        self.lbl_count.setStyleSheet("color: #8b949e;")
+        buttons.addWidget(self.btn_toggle)
+        buttons.addWidget(btn_export)
+        buttons.addWidget(self.lbl_count)
+        layout.addLayout(buttons)
+
+        self.view = QPlainTextEdit()
+        self.view.setReadOnly(True)
+        self.view.setMaximumBlockCount(self.MAX_LINES)
+        self.view.setFont(QFont("Monospace", 9))
+        layout.addWidget(self.view)
+
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setInterval(self.FLUSH_INTERVAL)
+        self._flush_timer.timeout.connect(self._flush)
+
+    def _toggle(self):
+        if self._task:
+            self.stop()
+        else:
+            self.startRequested.emit()
+
+    def start(self, adb_controller):
+        if self._task:
+            return
+        self._adb = adb_controller
+        tags = [t.strip() for t in self.txt_tags.text().split(",") if t.strip()] or None
+        level = self.cmb_level.currentText()
+        pattern = self.txt_regex.text().strip() or None
+        self._task = asyncio.create_task(self._consume(tags, level, pattern))
+        self._flush_timer.start()
+        self.btn_toggle.setText("Stop")
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        self._flush()
+        self._flush_timer.stop()
+        self.btn_toggle.setText("Start")
+
+    async def _consume(self, tags, level, pattern):
+        try:
+            async for entry in self._adb.logcat(tags=tags, level=level, pattern=pattern):
+                self._pending.append(str(entry))
+                # Bound the backlog if the UI can't keep up
+                if len(self._pending) > self.MAX_LINES:
+                    del self._pending[:-self.MAX_LINES]
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Logcat stream failed: {e}")
+        self._task = None
+        self.btn_toggle.setText("Start")
+
+    def _flush(self):
+        if not self._pending:
+            return
+        batch = "\n".join(self._pending)
+        self._pending.clear()
+        self.view.appendPlainText(batch)
+        if self._adb:
+            self.lbl_count.setText(f"{self._adb.log_buffer.total} lines")
+
+    def export_snapshot(self):
+        if not self._adb:
+            return
+        path, _ = QFileDialog.getSaveFileName(self, "Export Log", "logcat.txt", "Text Files (*.txt)")
+        if path:
+            count = self._adb.log_buffer.export(path)
+            logger.info(f"Exported {count} log entries to {path}")
@@ -0,0 +1,98 @@
+# Copyright (c) 2025 Rex Ackermann. All rights reserved.
+# Licensed under the MIT License.
+import re
+import logging
+from collections import deque
+from typing import Optional, Iterable, List
+
+logger = logging.getLogger(__name__)
+
+LEVELS = "VDIWEF"
+LEVEL_PRIORITY = {level: i for i, level in enumerate(LEVELS)}
+
+# `logcat -v threadtime`: "01-31 12:34:56.789  1234  5678 I Tag: message"
+THREADTIME = re.compile(
+    r"^(\d\d-\d\d \d\d:\d\d:\d\d\.\d+)\s+(\d+)\s+(\d+)\s+([VDIWEFA])\s+(.*?)\s*: (.*)$"
+)
+
+
+class LogEntry:
+    """One parsed logcat line."""
+    __slots__ = ("time", "pid", "tid", "level", "tag", "message")
+
+    def __init__(self, time: str, pid: int, tid: int, level: str, tag: str, message: str):
+        self.time = time
+        self.pid = pid
+        self.tid = tid
+        self.level = level
+        self.tag = tag
+        self.message = message
+
+    def __str__(self):
+        return f"{self.time} {self.pid:5d} {self.tid:5d} {self.level} {self.tag}: {self.message}"
+
+
+def parse_line(line: str) -> Optional[LogEntry]:
+    """Parse a threadtime-formatted line; returns None for headers and continuations."""
+    match = THREADTIME.match(line)
+    if not match:
+        return None
+    time, pid, tid, level, tag, message = match.groups()
+    return LogEntry(time, int(pid), int(tid), "F" if level == "A" else level, tag, message)
+
+
+class LogFilter:
+    """
+    Tag, minimum level and regex filter compiled once.
+    Cheap checks (level, tag) run before the regex.
+    """
+
+    def __init__(self, tags: Optional[Iterable[str]] = None, level: str = "V",
+                 pattern: Optional[str] = None):
+        self.tags = frozenset(tags) if tags else None
+        self.min_priority = LEVEL_PRIORITY.get(level.upper(), 0)
+        self.regex = re.compile(pattern) if pattern else None
+
+    def matches(self, entry: LogEntry) -> bool:
+        if LEVEL_PRIORITY.get(entry.level, 0) < self.min_priority:
+            return False
+        if self.tags is not None and entry.tag not in self.tags:
+            return False
+        if self.regex is not None and not self.regex.search(entry.message):
+            return False
+        return True
+
+    def logcat_args(self) -> List[str]:
+        """Filter specs so the device drops unwanted tags/levels before sending."""
+        level = LEVELS[self.min_priority]
+        if self.tags is None:
+            return [f"*:{level}"]
+        return [f"{tag}:{level}" for tag in sorted(self.tags)] + ["*:S"]
+
+
+class LogRingBuffer:
+    """Fixed-size buffer of the most recent log entries."""
+
+    def __init__(self, size: int = 5000):
+        self._entries = deque(maxlen=size)
+        self.total = 0
+
+    def append(self, entry: LogEntry):
+        self._entries.append(entry)
+        self.total += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def snapshot(self) -> List[LogEntry]:
+        return list(self._entries)
+
+    def export(self, path: str) -> int:
+        """Write the buffered entries to a text file; returns the count written."""
+        entries = self.snapshot()
+        with open(path, "w") as f:
+            f.writelines(f"{entry}\n" for entry in entries)
+        return len(entries)
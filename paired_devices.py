@@ -0,0 +1,185 @@
+# Copyright (c) 2025 Rex Ackermann. All rights reserved.
+# Licensed under the MIT License.
+import time
+import logging
+import threading
+from typing import Optional, Dict, Iterable
+from config import cfg
+
+logger = logging.getLogger(__name__)
+
+
+class PairedDeviceRegistry:
+    """
+    Paired TVs keyed by stable identity (the discovery identity, or
+    "ip:<address>" until discovery has linked one), with an address alias
+    map so lookups by IP are O(1) and survive DHCP address changes.
+    Stored in the config under "paired_devices".
+    """
+
+    def __init__(self, config=cfg):
+        self.config = config
+        # (identity -> metadata, address or alternate identity -> identity).
+        # Replaced as a whole so readers never see one map without the other.
+        self._state = ({}, {})
+        # Writers (UI thread) and the config watcher thread take turns; reads use the snapshot
+        self._lock = threading.RLock()
+
+        stored = config.get("paired_devices", {})
+        devices = self._migrate(stored)
+        self._state = (devices, self._build_aliases(devices))
+        if isinstance(stored, list):
+            self._save()
+        if hasattr(config, "subscribe"):
+            config.subscribe(self._on_external_change, ["paired_devices"])
+
+    @property
+    def _devices(self) -> Dict[str, dict]:
+        return self._state[0]
+
+    @property
+    def _aliases(self) -> Dict[str, str]:
+        return self._state[1]
+
+    def _on_external_change(self, key: str, value):
+        """Another process paired or forgot a TV (called from the config watcher thread)."""
+        # An older build may still write the legacy list format
+        devices = self._migrate(value)
+        with self._lock:
+            self._state = (devices, self._build_aliases(devices))
+
+    @classmethod
+    def _migrate(cls, stored) -> Dict[str, dict]:
+        """Stored value -> identity map; the old format is a flat list of IPs."""
+        if isinstance(stored, list):
+            logger.info(f"Migrated {len(stored)} paired devices to the identity registry")
+            return {f"ip:{ip}": cls._new_record([ip]) for ip in stored}
+        return stored if isinstance(stored, dict) else {}
+
+    @staticmethod
+    def _new_record(addresses) -> dict:
+        return {
+            "addresses": list(addresses),
+            "aliases": [],
+            "paired_at": time.time(),
+            "last_address": addresses[0] if addresses else None,
+            "last_rtt_ms": None,
+            "transport": "remote",
+        }
+
+    @staticmethod
+    def _build_aliases(devices: Dict[str, dict]) -> Dict[str, str]:
+        aliases = {}
+        for identity, record in devices.items():
+            for key in record["addresses"] + record["aliases"]:
+                aliases[key] = identity
+        return aliases
+
+    def _save(self):
+        self.config.set("paired_devices", self._devices)
+
+    def _lookup(self, key: str) -> Optional[str]:
+        devices, aliases = self._state
+        return key if key in devices else aliases.get(key)
+
+    def get(self, ip_or_identity: str) -> Optional[dict]:
+        devices, aliases = self._state  # One consistent snapshot
+        identity = ip_or_identity if ip_or_identity in devices else aliases.get(ip_or_identity)
+        return devices.get(identity) if identity else None
+
+    def is_paired(self, ip_or_identity: str) -> bool:
+        return self._lookup(ip_or_identity) is not None
+
+    def mark_paired(self, ip_address: str, identity: Optional[str] = None):
+        with self._lock:
+            self._mark_paired(ip_address, identity)
+
+    def _mark_paired(self, ip_address: str, identity: Optional[str]):
+        devices, aliases = self._state
+        existing = self._lookup(identity) if identity else None
+        existing = existing or self._lookup(ip_address)
+        if existing in devices:
+            devices[existing]["paired_at"] = time.time()
+            if not self._observe(identity, [ip_address]):
+                self._save()  # observe() saves only when it links something
+            return
+        identity = identity or f"ip:{ip_address}"
+        devices[identity] = self._new_record([ip_address])
+        aliases[ip_address] = identity
+        self._save()
+
+    @staticmethod
+    def _is_placeholder(identity: str, record: dict) -> bool:
+        """True while a record is only known by address (paired before discovery saw it)."""
+        return identity.startswith("ip:") and all(a.startswith("ip:") for a in record["aliases"])
+
+    def observe(self, identity: Optional[str], addresses: Iterable[str]) -> bool:
+        """
+        Link a discovery result to a paired device: by identity if known,
+        else by a shared address if the paired record has no identity yet.
+        New addresses become aliases, so a TV that moved to another IP stays
+        paired. A different TV at a paired TV's old address takes that
+        address away from it instead. Returns True if anything changed.
+        """
+        with self._lock:
+            return self._observe(identity, addresses)
+
+    def _observe(self, identity: Optional[str], addresses: Iterable[str]) -> bool:
+        devices, aliases = self._state
+        addresses = list(addresses)
+        known = (identity if identity in devices else aliases.get(identity)) if identity else None
+        if not known:
+            by_address = next((aliases[a] for a in addresses if a in aliases), None)
+            if by_address not in devices:
+                return False
+            if identity and not self._is_placeholder(by_address, devices[by_address]):
+                # DHCP gave the paired TV's old address to another (unpaired) TV
+                for address in addresses:
+                    if aliases.get(address) == by_address:
+                        del aliases[address]
+                        if address in devices[by_address]["addresses"]:
+                            devices[by_address]["addresses"].remove(address)
+                self._save()
+                return True
+            known = by_address
+
+        record = devices[known]
+        changed = False
+        if identity and identity != known and identity not in record["aliases"]:
+            record["aliases"].append(identity)
+            aliases[identity] = known
+            changed = True
+        for address in addresses:
+            if address not in record["addresses"]:
+                record["addresses"].append(address)
+                changed = True
+            previous = aliases.get(address)
+            if previous != known:
+                if previous in devices and address in devices[previous]["addresses"]:
+                    # Address was handed to this TV by DHCP after another one left it
+                    devices[previous]["addresses"].remove(address)
+                aliases[address] = known
+                changed = True
+        if changed:
+            self._save()
+        return changed
+
+    def record_connection(self, ip_address: str, rtt_ms: Optional[float] = None,
+                          transport: str = "remote"):
+        """Remember the last address/RTT/transport that worked for a paired TV."""
+        with self._lock:
+            record = self.get(ip_address)
+            if not record:
+                return
+            record.update(last_address=ip_address, transport=transport)
+            if rtt_ms is not None:
+                record["last_rtt_ms"] = round(rtt_ms, 1)
+            self._save()
+
+    def clear(self):
+        with self._lock:
+            self._state = ({}, {})
+            self._save()
+
+    def __len__(self) -> int:
+        return len(self._devices)
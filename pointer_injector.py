@@ -0,0 +1,209 @@
+# Copyright (c) 2025 Rex Ackermann. All rights reserved.
+# Licensed under the MIT License.
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MONKEY_DEVICE_PORT = 1080
+
+class PointerInjector:
+    """
+    Injects touch events over one long-lived channel.
+    `monkey --port` runs on the TV as a single injector process; commands
+    are written to it through an adb port forward, so each event costs a
+    socket write instead of an `input` process spawn. Move events are
+    coalesced to the display refresh rate.
+    """
+
+    def __init__(self, adb_path: str, serial: str, resolution: Tuple[int, int],
+                 refresh_hz: float = 60.0, local_port: int = 0):
+        self.adb_path = adb_path
+        self.serial = serial
+        self.width, self.height = resolution
+        self.frame_interval = 1.0 / refresh_hz
+        self.requested_port = local_port  # 0 = let adb pick a free port
+        self.local_port = local_port
+        self._forwarded = False
+
+        self._monkey: Optional[asyncio.subprocess.Process] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._tasks = []
+        self._pending_move: Optional[Tuple[int, int, float]] = None  # x, y, first sample time
+        self._in_flight = deque()  # Sample times awaiting the injector's OK
+
+        # Stats
+        self.samples = 0
+        self.injected = 0
+        self.coalesced = 0
+        self.lag_total = 0.0
+        self.lag_max = 0.0
+        self._started = 0.0
+
+    async def start(self) -> bool:
+        """Launch the injector on the TV and connect to it."""
+        self._monkey = await asyncio.create_subprocess_exec(
+            self.adb_path, "-s", self.serial, "shell", "monkey", "--port", str(MONKEY_DEVICE_PORT),
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+        if not await self._forward():
+            logger.error("Pointer injector port forward failed")
+            await self.stop()
+            return False
+
+        # monkey needs a moment to open its socket
+        for _ in range(20):
+            writer = None
+            try:
+                self._reader, writer = await asyncio.open_connection("127.0.0.1", self.local_port)
+                writer.write(b"wake\n")
+                await writer.drain()
+                if (await asyncio.wait_for(self._reader.readline(), timeout=1.0)).startswith(b"OK"):
+                    self._writer = writer
+                    break
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+                pass
+            if writer:
+                writer.close()
+            await asyncio.sleep(0.25)
+
+        if not self._writer:
+            logger.error("Pointer injector did not come up")
+            await self.stop()
+            return False
+
+        self._started = time.perf_counter()
+        self._tasks = [
+            asyncio.create_task(self._flush_loop()),
+            asyncio.create_task(self._ack_loop()),
+        ]
+        logger.info(f"Pointer injector ready on {self.serial} ({self.width}x{self.height})")
+        return True
+
+    async def _forward(self) -> bool:
+        """
+        Forward a local port to monkey's. With local_port 0, adb allocates a
+        free port and prints it, so several injectors (or TVs) never collide.
+        """
+        forward = await asyncio.create_subprocess_exec(
+            self.adb_path, "-s", self.serial, "forward",
+            f"tcp:{self.requested_port}", f"tcp:{MONKEY_DEVICE_PORT}",
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+        out, _ = await forward.communicate()
+        if forward.returncode != 0:
+            return False
+        try:
+            # adb prints the port only when it picked one
+            self.local_port = self.requested_port or int(out.decode().strip())
+        except ValueError:
+            return False
+        self._forwarded = True
+        return True
+
+    def _to_screen(self, nx: float, ny: float) -> Tuple[int, int]:
+        x = min(max(nx, 0.0), 1.0) * (self.width - 1)
+        y = min(max(ny, 0.0), 1.0) * (self.height - 1)
+        return int(x), int(y)
+
+    def _send(self, action: str, x: int, y: int, sample_time: float):
+        if not self._writer:
+            return
+        self._writer.write(f"touch {action} {x} {y}\n".encode())
+        self._in_flight.append(sample_time)
+        self.injected += 1
+
+    def submit(self, action: str, nx: float, ny: float):
+        """
+        Queue a pointer event with normalized (0..1) coordinates.
+        down/up are sent at once (after any pending move); moves are
+        coalesced and sent on the next frame tick.
+        """
+        now = time.perf_counter()
+        self.samples += 1
+        x, y = self._to_screen(nx, ny)
+
+        if action == "move":
+            if self._pending_move:
+                self.coalesced += 1
+                self._pending_move = (x, y, self._pending_move[2])
+            else:
+                self._pending_move = (x, y, now)
+            return
+
+        if self._pending_move:
+            px, py, t = self._pending_move
+            self._pending_move = None
+            self._send("move", px, py, t)
+        self._send(action, x, y, now)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.frame_interval)
+            if self._pending_move:
+                x, y, t = self._pending_move
+                self._pending_move = None
+                self._send("move", x, y, t)
+            if self._writer:
+                await self._writer.drain()
+
+    async def _ack_loop(self):
+        while True:
+            line = await self._reader.readline()
+            if not line:
+                logger.warning("Pointer injector closed the connection")
+                self._writer = None
+                return
+            if self._in_flight:
+                lag = time.perf_counter() - self._in_flight.popleft()
+                self.lag_total += lag
+                self.lag_max = max(self.lag_max, lag)
+
+    def is_running(self) -> bool:
+        return self._writer is not None
+
+    def stats(self) -> dict:
+        elapsed = time.perf_counter() - self._started if self._started else 0.0
+        acked = self.injected - len(self._in_flight)
+        return {
+            "samples": self.samples,
+            "injected": self.injected,
+            "coalesced": self.coalesced,
+            "rate_hz": round(self.injected / elapsed, 1) if elapsed else 0.0,
+            "avg_lag_ms": round(self.lag_total / acked * 1000, 1) if acked else 0.0,
+            "max_lag_ms": round(self.lag_max * 1000, 1),
+        }
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        if self._writer:
+            try:
+                self._writer.write(b"quit\n")
+                await self._writer.drain()
+                self._writer.close()
+            except Exception:
+                pass
+            self._writer = None
+        if self._monkey and self._monkey.returncode is None:
+            self._monkey.terminate()
+            try:
+                await asyncio.wait_for(self._monkey.wait(), timeout=2)
+            except asyncio.TimeoutError:
+                self._monkey.kill()
+        self._monkey = None
+        if self._forwarded:
+            self._forwarded = False
+            forward = await asyncio.create_subprocess_exec(
+                self.adb_path, "-s", self.serial, "forward", "--remove", f"tcp:{self.local_port}",
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL
+            )
+            await forward.wait()
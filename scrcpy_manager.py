@@ -1,40 +1,205 @@
 # Copyright (c) 2025 Rex Ackermann. All rights reserved.
 # Licensed under the MIT License.
+import os
+import time
+import shutil
+import threading
 import subprocess
 import logging
-from typing import Optional
+from typing import Optional, Callable, List, Dict
 from config import cfg
+from link_probe import QUALITY_LADDER, LinkProfileCache, probe_link, choose_rung, shared_link_profile_cache
+from scrcpy_output import ScrcpyOutputParser
+from scrcpy_profiles import EncoderCache, resolve_profile, profile_args, shared_encoder_cache
 
 logger = logging.getLogger(__name__)
 
+# Restart one rung lower after this many consecutive fps reports with heavy skipping
+DROP_RATIO = 0.15
+DROP_REPORTS = 3
+
 class ScrcpyManager:
     """
     Manages the scrcpy process for screen mirroring.
     """
     
-    def __init__(self):
+    def __init__(self, link_profiles: Optional[LinkProfileCache] = None,
+                 encoder_cache: Optional[EncoderCache] = None):
         self.process: Optional[subprocess.Popen] = None
         self.scrcpy_path = cfg.get("scrcpy_path", "scrcpy")
+        self.adb_path = cfg.get("adb_path", "adb")
+        self.link_profiles = link_profiles or shared_link_profile_cache()
+        self.encoder_cache = encoder_cache or shared_encoder_cache()
+        self.current_settings: Optional[dict] = None
+        self._lock = threading.RLock()
+        self._session = None  # (ip_address, embed_window_id, profile) for restarts
+        self.output = ScrcpyOutputParser()
+        self._listeners: List[Callable[[dict], None]] = []
+        self._bad_reports = 0
+        self._probing = set()  # Background probes in flight, by key
+        # Process we terminated ourselves; its exit is reported as expected
+        self._stopping: Optional[subprocess.Popen] = None
+
+    def is_available(self) -> bool:
+        """Check if the scrcpy binary can be found."""
+        return shutil.which(self.scrcpy_path) is not None
+
+    def _in_background(self, key: str, func, *args):
+        """Run a slow probe on a worker thread, at most one per key at a time."""
+        with self._lock:
+            if key in self._probing:
+                return
+            self._probing.add(key)
+
+        def run():
+            try:
+                func(*args)
+            finally:
+                with self._lock:
+                    self._probing.discard(key)
+        threading.Thread(target=run, name=f"scrcpy-probe-{key}", daemon=True).start()
+
+    def _probe_link(self, serial: str) -> Optional[dict]:
+        link = probe_link(self.adb_path, serial)
+        if not link:
+            return None
+        profile = self.link_profiles.put(serial, link, choose_rung(link))
+        logger.info(f"Link to {serial}: {link['throughput_bps'] / 1e6:.1f} Mbit/s, "
+                    f"RTT {link['rtt_ms']} ms -> {QUALITY_LADDER[profile['rung']]['name']}")
+        return profile
+
+    def _select_rung(self, serial: str, blocking: bool = False) -> dict:
+        """
+        Pick max_size/bitrate/max_fps, from the link profile when adaptive.
+        Without a measured profile the static settings are used and, unless
+        `blocking`, the link is probed in the background for the next start.
+        """
+        mirror_cfg = cfg.get("screen_mirroring")
+        static = {
+            "name": "static",
+            "max_size": mirror_cfg.get("max_size", 1024),
+            "bitrate": mirror_cfg.get("bitrate", 4000000),
+            "max_fps": mirror_cfg.get("max_fps", 30),
+        }
+        if not mirror_cfg.get("adaptive", True):
+            return static
+
+        profile = self.link_profiles.get(serial)
+        if not profile:
+            if not blocking:
+                self._in_background(f"link:{serial}", self._probe_link, serial)
+                return static
+            profile = self._probe_link(serial)
+            if not profile:
+                return static
+        return QUALITY_LADDER[profile["rung"]]
+
+    def resolve_settings(self, serial: str, profile: Optional[str] = None, blocking: bool = False) -> dict:
+        """
+        Concrete settings for a mirroring profile (low-latency, balanced,
+        high-quality) on this device: link rung + codec/encoder + buffers.
+        Safe to call from the UI thread unless `blocking` (probes run inline).
+        """
+        profile = profile or cfg.get("screen_mirroring").get("profile", "balanced")
+        if blocking:
+            encoders = self.encoder_cache.get(self.scrcpy_path, serial)
+        else:
+            # Unknown devices start with scrcpy's default encoder; the listing is ready next time
+            encoders = self.encoder_cache.lookup(serial)
+            if not self.encoder_cache.is_known(serial):
+                self._in_background(f"encoders:{serial}", self.encoder_cache.get, self.scrcpy_path, serial)
+        return resolve_profile(profile, encoders, self._select_rung(serial, blocking))
 
-    def start_mirroring(self, ip_address: str, embed_window_id: Optional[int] = None):
+    def add_listener(self, callback: Callable[[dict], None]):
+        """
+        Register a callback for mirroring events (fps, error, warning, device,
+        resolution, exit). Called from reader threads.
+        """
+        self._listeners.append(callback)
+
+    def metrics(self) -> dict:
+        """Structured metrics parsed from the current scrcpy session."""
+        metrics = self.output.metrics()
+        metrics["running"] = bool(self.process and self.process.poll() is None)
+        metrics["settings"] = self.current_settings
+        return metrics
+
+    def log_tail(self) -> List[str]:
+        """Most recent scrcpy output lines, for diagnostics."""
+        return list(self.output.tail)
+
+    def _drain(self, process: subprocess.Popen, stream, name: str, serial: str):
+        """Read one pipe to EOF so scrcpy never blocks on a full buffer."""
+        for line in stream:
+            event = self.output.feed(line, name)
+            if event:
+                self._dispatch(event)
+                if event["type"] == "fps":
+                    self._check_drops(process, serial, event)
+        if name == "stderr":
+            process.wait()
+            self._dispatch({
+                "type": "exit",
+                "returncode": process.returncode,
+                "expected": process is self._stopping,
+            })
+
+    def _dispatch(self, event: dict):
+        for callback in self._listeners:
+            try:
+                callback(event)
+            except Exception as e:
+                logger.error(f"Mirroring listener failed: {e}")
+
+    def _check_drops(self, process: subprocess.Popen, serial: str, event: dict):
+        """Step down the quality ladder on sustained frame drops."""
+        total = event["fps"] + event["skipped"]
+        if total and event["skipped"] / total > DROP_RATIO:
+            self._bad_reports += 1
+        else:
+            self._bad_reports = 0
+
+        if self._bad_reports >= DROP_REPORTS and cfg.get("screen_mirroring").get("adaptive", True):
+            self._bad_reports = 0
+            rung = self.link_profiles.demote(serial)
+            if rung is None:
+                return
+            logger.warning(f"Sustained frame drops on {serial}, restarting at {QUALITY_LADDER[rung]['name']}")
+            # Restart from a fresh thread; this one is reading the pipe being closed
+            threading.Thread(target=self._restart, args=(process,), daemon=True).start()
+
+    def _restart(self, process: subprocess.Popen):
+        with self._lock:
+            if self.process is not process or not self._session:
+                return  # Stopped or replaced meanwhile
+            ip_address, embed_window_id, profile = self._session
+            self.stop_mirroring()
+            self.start_mirroring(ip_address, embed_window_id, profile)
+
+    def start_mirroring(self, ip_address: str, embed_window_id: Optional[int] = None,
+                        profile: Optional[str] = None) -> bool:
         """
         Start scrcpy for the given IP.
         embed_window_id: X11 window ID to embed into (for Qt integration)
+        profile: mirroring profile name; defaults to the configured one
+        Returns False if scrcpy could not be launched.
         """
         if self.process and self.process.poll() is None:
             logger.warning("Scrcpy already running")
-            return
+            return True
 
+        serial = f"{ip_address}:5555"
+        settings = self.resolve_settings(serial, profile)
+        if not cfg.get("audio_forwarding", True):
+            settings.update(audio_codec=None, audio_buffer=None)
+        self.current_settings = settings
         cmd = [
             self.scrcpy_path,
-            "--serial", f"{ip_address}:5555",  # Target specific device
+            "--serial", serial,  # Target specific device
             "--window-title", f"Mirror: {ip_address}",
             "--stay-awake",
-            # Optimization for wireless
-            "--max-size", str(cfg.get("screen_mirroring").get("max_size", 1024)),
-            "--video-bit-rate", str(cfg.get("screen_mirroring").get("bitrate", 4000000)),
-            "--max-fps", str(cfg.get("screen_mirroring").get("max_fps", 30))
-        ]
+            "--print-fps",
+        ] + profile_args(settings)  # Codec, bitrate and buffers for wireless
 
         if not cfg.get("audio_forwarding", True):
             cmd.append("--no-audio")
@@ -43,7 +208,6 @@ class ScrcpyManager:
         # SDL_WINDOWID environment variable is often used by scrcpy (SDL based)
         env = None
         if embed_window_id:
-             import os
              env = os.environ.copy()
              env["SDL_WINDOWID"] = str(embed_window_id)
 
@@ -53,20 +217,258 @@ class ScrcpyManager:
                 cmd,
                 env=env,
                 stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
+                stderr=subprocess.PIPE,
+                text=True,
+                errors="replace"
             )
+            self._session = (ip_address, embed_window_id, profile)
+            self.output = ScrcpyOutputParser()
+            self._bad_reports = 0
+            for stream, name in ((self.process.stdout, "stdout"), (self.process.stderr, "stderr")):
+                threading.Thread(
+                    target=self._drain, args=(self.process, stream, name, serial),
+                    name=f"scrcpy-{name}", daemon=True
+                ).start()
+            return True
         except FileNotFoundError:
             logger.error("Scrcpy executable not found")
         except Exception as e:
             logger.error(f"Failed to start scrcpy: {e}")
+        return False
 
     def stop_mirroring(self):
         """Stop the scrcpy process."""
-        if self.process:
-            self.process.terminate()
+        with self._lock:
+            self._session = None
+            if self.process:
+                self._stopping = self.process
+                self.process.terminate()
+                try:
+                    self.process.wait(timeout=2)
+                except subprocess.TimeoutExpired:
+                    self.process.kill()
+                self.process = None
+
+
+def process_usage(pid: int) -> Optional[dict]:
+    """CPU seconds and RSS of a child process, read from /proc (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # Fields after the parenthesised command name; utime/stime are 14th/15th overall
+            fields = f.read().rsplit(")", 1)[1].split()
+        rss_kb = 0
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    rss_kb = int(line.split()[1])
+                    break
+    except (OSError, IndexError, ValueError):
+        return None
+    ticks = os.sysconf("SC_CLK_TCK")
+    return {"cpu_seconds": (int(fields[11]) + int(fields[12])) / ticks, "rss_kb": rss_kb}
+
+
+class MirrorSupervisor:
+    """
+    Runs one mirroring session per device.
+    Restarts sessions that exit unexpectedly (with exponential backoff),
+    pre-warms ADB and probe caches so starting is near-instant, samples
+    CPU/RSS per scrcpy child and stops sessions whose ADB transport is gone.
+    """
+
+    MONITOR_INTERVAL = 2.0
+    MAX_BACKOFF = 30.0
+    STABLE_AFTER = 60.0   # Seconds of uptime that reset the backoff
+    MAX_RESTARTS = 5
+    ORPHAN_GRACE = 5.0    # Seconds without an ADB transport before stopping
+
+    def __init__(self, adb_controller=None, link_profiles: Optional[LinkProfileCache] = None,
+                 encoder_cache: Optional[EncoderCache] = None):
+        self.adb_controller = adb_controller
+        # One cache per file for all sessions, so devices don't erase each other's entries
+        self.link_profiles = link_profiles or shared_link_profile_cache()
+        self.encoder_cache = encoder_cache or shared_encoder_cache()
+        self.scrcpy_path = cfg.get("scrcpy_path", "scrcpy")
+        self.sessions: Dict[str, dict] = {}  # ip -> session state
+        self._listeners: List[Callable[[dict], None]] = []
+        self._lock = threading.RLock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._prewarming = set()  # Serials with a pre-warm in flight
+
+    def is_available(self) -> bool:
+        return shutil.which(self.scrcpy_path) is not None
+
+    def add_listener(self, callback: Callable[[dict], None]):
+        """Events from all sessions, with an added "ip" key. Called from worker threads."""
+        self._listeners.append(callback)
+
+    def _dispatch(self, ip: str, event: dict):
+        event = dict(event, ip=ip)
+        for callback in self._listeners:
+            try:
+                callback(event)
+            except Exception as e:
+                logger.error(f"Mirroring listener failed: {e}")
+
+    def _session(self, ip: str) -> dict:
+        with self._lock:
+            session = self.sessions.get(ip)
+            if not session:
+                manager = ScrcpyManager(self.link_profiles, self.encoder_cache)
+                manager.add_listener(lambda event, ip=ip: self._on_event(ip, event))
+                session = {
+                    "manager": manager, "wanted": False, "profile": None,
+                    "restarts": 0, "backoff": 1.0, "restart_at": None,
+                    "started_at": None, "orphaned_since": None,
+                    "cpu_seconds": 0.0, "rss_kb": 0, "peak_rss_kb": 0,
+                }
+                self.sessions[ip] = session
+            return session
+
+    def manager(self, ip: str) -> Optional[ScrcpyManager]:
+        session = self.sessions.get(ip)
+        return session["manager"] if session else None
+
+    def is_running(self, ip: str) -> bool:
+        manager = self.manager(ip)
+        return bool(manager and manager.process and manager.process.poll() is None)
+
+    def prewarm(self, ip: str, serial: Optional[str] = None):
+        """
+        Attach an ADB transport and fill the link/encoder caches in the
+        background. The device ADB features currently target is left alone.
+        """
+        serial = serial or f"{ip}:5555"
+        with self._lock:
+            if serial in self._prewarming:
+                return
+            self._prewarming.add(serial)
+
+        def warm():
+            started = time.perf_counter()
             try:
-                self.process.wait(timeout=2)
-            except subprocess.TimeoutExpired:
-                self.process.kill()
-            self.process = None
+                if self.adb_controller and not self.adb_controller.attach(ip):
+                    return
+                if self.is_available():
+                    self._session(ip)["manager"].resolve_settings(serial, blocking=True)
+                logger.info(f"Mirroring pre-warmed for {ip} in {time.perf_counter() - started:.2f} s")
+            finally:
+                with self._lock:
+                    self._prewarming.discard(serial)
+        threading.Thread(target=warm, name="mirror-prewarm", daemon=True).start()
+
+    def start(self, ip: str, profile: Optional[str] = None) -> bool:
+        session = self._session(ip)
+        session.update(wanted=True, profile=profile, restart_at=None, orphaned_since=None)
+        if not session["manager"].start_mirroring(ip, profile=profile):
+            session["wanted"] = False
+            return False
+        session["started_at"] = time.monotonic()
+        self._ensure_monitor()
+        return True
+
+    def stop(self, ip: str):
+        session = self.sessions.get(ip)
+        if session:
+            session.update(wanted=False, restart_at=None)
+            session["manager"].stop_mirroring()
+
+    def restart(self, ip: str):
+        session = self.sessions.get(ip)
+        if session and session["wanted"]:
+            session["manager"].stop_mirroring()
+            self.start(ip, session["profile"])
+
+    def stop_all(self):
+        for ip in list(self.sessions):
+            self.stop(ip)
+        self._wake.set()
+
+    def _on_event(self, ip: str, event: dict):
+        if event["type"] == "exit" and not event["expected"]:
+            session = self.sessions.get(ip)
+            if session and session["wanted"]:
+                with self._lock:
+                    uptime = time.monotonic() - (session["started_at"] or time.monotonic())
+                    if uptime > self.STABLE_AFTER:
+                        session.update(backoff=1.0, restarts=0)
+                    if session["restarts"] >= self.MAX_RESTARTS:
+                        session["wanted"] = False
+                        event = dict(event, gave_up=True)
+                        logger.error(f"scrcpy for {ip} keeps exiting, giving up")
+                    else:
+                        session["restart_at"] = time.monotonic() + session["backoff"]
+                        logger.warning(f"scrcpy for {ip} exited ({event['returncode']}), "
+                                       f"restarting in {session['backoff']:.0f} s")
+                        session["backoff"] = min(session["backoff"] * 2, self.MAX_BACKOFF)
+                        session["restarts"] += 1
+                self._wake.set()  # Wake the monitor
+        self._dispatch(ip, event)
+
+    def _ensure_monitor(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._monitor, name="mirror-supervisor", daemon=True)
+        self._thread.start()
+
+    def _monitor(self):
+        while True:
+            self._wake.wait(self.MONITOR_INTERVAL)
+            self._wake.clear()
+            now = time.monotonic()
+            active = False
+
+            for ip, session in list(self.sessions.items()):
+                manager = session["manager"]
+                process = manager.process
+                if process and process.poll() is None:
+                    usage = process_usage(process.pid)
+                    if usage:
+                        session["cpu_seconds"] = usage["cpu_seconds"]
+                        session["rss_kb"] = usage["rss_kb"]
+                        session["peak_rss_kb"] = max(session["peak_rss_kb"], usage["rss_kb"])
+
+                if session["wanted"]:
+                    active = True
+                    self._check_orphan(ip, session, now)
+
+                if session["wanted"] and session["restart_at"] and now >= session["restart_at"]:
+                    session["restart_at"] = None
+                    if not manager.start_mirroring(ip, profile=session["profile"]):
+                        self._on_event(ip, {"type": "exit", "returncode": None, "expected": False})
+                    else:
+                        session["started_at"] = now
+                        self._dispatch(ip, {"type": "restarted", "restarts": session["restarts"]})
+
+            if not active:
+                return
+
+    def _check_orphan(self, ip: str, session: dict, now: float):
+        """Stop sessions whose ADB transport has disappeared."""
+        tracker = self.adb_controller.tracker if self.adb_controller else None
+        if not tracker or not tracker.is_running():
+            return
+        if tracker.state(f"{ip}:5555") == "device":
+            session["orphaned_since"] = None
+            return
+        if session["orphaned_since"] is None:
+            session["orphaned_since"] = now
+        elif now - session["orphaned_since"] > self.ORPHAN_GRACE:
+            logger.warning(f"ADB transport to {ip} is gone, stopping orphaned mirror")
+            self.stop(ip)
+            self._dispatch(ip, {"type": "orphaned"})
 
+    def stats(self) -> Dict[str, dict]:
+        """Per-device session state and scrcpy resource usage."""
+        return {
+            ip: {
+                "running": self.is_running(ip),
+                "restarts": session["restarts"],
+                "cpu_seconds": round(session["cpu_seconds"], 2),
+                "rss_mb": round(session["rss_kb"] / 1024, 1),
+                "peak_rss_mb": round(session["peak_rss_kb"] / 1024, 1),
+                "fps": session["manager"].output.fps,
+            }
+            for ip, session in self.sessions.items()
+        }
@@ -0,0 +1,106 @@
+# Copyright (c) 2025 Rex Ackermann. All rights reserved.
+# Licensed under the MIT License.
+import re
+import time
+from collections import deque
+from typing import Optional
+
+FPS_LINE = re.compile(r"(\d+) fps(?: \(\+(\d+) frames? skipped\))?")
+DEVICE_LINE = re.compile(r"Device: (.+)")
+TEXTURE_LINE = re.compile(r"Texture: (\d+)x(\d+)")
+RENDERER_LINE = re.compile(r"Renderer: (.+)")
+VERSION_LINE = re.compile(r"^scrcpy (\S+)")
+LEVEL_PREFIX = re.compile(r"^(VERBOSE|DEBUG|INFO|WARN|ERROR):\s*(.*)$")
+
+
+class ScrcpyOutputParser:
+    """
+    Turns scrcpy's stdout/stderr lines into metrics and events.
+    Keeps a bounded tail of raw output for diagnostics.
+    """
+
+    def __init__(self, tail_size: int = 200, fps_history: int = 60):
+        self.tail = deque(maxlen=tail_size)
+        self.fps_history = deque(maxlen=fps_history)
+        self.started = time.monotonic()
+        self.first_frame_at: Optional[float] = None
+        self.version = None
+        self.device = None
+        self.resolution = None
+        self.renderer = None
+        self.fps = 0
+        self.frames_skipped = 0
+        self.errors = 0
+        self.warnings = 0
+        self.last_error: Optional[str] = None
+
+    def feed(self, line: str, stream: str = "stdout") -> Optional[dict]:
+        """Parse one output line; returns an event dict for notable lines."""
+        line = line.rstrip()
+        if not line:
+            return None
+        self.tail.append(f"[{stream}] {line}")
+
+        level, message = "INFO", line
+        prefixed = LEVEL_PREFIX.match(line)
+        if prefixed:
+            level, message = prefixed.groups()
+
+        match = FPS_LINE.search(message)
+        if match:
+            self.fps = int(match.group(1))
+            skipped = int(match.group(2) or 0)
+            self.frames_skipped += skipped
+            self.fps_history.append((self.fps, skipped))
+            return {"type": "fps", "fps": self.fps, "skipped": skipped}
+
+        match = TEXTURE_LINE.search(message)
+        if match:
+            self.resolution = (int(match.group(1)), int(match.group(2)))
+            # The first texture is allocated when the first frame is decoded
+            if self.first_frame_at is None:
+                self.first_frame_at = time.monotonic()
+            return {"type": "resolution", "width": self.resolution[0], "height": self.resolution[1]}
+
+        match = DEVICE_LINE.search(message)
+        if match:
+            self.device = match.group(1).strip()
+            return {"type": "device", "name": self.device}
+
+        match = RENDERER_LINE.search(message)
+        if match:
+            self.renderer = match.group(1).strip()
+            return None
+
+        match = VERSION_LINE.match(line)
+        if match:
+            self.version = match.group(1)
+            return None
+
+        if level == "ERROR":
+            self.errors += 1
+            self.last_error = message
+            return {"type": "error", "message": message}
+        if level == "WARN":
+            self.warnings += 1
+            return {"type": "warning", "message": message}
+        return None
+
+    def metrics(self) -> dict:
+        history = list(self.fps_history)
+        avg_fps = sum(f for f, _ in history) / len(history) if history else 0.0
+        return {
+            "version": self.version,
+            "device": self.device,
+            "resolution": self.resolution,
+            "renderer": self.renderer,
+            "fps": self.fps,
+            "avg_fps": round(avg_fps, 1),
+            "frames_skipped": self.frames_skipped,
+            "errors": self.errors,
+            "warnings": self.warnings,
+            "last_error": self.last_error,
+            "time_to_first_frame": (
+                round(self.first_frame_at - self.started, 3) if self.first_frame_at else None
+            ),
+        }
@@ -0,0 +1,194 @@
+# Copyright (c) 2025 Rex Ackermann. All rights reserved.
+# Licensed under the MIT License.
+import os
+import re
+import json
+import time
+import threading
+import subprocess
+import logging
+from pathlib import Path
+from typing import Optional, List, Dict
+from config import cfg
+
+logger = logging.getLogger(__name__)
+
+# "--video-codec=h265 --video-encoder=c2.qti.hevc.encoder   (hw) [vendor]"
+ENCODER_LINE = re.compile(r"--(video|audio)-codec=(\w+)\s+--\1-encoder=(\S+)(.*)")
+
+# Codec preference, bitrate scale and buffering per profile.
+# Bitrate scales are relative to the link-selected rung; newer codecs need
+# fewer bits for the same quality.
+PROFILES = {
+    "low-latency": {
+        "codecs": ["h264", "h265"],  # H.264 hardware encoders have the shortest pipelines
+        "bitrate_scale": 0.75,
+        "video_buffer": 0,
+        "audio_codec": "opus",
+        "audio_buffer": 30,
+    },
+    "balanced": {
+        "codecs": ["h265", "h264"],
+        "bitrate_scale": 1.0,
+        "video_buffer": 50,
+        "audio_codec": "opus",
+        "audio_buffer": 60,
+    },
+    "high-quality": {
+        "codecs": ["av1", "h265", "h264"],
+        "bitrate_scale": 1.5,
+        "video_buffer": 200,
+        "audio_codec": "aac",
+        "audio_buffer": 120,
+    },
+}
+
+CODEC_EFFICIENCY = {"h264": 1.0, "h265": 0.6, "av1": 0.5}
+
+
+def parse_encoders(output: str) -> dict:
+    """Parse `scrcpy --list-encoders` into {"video": [...], "audio": [...]}."""
+    encoders = {"video": [], "audio": []}
+    for line in output.splitlines():
+        match = ENCODER_LINE.search(line)
+        if match:
+            kind, codec, name, rest = match.groups()
+            encoders[kind].append({
+                "codec": codec,
+                "encoder": name,
+                "hw": "(hw)" in rest,
+            })
+    return encoders
+
+
+def _pick_encoder(candidates: List[dict], codecs: List[str]) -> Optional[dict]:
+    """First hardware encoder in codec preference order, else first software one."""
+    for want_hw in (True, False):
+        for codec in codecs:
+            for enc in candidates:
+                if enc["codec"] == codec and enc["hw"] == want_hw:
+                    return enc
+    return None
+
+
+def resolve_profile(name: str, encoders: Optional[dict], base: dict) -> dict:
+    """
+    Turn a profile name into concrete scrcpy settings for one device.
+    `base` is the link-selected rung (max_size, bitrate, max_fps).
+    """
+    profile = PROFILES.get(name, PROFILES["balanced"])
+    video = _pick_encoder((encoders or {}).get("video", []), profile["codecs"])
+    codec = video["codec"] if video else "h264"
+
+    scale = profile["bitrate_scale"]
+    if name != "high-quality":
+        # Spend efficiency gains on bandwidth rather than quality
+        scale *= CODEC_EFFICIENCY.get(codec, 1.0)
+
+    audio_codecs = [a["codec"] for a in (encoders or {}).get("audio", [])]
+    audio_codec = profile["audio_codec"] if not audio_codecs or profile["audio_codec"] in audio_codecs else "opus"
+
+    settings = dict(base)
+    settings.update({
+        "profile": name,
+        "video_codec": codec,
+        "video_encoder": video["encoder"] if video else None,
+        "bitrate": int(base["bitrate"] * scale),
+        "video_buffer": profile["video_buffer"],
+        "audio_codec": audio_codec,
+        "audio_buffer": profile["audio_buffer"],
+    })
+    return settings
+
+
+def profile_args(settings: dict) -> List[str]:
+    """scrcpy flags for resolved settings."""
+    args = [
+        "--max-size", str(settings["max_size"]),
+        "--video-bit-rate", str(settings["bitrate"]),
+        "--max-fps", str(settings["max_fps"]),
+    ]
+    if settings.get("video_codec"):
+        args += [f"--video-codec={settings['video_codec']}"]
+    if settings.get("video_encoder"):
+        args += [f"--video-encoder={settings['video_encoder']}"]
+    if settings.get("video_buffer") is not None:
+        args += [f"--video-buffer={settings['video_buffer']}"]
+    if settings.get("audio_codec"):
+        args += [f"--audio-codec={settings['audio_codec']}"]
+    if settings.get("audio_buffer") is not None:
+        args += [f"--audio-buffer={settings['audio_buffer']}"]
+    return args
+
+
+class EncoderCache:
+    """
+    Per-device `scrcpy --list-encoders` results, persisted with a TTL.
+    Failed or empty probes are remembered for `negative_ttl` so a device
+    scrcpy cannot talk to is not re-probed on every start.
+    """
+
+    def __init__(self, path: Optional[Path] = None, ttl: float = 7 * 24 * 3600,
+                 negative_ttl: float = 300):
+        self.path = path or cfg.CONFIG_DIR / "scrcpy_encoders.json"
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = {}
+        self._failures: Dict[str, float] = {}  # serial -> time of the failed probe
+        self._lock = threading.Lock()  # Probes for several devices run on worker threads
+        try:
+            self._entries = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            pass
+
+    def lookup(self, serial: str) -> Optional[dict]:
+        """Cached encoders, without probing."""
+        entry = self._entries.get(serial)
+        if entry and time.time() - entry["probed_at"] <= self.ttl:
+            return entry["encoders"]
+        return None
+
+    def is_known(self, serial: str) -> bool:
+        """True if a probe would be served from the cache (success or recent failure)."""
+        return (self.lookup(serial) is not None or
+                time.time() - self._failures.get(serial, float("-inf")) <= self.negative_ttl)
+
+    def get(self, scrcpy_path: str, serial: str) -> Optional[dict]:
+        """Cached encoders, probing (blocking, up to 20 s) when unknown."""
+        if self.is_known(serial):
+            return self.lookup(serial)
+
+        try:
+            result = subprocess.run(
+                [scrcpy_path, "--serial", serial, "--list-encoders"],
+                capture_output=True, text=True, timeout=20
+            )
+            encoders = parse_encoders(result.stdout + result.stderr)
+        except Exception as e:
+            logger.error(f"scrcpy --list-encoders failed: {e}")
+            encoders = None
+
+        with self._lock:
+            if not encoders or not encoders["video"]:
+                self._failures[serial] = time.time()
+                return None
+            self._failures.pop(serial, None)
+            self._entries[serial] = {"encoders": encoders, "probed_at": time.time()}
+            try:
+                tmp = self.path.with_suffix(".tmp")
+                tmp.write_text(json.dumps(self._entries))
+                os.replace(tmp, self.path)
+            except Exception as e:
+                logger.error(f"Failed to save encoder cache: {e}")
+        return encoders
+
+
+_shared_encoders: Optional[EncoderCache] = None
+
+
+def shared_encoder_cache() -> EncoderCache:
+    """The process-wide cache; separate instances would overwrite each other's file."""
+    global _shared_encoders
+    if _shared_encoders is None:
+        _shared_encoders = EncoderCache()
+    return _shared_encoders
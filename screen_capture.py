@@ -0,0 +1,397 @@
+# Copyright (c) 2025 Rex Ackermann. All rights reserved.
+# Licensed under the MIT License.
+import time
+import struct
+import zlib
+import asyncio
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, List
+
+try:
+    import resource  # POSIX only
+except ImportError:
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# screencap raw pixel formats (android.graphics.PixelFormat) we can decode
+PIXEL_FORMATS = {
+    1: "RGBA_8888",
+    2: "RGBX_8888",
+}
+BYTES_PER_PIXEL = 4
+
+# Android 9+ appends a colorspace word to the raw screencap header
+HEADER_SIZE_LEGACY = 12
+HEADER_SIZE_V2 = 16
+
+# `adb shell -T` (no pty, stdin forwarded, binary-safe stdout) needs the shell v2 protocol, Android 7.0+
+SHELL_V2_MIN_SDK = 24
+# Device-paced interval used for on-demand streams on devices without shell v2
+ON_DEMAND_FALLBACK_INTERVAL = 0.5
+
+
+class ScreenFrame:
+    """
+    A single screen capture held in memory.
+    `data` is raw RGBA pixels for format "raw", or an encoded PNG for format "png".
+    """
+    __slots__ = ("width", "height", "format", "data", "latency", "transferred")
+
+    def __init__(self, width: int, height: int, format: str, data: bytes,
+                 latency: float = 0.0, transferred: int = 0):
+        self.width = width
+        self.height = height
+        self.format = format
+        self.data = data
+        self.latency = latency          # Seconds from request to last byte
+        self.transferred = transferred  # Bytes read from the ADB transport
+
+    def stats(self) -> dict:
+        return {
+            "format": self.format,
+            "width": self.width,
+            "height": self.height,
+            "latency_ms": round(self.latency * 1000, 1),
+            "bytes": self.transferred,
+        }
+
+
+def header_size_for_sdk(sdk: Optional[int]) -> int:
+    """Raw screencap header size for a given Android SDK level."""
+    if sdk is not None and sdk < 28:
+        return HEADER_SIZE_LEGACY
+    return HEADER_SIZE_V2
+
+
+def parse_header(buf: bytes):
+    """Return (width, height, pixel_format) from the start of a raw screencap."""
+    return struct.unpack_from("<III", buf, 0)
+
+
+def parse_raw(buf: bytes) -> Optional[ScreenFrame]:
+    """
+    Parse the output of `screencap` (no -p) into a raw RGBA frame.
+    The header size is inferred from the payload length so both the
+    legacy and the Android 9+ layouts are accepted.
+    """
+    if len(buf) < HEADER_SIZE_LEGACY:
+        return None
+
+    width, height, pixel_format = parse_header(buf)
+    if pixel_format not in PIXEL_FORMATS:
+        logger.error(f"Unsupported screencap pixel format: {pixel_format}")
+        return None
+
+    header = len(buf) - width * height * BYTES_PER_PIXEL
+    if header not in (HEADER_SIZE_LEGACY, HEADER_SIZE_V2):
+        logger.error(f"Unexpected screencap payload size ({len(buf)} bytes for {width}x{height})")
+        return None
+
+    return ScreenFrame(width, height, "raw", buf[header:], transferred=len(buf))
+
+
+def parse_png_size(buf: bytes):
+    """Return (width, height) from a PNG IHDR chunk."""
+    if len(buf) < 24 or buf[:8] != b"\x89PNG\r\n\x1a\n":
+        return None
+    return struct.unpack(">II", buf[16:24])
+
+
+def encode_png(width: int, height: int, rgba: bytes, level: int = 1) -> bytes:
+    """
+    Encode RGBA pixels to PNG using only the standard library.
+    A low zlib level keeps encoding cheap; this runs off the UI thread.
+    """
+    stride = width * BYTES_PER_PIXEL
+    view = memoryview(rgba)
+    scanlines = b"".join(
+        b"\x00" + view[row * stride:(row + 1) * stride] for row in range(height)
+    )
+
+    def chunk(tag: bytes, payload: bytes) -> bytes:
+        body = tag + payload
+        return struct.pack(">I", len(payload)) + body + struct.pack(">I", zlib.crc32(body) & 0xFFFFFFFF)
+
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)  # 8-bit RGBA
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", ihdr)
+        + chunk(b"IDAT", zlib.compress(scanlines, level))
+        + chunk(b"IEND", b"")
+    )
+
+
+def frame_to_png(frame: ScreenFrame) -> bytes:
+    """Return PNG bytes for a frame, encoding raw captures as needed."""
+    if frame.format == "png":
+        return frame.data
+    return encode_png(frame.width, frame.height, frame.data)
+
+
+class FrameStream:
+    """
+    Persistent raw screencap stream over a single adb process.
+    The TV runs a capture loop and raw frames are read back-to-back;
+    each frame is delimited by its own header. In on-demand mode a device
+    shell is fed one `screencap` per frame; `exec-out` never forwards host
+    stdin, so that mode uses `adb shell -T`.
+    """
+
+    def __init__(self, adb_path: str, serial: str, interval: Optional[float] = 0.0, sdk: Optional[int] = None):
+        self.adb_path = adb_path
+        self.serial = serial
+        # interval=None: on-demand mode, one frame per read_frame() call (host paced)
+        if interval is None and sdk is not None and sdk < SHELL_V2_MIN_SDK:
+            interval = ON_DEMAND_FALLBACK_INTERVAL
+        self.interval = interval
+        self.header_size = header_size_for_sdk(sdk)
+        self.process: Optional[asyncio.subprocess.Process] = None
+
+    async def start(self):
+        if self.interval is None:
+            # Persistent shell fed with one `screencap` per requested frame
+            args = ["shell", "-T", "sh"]
+        else:
+            args = ["exec-out", f"while true; do screencap; sleep {self.interval:.3f}; done"]
+        self.process = await asyncio.create_subprocess_exec(
+            self.adb_path, "-s", self.serial, *args,
+            stdin=asyncio.subprocess.PIPE if self.interval is None else asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+
+    async def read_frame(self) -> Optional[ScreenFrame]:
+        """Read the next frame, or None when the stream has ended."""
+        if not self.process:
+            return None
+        started = time.perf_counter()
+        try:
+            if self.interval is None:
+                self.process.stdin.write(b"screencap\n")
+                await self.process.stdin.drain()
+            header = await self.process.stdout.readexactly(self.header_size)
+            width, height, pixel_format = parse_header(header)
+            if pixel_format not in PIXEL_FORMATS:
+                logger.error(f"Unsupported screencap pixel format: {pixel_format}")
+                return None
+            data = await self.process.stdout.readexactly(width * height * BYTES_PER_PIXEL)
+        except (asyncio.IncompleteReadError, ConnectionResetError, BrokenPipeError):
+            return None
+
+        return ScreenFrame(width, height, "raw", data,
+                           latency=time.perf_counter() - started,
+                           transferred=self.header_size + len(data))
+
+    async def stop(self):
+        if self.process and self.process.returncode is None:
+            self.process.terminate()
+            try:
+                await asyncio.wait_for(self.process.wait(), timeout=2)
+            except asyncio.TimeoutError:
+                self.process.kill()
+        self.process = None
+
+
+class TileDiffer:
+    """
+    Finds which fixed-size tiles changed between consecutive raw frames.
+    Whole rows are compared first so unchanged bands are skipped cheaply.
+    """
+
+    def __init__(self, tile_size: int = 64):
+        self.tile_size = tile_size
+        self._previous: Optional[ScreenFrame] = None
+
+    def reset(self):
+        self._previous = None
+
+    def diff(self, frame: ScreenFrame) -> List[tuple]:
+        """Return changed tiles as (x, y, w, h); the full frame if there is no baseline."""
+        prev = self._previous
+        self._previous = frame
+        if not prev or (prev.width, prev.height) != (frame.width, frame.height):
+            return [(0, 0, frame.width, frame.height)]
+
+        # bytes slices compare with memcmp; memoryview comparison is far slower
+        stride = frame.width * BYTES_PER_PIXEL
+        old, new = prev.data, frame.data
+        if old == new:
+            return []
+        size = self.tile_size
+        tiles = []
+
+        for band_y in range(0, frame.height, size):
+            band_h = min(size, frame.height - band_y)
+            changed_rows = [
+                y for y in range(band_y, band_y + band_h)
+                if old[y * stride:(y + 1) * stride] != new[y * stride:(y + 1) * stride]
+            ]
+            if not changed_rows:
+                continue
+
+            for band_x in range(0, frame.width, size):
+                band_w = min(size, frame.width - band_x)
+                start = band_x * BYTES_PER_PIXEL
+                end = start + band_w * BYTES_PER_PIXEL
+                for y in changed_rows:
+                    row = y * stride
+                    if old[row + start:row + end] != new[row + start:row + end]:
+                        tiles.append((band_x, band_y, band_w, band_h))
+                        break
+        return tiles
+
+
+def extract_tile(frame: ScreenFrame, x: int, y: int, w: int, h: int) -> bytes:
+    """Copy one tile's RGBA pixels out of a raw frame."""
+    stride = frame.width * BYTES_PER_PIXEL
+    view = memoryview(frame.data)
+    start = x * BYTES_PER_PIXEL
+    end = start + w * BYTES_PER_PIXEL
+    return b"".join(view[row * stride + start:row * stride + end] for row in range(y, y + h))
+
+
+class AdaptiveRate:
+    """
+    Picks the delay before the next capture from measured link throughput,
+    so a preview uses at most `utilization` of the link.
+    """
+
+    def __init__(self, min_interval: float = 0.2, max_interval: float = 5.0,
+                 utilization: float = 0.5, smoothing: float = 0.3):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.utilization = utilization
+        self.smoothing = smoothing
+        self.throughput = 0.0  # Bytes/s (EWMA)
+
+    def record(self, frame: ScreenFrame):
+        if frame.latency <= 0:
+            return
+        sample = frame.transferred / frame.latency
+        if not self.throughput:
+            self.throughput = sample
+        else:
+            self.throughput += self.smoothing * (sample - self.throughput)
+
+    def next_delay(self, frame: ScreenFrame) -> float:
+        """Idle time after `frame` so transfers occupy the target link share."""
+        if not self.throughput:
+            return self.min_interval
+        busy = frame.transferred / self.throughput
+        period = busy / self.utilization
+        return max(self.min_interval, min(self.max_interval, period - busy))
+
+
+class CapturePipeline:
+    """
+    Burst / timelapse capture: a producer task pulls frames from a FrameStream
+    into a bounded queue, and a consumer encodes and writes them in a thread pool.
+    Consecutive identical frames are skipped; frames arriving while the queue
+    is full are dropped rather than stalling the stream.
+    """
+
+    def __init__(self, stream: FrameStream, output_dir: str, max_frames: int = 0,
+                 queue_size: int = 8, encoders: int = 2):
+        self.stream = stream
+        self.output_dir = Path(output_dir)
+        self.max_frames = max_frames  # 0 = until stopped
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.encoders = encoders
+        self._pool = ThreadPoolExecutor(max_workers=encoders, thread_name_prefix="capture-encode")
+        self._tasks: List[asyncio.Task] = []
+        self._last_digest: Optional[bytes] = None
+        self._buffered_bytes = 0
+        self._started = 0.0
+        self._session = ""
+
+        self.captured = 0
+        self.written = 0
+        self.duplicates = 0
+        self.dropped = 0
+        self.peak_buffered_bytes = 0
+
+    async def start(self):
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        await self.stream.start()
+        self._started = time.perf_counter()
+        self._session = time.strftime("%Y%m%d_%H%M%S")
+        # One consumer per encoder thread so encoding overlaps
+        self._tasks = [asyncio.create_task(self._produce())]
+        self._tasks += [asyncio.create_task(self._consume()) for _ in range(self.encoders)]
+
+    async def wait(self):
+        """Wait until max_frames have been written (or the stream ends)."""
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.stream.stop()
+        # Pending encodes finish in the pool; don't block the event loop on them
+        await asyncio.get_running_loop().run_in_executor(None, self._pool.shutdown)
+
+    def _account(self, delta: int):
+        self._buffered_bytes += delta
+        self.peak_buffered_bytes = max(self.peak_buffered_bytes, self._buffered_bytes)
+
+    async def _produce(self):
+        while not self.max_frames or self.captured < self.max_frames:
+            frame = await self.stream.read_frame()
+            if frame is None:
+                break
+
+            digest = hashlib.blake2b(frame.data, digest_size=16).digest()
+            if digest == self._last_digest:
+                self.duplicates += 1
+                continue
+
+            self.captured += 1
+            try:
+                self.queue.put_nowait((self.captured, frame))
+                self._account(len(frame.data))
+                # Only a queued frame is a baseline; after a drop the next identical one is kept
+                self._last_digest = digest
+            except asyncio.QueueFull:
+                self.dropped += 1
+
+        # End-of-stream marker for every consumer
+        for _ in range(self.encoders):
+            await self.queue.put(None)
+
+    async def _consume(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self.queue.get()
+            if item is None:
+                break
+            index, frame = item
+            path = self.output_dir / f"capture_{self._session}_{index:05d}.png"
+            try:
+                await loop.run_in_executor(self._pool, self._encode_and_write, frame, path)
+                self.written += 1
+            except Exception as e:
+                logger.error(f"Failed to write {path.name}: {e}")
+            finally:
+                self._account(-len(frame.data))
+
+    @staticmethod
+    def _encode_and_write(frame: ScreenFrame, path: Path):
+        path.write_bytes(frame_to_png(frame))
+
+    def stats(self) -> dict:
+        elapsed = time.perf_counter() - self._started if self._started else 0.0
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if resource else 0.0
+        return {
+            "captured": self.captured,
+            "written": self.written,
+            "duplicates": self.duplicates,
+            "dropped": self.dropped,
+            "fps": round(self.captured / elapsed, 2) if elapsed else 0.0,
+            "peak_buffered_mb": round(self.peak_buffered_bytes / (1024 * 1024), 1),
+            "peak_rss_mb": round(peak_rss, 1),
+        }
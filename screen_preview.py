@@ -0,0 +1,124 @@
+# Copyright (c) 2025 Rex Ackermann. All rights reserved.
+# Licensed under the MIT License.
+import asyncio
+import logging
+from typing import Optional
+from PyQt6.QtWidgets import QWidget
+from PyQt6.QtCore import Qt, QRect, QRectF
+from PyQt6.QtGui import QPainter, QImage, QColor
+
+from screen_capture import FrameStream, ScreenFrame, TileDiffer, AdaptiveRate, extract_tile
+
+logger = logging.getLogger(__name__)
+
+class ScreenPreviewWidget(QWidget):
+    """
+    Low-FPS live view of the TV used when scrcpy is not installed.
+    Frames come from an on-demand FrameStream; only tiles that changed
+    since the previous frame are converted and repainted.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("TV Preview")
+        self.setMinimumSize(480, 270)
+
+        self._image: Optional[QImage] = None
+        self._differ = TileDiffer()
+        self.rate = AdaptiveRate()
+        self._task: Optional[asyncio.Task] = None
+        self._stream: Optional[FrameStream] = None
+
+        # Stats
+        self.frames = 0
+        self.tiles_repainted = 0
+        self.tiles_total = 0
+
+    def start(self, stream: FrameStream):
+        if self._task and not self._task.done():
+            return
+        if self._stream:
+            asyncio.create_task(self._stream.stop())  # Previous stream ended on its own
+        self._stream = stream
+        self._differ.reset()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._stream:
+            await self._stream.stop()
+            self._stream = None
+
+    async def _run(self):
+        await self._stream.start()
+        while True:
+            frame = await self._stream.read_frame()
+            if frame is None:
+                logger.warning("Preview stream ended")
+                break
+            self.rate.record(frame)
+            self.apply_frame(frame)
+            await asyncio.sleep(self.rate.next_delay(frame))
+
+    def apply_frame(self, frame: ScreenFrame):
+        """Copy changed tiles into the backing image and schedule their repaint."""
+        tiles = self._differ.diff(frame)
+        self.frames += 1
+        self.tiles_repainted += len(tiles)
+        size = self._differ.tile_size
+        self.tiles_total += -(-frame.width // size) * -(-frame.height // size)
+        if not tiles:
+            return
+
+        if self._image is None or (self._image.width(), self._image.height()) != (frame.width, frame.height):
+            self._image = QImage(frame.width, frame.height, QImage.Format.Format_RGBA8888)
+            self._image.fill(QColor("#000000"))
+
+        painter = QPainter(self._image)
+        for x, y, w, h in tiles:
+            tile = QImage(extract_tile(frame, x, y, w, h), w, h, w * 4, QImage.Format.Format_RGBA8888)
+            painter.drawImage(x, y, tile)
+        painter.end()
+
+        target = self._target_rect()
+        sx = target.width() / frame.width
+        sy = target.height() / frame.height
+        for x, y, w, h in tiles:
+            self.update(QRectF(target.x() + x * sx, target.y() + y * sy, w * sx, h * sy).toAlignedRect().adjusted(-1, -1, 1, 1))
+
+    def _target_rect(self) -> QRect:
+        """Letterboxed area the frame is drawn into."""
+        if self._image is None:
+            return self.rect()
+        scaled = self._image.size().scaled(self.size(), Qt.AspectRatioMode.KeepAspectRatio)
+        x = (self.width() - scaled.width()) // 2
+        y = (self.height() - scaled.height()) // 2
+        return QRect(x, y, scaled.width(), scaled.height())
+
+    def stats(self) -> dict:
+        return {
+            "frames": self.frames,
+            "tiles_repainted": self.tiles_repainted,
+            "repaint_ratio": round(self.tiles_repainted / self.tiles_total, 3) if self.tiles_total else 0.0,
+            "throughput_kbps": round(self.rate.throughput * 8 / 1000, 1),
+        }
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(event.rect(), QColor("#000000"))
+        if self._image is None:
+            painter.setPen(QColor("#8b949e"))
+            painter.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter, "Waiting for first frame...")
+            return
+        painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+        painter.drawImage(self._target_rect(), self._image)
+
+    def closeEvent(self, event):
+        asyncio.create_task(self.stop())
+        event.accept()
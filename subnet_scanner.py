@@ -0,0 +1,110 @@
+# Copyright (c) 2025 Rex Ackermann. All rights reserved.
+# Licensed under the MIT License.
+import time
+import asyncio
+import ipaddress
+import logging
+from typing import Callable, Iterable, List, Optional
+import ifaddr  # Installed with zeroconf
+
+logger = logging.getLogger(__name__)
+
+# Remote v2 control, remote v2 pairing, ADB
+SCAN_PORTS = (6466, 6467, 5555)
+
+
+def local_subnets(min_prefix: int = 24, adapters: Optional[list] = None) -> List[ipaddress.IPv4Network]:
+    """
+    IPv4 subnets of the local interfaces (loopback excluded).
+    Networks wider than `min_prefix` are narrowed to the block around our
+    own address so a /16 does not turn into a 65k-host sweep.
+    """
+    subnets = []
+    for adapter in ifaddr.get_adapters() if adapters is None else adapters:
+        for ip in adapter.ips:
+            if not isinstance(ip.ip, str):
+                continue  # IPv6
+            address = ipaddress.IPv4Address(ip.ip)
+            if address.is_loopback or address.is_link_local:
+                continue
+            network = ipaddress.IPv4Network(f"{ip.ip}/{max(ip.network_prefix, min_prefix)}", strict=False)
+            if network not in subnets:
+                subnets.append(network)
+    return subnets
+
+
+class SubnetScanner:
+    """
+    TCP sweep for TVs on networks where multicast is blocked.
+    Connect attempts are bounded by a semaphore; the timeout adapts to
+    observed connect times (EWMA) within [min_timeout, max_timeout].
+    """
+
+    def __init__(self, ports: Iterable[int] = SCAN_PORTS, concurrency: int = 128,
+                 min_timeout: float = 0.1, max_timeout: float = 1.0):
+        self.ports = tuple(ports)
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self._slots = asyncio.Semaphore(concurrency)
+        self._rtt: Optional[float] = None
+
+        # Stats
+        self.attempts = 0
+        self.open_ports = 0
+        self.timeouts = 0
+        self.elapsed = 0.0
+
+    @property
+    def timeout(self) -> float:
+        if self._rtt is None:
+            return self.max_timeout / 2
+        # Wired/Wi-Fi LAN connects are milliseconds; allow a generous multiple
+        return min(max(self._rtt * 4, self.min_timeout), self.max_timeout)
+
+    def _observe(self, rtt: float):
+        self._rtt = rtt if self._rtt is None else 0.8 * self._rtt + 0.2 * rtt
+
+    async def _probe(self, host: str, port: int) -> bool:
+        async with self._slots:
+            self.attempts += 1
+            started = time.perf_counter()
+            try:
+                _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), self.timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                return False
+            except OSError:
+                # Refused, unreachable, no route: errors can return instantly
+                # (or from a router), so they are not RTT samples
+                return False
+            self._observe(time.perf_counter() - started)
+            writer.close()
+            self.open_ports += 1
+            return True
+
+    async def _probe_host(self, host: str, on_found: Callable[[str, List[int]], None]):
+        results = await asyncio.gather(*[self._probe(host, port) for port in self.ports])
+        open_ports = [port for port, ok in zip(self.ports, results) if ok]
+        if open_ports:
+            on_found(host, open_ports)
+
+    async def scan(self, hosts: Iterable[str], on_found: Callable[[str, List[int]], None]):
+        """Probe every host; `on_found(ip, open_ports)` is called as hosts answer."""
+        started = time.perf_counter()
+        await asyncio.gather(*[self._probe_host(str(host), on_found) for host in hosts])
+        self.elapsed = time.perf_counter() - started
+
+    async def scan_local(self, on_found: Callable[[str, List[int]], None]):
+        """Sweep the subnets of all local interfaces."""
+        for network in local_subnets():
+            logger.info(f"Scanning {network} for TVs")
+            await self.scan(network.hosts(), on_found)
+
+    def stats(self) -> dict:
+        return {
+            "attempts": self.attempts,
+            "open_ports": self.open_ports,
+            "timeouts": self.timeouts,
+            "timeout_ms": round(self.timeout * 1000),
+            "elapsed": round(self.elapsed, 3),
+        }
@@ -8,6 +8,24 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from config import Config
 from android_tv_controller import AndroidTVController
+from link_probe import QUALITY_LADDER, choose_rung
+from scrcpy_output import ScrcpyOutputParser
+from scrcpy_profiles import parse_encoders, resolve_profile, EncoderCache
+from scrcpy_manager import MirrorSupervisor
+from device_registry import DeviceRegistry
+from paired_devices import PairedDeviceRegistry
+from touchpad_kinetics import KineticEngine, SampleBuffer
+from gesture_recognizer import GestureRecognizer, TraceRecorder, load_trace, replay
+from device_discovery import DeviceDiscovery, SERVICE_V2, SERVICE_CAST, looks_like_tv
+from zeroconf import ServiceInfo
+from logcat import parse_line, LogFilter, LogRingBuffer
+from device_caps import parse_probe, SECTION_MARK, CapabilityCache, shared_capability_cache
+from apk_deploy import ApkDeployer
+from adb_controller import ADBController, parse_track_devices
+from file_sync import DirectorySync, HashCache
+from pointer_injector import PointerInjector
+from subnet_scanner import SubnetScanner, local_subnets
+from screen_capture import parse_raw, encode_png, parse_png_size, ScreenFrame, CapturePipeline, TileDiffer
 
 class TestTVRemote(unittest.TestCase):
     
@@ -44,5 +62,667 @@ class TestTVRemote(unittest.TestCase):
         self.assertTrue(os.path.exists(config.client_cert_path))
         self.assertTrue(os.path.exists(config.client_key_path))
 
+    def test_screencap_raw_to_png(self):
+        """Test raw screencap parsing and local PNG encoding."""
+        import struct
+        pixels = bytes([255, 0, 0, 255]) * (4 * 3)
+        # Android 9+ header: width, height, format, colorspace
+        raw = struct.pack("<IIII", 4, 3, 1, 0) + pixels
+        frame = parse_raw(raw)
+        self.assertEqual((frame.width, frame.height), (4, 3))
+        self.assertEqual(frame.data, pixels)
+        
+        png = encode_png(frame.width, frame.height, frame.data)
+        self.assertEqual(parse_png_size(png), (4, 3))
+
+    def test_capture_pipeline_skips_duplicates(self):
+        """Test that identical consecutive frames are not written twice."""
+        import asyncio
+        import tempfile
+
+        class FakeStream:
+            def __init__(self, payloads):
+                self.payloads = list(payloads)
+            async def start(self):
+                pass
+            async def stop(self):
+                pass
+            async def read_frame(self):
+                if not self.payloads:
+                    return None
+                return ScreenFrame(2, 1, "raw", self.payloads.pop(0))
+
+        a, b = bytes(8), bytes([255]) * 8
+        with tempfile.TemporaryDirectory() as out_dir:
+            pipeline = CapturePipeline(FakeStream([a, a, b, b, a]), out_dir)
+
+            async def run():
+                await pipeline.start()
+                await pipeline.wait()
+                await pipeline.stop()
+            asyncio.run(run())
+
+            self.assertEqual(pipeline.written, 3)
+            self.assertEqual(pipeline.duplicates, 2)
+            self.assertEqual(len(os.listdir(out_dir)), 3)
+
+        # A frame dropped under backpressure is not a baseline for duplicates:
+        # the static screen is still recorded once the queue drains
+        class SlowStream(FakeStream):
+            async def read_frame(self):
+                if len(self.payloads) == 1:
+                    await asyncio.sleep(0.2)  # Let the encoders drain the queue
+                return await super().read_frame()
+
+        with tempfile.TemporaryDirectory() as out_dir:
+            pipeline = CapturePipeline(SlowStream([a, b, b]), out_dir, queue_size=1)
+            asyncio.run(run())
+            self.assertEqual(pipeline.dropped, 1)
+            self.assertEqual(pipeline.written, 2)
+
+    def test_tile_differ(self):
+        """Test that only changed tiles are reported."""
+        differ = TileDiffer(tile_size=4)
+        base = bytearray(8 * 8 * 4)
+        self.assertEqual(differ.diff(ScreenFrame(8, 8, "raw", bytes(base))), [(0, 0, 8, 8)])
+        
+        base[(5 * 8 + 6) * 4] = 255  # pixel (6, 5)
+        self.assertEqual(differ.diff(ScreenFrame(8, 8, "raw", bytes(base))), [(4, 4, 4, 4)])
+        self.assertEqual(differ.diff(ScreenFrame(8, 8, "raw", bytes(base))), [])
+
+    def test_capability_probe_parsing(self):
+        """Test parsing of the combined capability probe output."""
+        output = "\n".join([
+            "[ro.build.version.sdk]: [30]",
+            "[ro.serialno]: [ABC123]",
+            "[ro.build.fingerprint]: [google/tv/1:11/RP1A/1:user/release-keys]",
+            SECTION_MARK,
+            "Physical size: 3840x2160",
+            "Override size: 1920x1080",
+            SECTION_MARK,
+            "package:com.netflix.ninja",
+            "package:com.google.android.youtube.tv",
+            SECTION_MARK,
+            '<MediaCodec name="c2.amlogic.hevc.encoder" type="video/hevc">',
+            SECTION_MARK,
+            "4",
+        ])
+        caps = parse_probe(output)
+        self.assertEqual(caps["sdk"], 30)
+        self.assertEqual(caps["serial"], "ABC123")
+        self.assertEqual(caps["resolution"], [1920, 1080])
+        self.assertIn("com.netflix.ninja", caps["packages"])
+        self.assertEqual(caps["encoders"], [{"name": "c2.amlogic.hevc.encoder", "mime": "video/hevc"}])
+        self.assertEqual(caps["cpu_cores"], 4)
+
+    def test_capability_cache_fingerprint(self):
+        """Test that an OTA update (new fingerprint) invalidates cached capabilities."""
+        import tempfile
+        cache = CapabilityCache(Path(tempfile.mkdtemp()) / "caps.json")
+        cache.put("10.0.0.5:5555", {"serial": "ABC", "fingerprint": "build/1", "sdk": 30})
+        self.assertEqual(cache.get("10.0.0.5:5555")["sdk"], 30)
+        self.assertEqual(cache.get("10.0.0.5:5555", "build/1")["sdk"], 30)
+        self.assertIsNone(cache.get("10.0.0.5:5555", "build/2"))
+        self.assertIsNone(cache.get("10.0.0.5:5555"))  # Stale entry dropped
+        
+        # Deployer and controller share one cache, so invalidations reach both
+        self.assertIs(ApkDeployer([]).caps_cache, shared_capability_cache())
+
+    def test_apk_streaming_install(self):
+        """Test session-id parsing and install-create/write/commit result handling."""
+        import asyncio
+        import tempfile
+        from device_caps import CapabilityCache
+
+        class ScriptedDeployer(ApkDeployer):
+            def __init__(self, apk_paths, replies):
+                super().__init__(apk_paths, caps_cache=CapabilityCache(Path(tempfile.mkdtemp()) / "caps.json"))
+                self.replies = replies  # pm verb -> (ok, output)
+                self.calls = []
+            async def _adb(self, serial, *args, stdin=None, timeout=120):
+                self.calls.append(args)
+                verb = args[args.index("package") + 1] if "package" in args else args[0]
+                return self.replies[verb]
+
+        tmp = Path(tempfile.mkdtemp())
+        (tmp / "base.apk").write_bytes(b"base")
+        (tmp / "split.apk").write_bytes(b"split!")
+        apks = [str(tmp / "base.apk"), str(tmp / "split.apk")]
+
+        def install(replies):
+            deployer = ScriptedDeployer(apks, replies)
+            deployer._load()
+            return deployer, asyncio.run(deployer._install_streaming("10.0.0.5:5555"))
+
+        ok = {
+            "install-create": (True, "Success: created install session [1234]"),
+            "install-write": (True, "Success: streamed 4 bytes"),
+            "install-commit": (True, "Success"),
+            "install-abandon": (True, "Success"),
+        }
+        deployer, (success, _) = install(ok)
+        self.assertTrue(success)
+        self.assertEqual(deployer.calls[0][-1], "10")  # Total size of both APKs
+        writes = [c for c in deployer.calls if "install-write" in c]
+        self.assertEqual([c[7:9] for c in writes], [("1234", "1_base.apk"), ("1234", "2_split.apk")])
+        # The APK bytes go through stdin, which exec-out does not forward
+        self.assertTrue(all(c[:2] == ("shell", "-T") for c in writes))
+        self.assertEqual(deployer.calls[-1][-2:], ("install-commit", "1234"))
+
+        # No session id in the reply: nothing is written
+        deployer, (success, output) = install({**ok, "install-create": (True, "Error: java.lang.SecurityException")})
+        self.assertFalse(success)
+        self.assertIn("SecurityException", output)
+        self.assertEqual(len(deployer.calls), 1)
+
+        # A failed write abandons the session instead of committing it
+        deployer, (success, _) = install({**ok, "install-write": (True, "Failure [INSTALL_FAILED_INSUFFICIENT_STORAGE]")})
+        self.assertFalse(success)
+        self.assertEqual(deployer.calls[-1][-2:], ("install-abandon", "1234"))
+
+        # Commit rejected by the package manager
+        deployer, (success, output) = install({**ok, "install-commit": (True, "Failure [INSTALL_FAILED_VERSION_DOWNGRADE]")})
+        self.assertFalse(success)
+        self.assertIn("VERSION_DOWNGRADE", output)
+
+        # A stalled stream (no pm verdict) falls back to adb install-multiple
+        deployer = ScriptedDeployer(apks, {**ok, "install-write": (False, ""),
+                                           "connect": (True, "connected to 10.0.0.5:5555"),
+                                           "shell": (True, "30"),
+                                           "install-multiple": (True, "Success")})
+        results = asyncio.run(deployer.deploy(["10.0.0.5"]))
+        self.assertTrue(results["10.0.0.5:5555"]["success"])
+        self.assertEqual(deployer.calls[-1][0], "install-multiple")
+
+    def test_subnet_scanner(self):
+        """Test scan timeout adaptation, RTT sampling and subnet enumeration."""
+        import asyncio
+        import socket
+        import ifaddr
+
+        scanner = SubnetScanner(min_timeout=0.1, max_timeout=1.0)
+        self.assertEqual(scanner.timeout, 0.5)  # No samples yet
+        scanner._observe(0.001)
+        self.assertEqual(scanner.timeout, 0.1)  # Fast LAN: clamped to the minimum
+        for _ in range(50):
+            scanner._observe(2.0)
+        self.assertEqual(scanner.timeout, 1.0)  # Slow link: clamped to the maximum
+
+        async def scan():
+            scanner = SubnetScanner()
+            server = await asyncio.start_server(lambda r, w: w.close(), "127.0.0.1", 0)
+            open_port = server.sockets[0].getsockname()[1]
+            closed = socket.socket()
+            closed.bind(("127.0.0.1", 0))
+            closed_port = closed.getsockname()[1]
+            closed.close()
+
+            found = []
+            scanner.ports = (closed_port,)
+            await scanner.scan(["127.0.0.1"], lambda ip, ports: found.append((ip, ports)))
+            self.assertIsNone(scanner._rtt)  # Refused connects are not RTT samples
+            scanner.ports = (open_port, closed_port)
+            await scanner.scan(["127.0.0.1"], lambda ip, ports: found.append((ip, ports)))
+            self.assertIsNotNone(scanner._rtt)
+            server.close()
+            await server.wait_closed()
+            return found, open_port
+        found, open_port = asyncio.run(scan())
+        self.assertEqual(found, [("127.0.0.1", [open_port])])
+
+        # Wide networks are narrowed to the /24 around our address; loopback,
+        # link-local and IPv6 addresses are skipped
+        adapters = [
+            ifaddr.Adapter("lo", "lo", [ifaddr.IP("127.0.0.1", 8, "lo")]),
+            ifaddr.Adapter("eth0", "eth0", [
+                ifaddr.IP("10.1.2.3", 16, "eth0"),
+                ifaddr.IP(("fe80::1", 0, 2), 64, "eth0"),
+                ifaddr.IP("169.254.7.7", 16, "eth0"),
+            ]),
+            ifaddr.Adapter("wlan0", "wlan0", [ifaddr.IP("192.168.1.20", 24, "wlan0")]),
+            ifaddr.Adapter("wlan1", "wlan1", [ifaddr.IP("192.168.1.21", 24, "wlan1")]),
+        ]
+        subnets = local_subnets(adapters=adapters)
+        self.assertEqual([str(n) for n in subnets], ["10.1.2.0/24", "192.168.1.0/24"])
+        self.assertEqual(len(list(subnets[0].hosts())), 254)
+
+    def test_adb_connect_dedup(self):
+        """Test the track-devices parser and that concurrent connects share one `adb connect`."""
+        import io
+        import threading
+        import time
+
+        payload = b"10.0.0.5:5555\tdevice\nemulator-5554\toffline\n"
+        stream = io.BytesIO(b"%04x" % len(payload) + payload + b"0000" + b"00")
+        self.assertEqual(list(parse_track_devices(stream)), [
+            {"10.0.0.5:5555": "device", "emulator-5554": "offline"},
+            {},  # Empty update: every device went away
+        ])  # A truncated length ends the stream
+
+        class SlowConnect(ADBController):
+            def _run_command(self, cmd_args, timeout=10):
+                if cmd_args[0] == "connect":
+                    spawned.append(cmd_args)
+                    time.sleep(0.2)
+                    return True, f"connected to {cmd_args[1]}"
+                return False, ""
+
+        spawned = []
+        adb = SlowConnect()
+        adb.adb_path = adb.tracker.adb_path = "/nonexistent/adb"  # No tracker, no persistent shell
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(adb.connect("10.0.0.5"))) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [True, True])
+        self.assertEqual(len(spawned), 1)
+        self.assertEqual(adb.connect_stats["shared"], 1)
+        self.assertTrue(adb.tracker.disabled)
+        self.assertEqual(adb.connected_device_ip, "10.0.0.5")
+        adb.close()
+
+    def test_pointer_injector_coalescing(self):
+        """Test that moves are coalesced per frame and monkey commands are well formed."""
+        class FakeWriter:
+            def __init__(self):
+                self.lines = []
+            def write(self, data):
+                self.lines.append(data.decode())
+
+        injector = PointerInjector("adb", "10.0.0.5:5555", (1920, 1080))
+        injector._writer = FakeWriter()
+        injector.submit("down", 0.5, 0.5)
+        for x in (0.6, 0.7, 0.8):
+            injector.submit("move", x, 0.5)
+        injector.submit("up", 1.5, -0.2)  # Clamped to the screen
+        self.assertEqual(injector._writer.lines, [
+            "touch down 959 539\n",
+            "touch move 1535 539\n",  # Only the newest pending move is sent
+            "touch up 1919 0\n",
+        ])
+        self.assertEqual((injector.samples, injector.injected, injector.coalesced), (5, 3, 2))
+
+    def test_file_sync_parsing(self):
+        """Test the hash cache and parsing of remote find/stat and md5sum output."""
+        import tempfile
+        path = Path(tempfile.mkdtemp()) / "sync_cache.json"
+        cache = HashCache(path)
+        cache.put("/a.txt", 10, 100, "d41d")
+        self.assertEqual(cache.get("/a.txt", 10, 100), "d41d")
+        self.assertIsNone(cache.get("/a.txt", 10, 101))  # Touched file must be re-hashed
+        cache.save()
+        self.assertEqual(HashCache(path).get("/a.txt", 10, 100), "d41d")
+
+        commands = []
+        def run(args, timeout=10):
+            command = args[-1]
+            commands.append(command)
+            if command.startswith("find"):
+                return True, ("12 1700000000 /sdcard/dst/a.txt\r\n"
+                              "340 1700000001 /sdcard/dst/sub/b c.txt\n"
+                              "stat: permission denied\n"
+                              "5 1700000002 /elsewhere/x.txt\n")
+            return True, "0cc1  /sdcard/dst/a.txt\r\nabcd  /sdcard/dst/sub/b c.txt\n"
+
+        sync = DirectorySync(run, "10.0.0.5:5555", cache=cache)
+        remote = sync.list_remote("/sdcard/dst")
+        self.assertEqual(remote, {"a.txt": (12, 1700000000), "sub/b c.txt": (340, 1700000001)})
+        hashes = sync.remote_hashes("/sdcard/dst", list(remote), remote)
+        self.assertEqual(hashes, {"a.txt": "0cc1", "sub/b c.txt": "abcd"})
+
+        # Unchanged remote files come from the cache without another md5sum
+        commands.clear()
+        self.assertEqual(sync.remote_hashes("/sdcard/dst", list(remote), remote), hashes)
+        self.assertEqual(commands, [])
+
+    def test_logcat_filter_and_ring_buffer(self):
+        """Test logcat parsing, filtering and the bounded ring buffer."""
+        entry = parse_line("01-31 12:34:56.789  1234  5678 W ActivityManager: Slow operation")
+        self.assertEqual((entry.pid, entry.level, entry.tag), (1234, "W", "ActivityManager"))
+        self.assertTrue(LogFilter(["ActivityManager"], "I", "Slow").matches(entry))
+        self.assertFalse(LogFilter(level="E").matches(entry))
+        self.assertIsNone(parse_line("--------- beginning of main"))
+        
+        buffer = LogRingBuffer(size=3)
+        for _ in range(5):
+            buffer.append(entry)
+        self.assertEqual(len(buffer.snapshot()), 3)
+        self.assertEqual(buffer.total, 5)
+
+    def test_quality_ladder_selection(self):
+        """Test that the mirroring rung follows link capacity."""
+        self.assertEqual(choose_rung({"throughput_bps": 100_000_000, "rtt_ms": 5}), 0)
+        # High RTT caps the frame rate
+        self.assertLessEqual(QUALITY_LADDER[choose_rung({"throughput_bps": 100_000_000, "rtt_ms": 80})]["max_fps"], 30)
+        self.assertEqual(choose_rung({"throughput_bps": 500_000, "rtt_ms": 5}), len(QUALITY_LADDER) - 1)
+
+    def test_scrcpy_output_parsing(self):
+        """Test parsing scrcpy output into metrics and events."""
+        parser = ScrcpyOutputParser(tail_size=3)
+        parser.feed("scrcpy 2.4 <https://github.com/Genymobile/scrcpy>")
+        self.assertEqual(parser.feed("INFO: Device: [Google] Chromecast (Android 12)", "stderr")["type"], "device")
+        self.assertEqual(parser.feed("INFO: Texture: 1920x1080", "stderr")["width"], 1920)
+        event = parser.feed("INFO: 42 fps (+18 frames skipped)", "stderr")
+        self.assertEqual((event["fps"], event["skipped"]), (42, 18))
+        self.assertEqual(parser.feed("ERROR: Could not open video stream", "stderr")["type"], "error")
+        
+        metrics = parser.metrics()
+        self.assertEqual(metrics["version"], "2.4")
+        self.assertEqual(metrics["frames_skipped"], 18)
+        self.assertEqual(metrics["errors"], 1)
+        self.assertEqual(len(parser.tail), 3)
+
+    def test_mirroring_profile_resolution(self):
+        """Test that profiles resolve to the device's hardware encoders."""
+        encoders = parse_encoders("\n".join([
+            "[server] INFO: List of video encoders:",
+            "    --video-codec=h264 --video-encoder=OMX.amlogic.avc.encoder (hw) [vendor]",
+            "    --video-codec=h265 --video-encoder=OMX.amlogic.hevc.encoder (hw) [vendor]",
+            "    --video-codec=h265 --video-encoder=c2.android.hevc.encoder (sw)",
+            "[server] INFO: List of audio encoders:",
+            "    --audio-codec=opus --audio-encoder=c2.android.opus.encoder (sw)",
+        ]))
+        base = {"max_size": 1280, "bitrate": 4000000, "max_fps": 30}
+        
+        balanced = resolve_profile("balanced", encoders, base)
+        self.assertEqual(balanced["video_encoder"], "OMX.amlogic.hevc.encoder")
+        self.assertLess(balanced["bitrate"], base["bitrate"])
+        
+        low_latency = resolve_profile("low-latency", encoders, base)
+        self.assertEqual(low_latency["video_codec"], "h264")
+        self.assertEqual(low_latency["video_buffer"], 0)
+
+    def test_encoder_cache_negative(self):
+        """Test that a failed encoder listing is cached for the negative TTL only."""
+        import tempfile
+        cache = EncoderCache(Path(tempfile.mkdtemp()) / "encoders.json", negative_ttl=60)
+        self.assertFalse(cache.is_known("10.0.0.5:5555"))
+        self.assertIsNone(cache.get("/nonexistent/scrcpy", "10.0.0.5:5555"))
+        self.assertTrue(cache.is_known("10.0.0.5:5555"))  # Next start won't probe again
+        self.assertIsNone(cache.lookup("10.0.0.5:5555"))
+        
+        cache.negative_ttl = 0
+        cache._failures["10.0.0.5:5555"] -= 1
+        self.assertFalse(cache.is_known("10.0.0.5:5555"))
+
+    def test_mirror_restart_backoff(self):
+        """Test that unexpected scrcpy exits are retried with growing backoff."""
+        supervisor = MirrorSupervisor()
+        session = supervisor._session("10.0.0.5")
+        session["wanted"] = True
+        exit_event = {"type": "exit", "returncode": 1, "expected": False}
+        
+        supervisor._on_event("10.0.0.5", exit_event)
+        self.assertIsNotNone(session["restart_at"])
+        self.assertEqual(session["backoff"], 2.0)
+        
+        for _ in range(MirrorSupervisor.MAX_RESTARTS):
+            supervisor._on_event("10.0.0.5", exit_event)
+        self.assertFalse(session["wanted"])
+        self.assertLessEqual(session["backoff"], MirrorSupervisor.MAX_BACKOFF)
+
+        # Sessions share one cache per file so devices don't overwrite each other's entries
+        other = supervisor._session("10.0.0.6")["manager"]
+        self.assertIs(other.link_profiles, session["manager"].link_profiles)
+        self.assertIs(other.encoder_cache, session["manager"].encoder_cache)
+
+    def test_device_registry_batching(self):
+        """Test that registry updates are merged and written in one batch."""
+        import tempfile
+        path = Path(tempfile.mkdtemp()) / "devices.json"
+        registry = DeviceRegistry(path, flush_delay=60)
+        registry.update({"name": "Living Room", "ip": "10.0.0.5", "port": 6466}, "_androidtvremote2._tcp.local.")
+        registry.update({"name": "Living Room", "ip": "10.0.0.5", "port": 8009}, "_googlecast._tcp.local.")
+        self.assertEqual(registry.writes, 0)
+        
+        registry.flush()
+        record = DeviceRegistry(path).get("10.0.0.5")
+        self.assertEqual(record["ports"], [6466, 8009])
+        self.assertEqual(len(record["service_types"]), 2)
+
+        # A new DHCP lease re-keys the record by its stable identity
+        registry.update({"name": "Living Room", "ip": "10.0.0.5", "identity": "bt:aa:bb"})
+        registry.update({"name": "Living Room", "ip": "10.0.0.9", "identity": "bt:aa:bb"})
+        self.assertIsNone(registry.get("10.0.0.5"))
+        self.assertEqual(registry.get("10.0.0.9")["ports"], [6466, 8009])
+
+        # Dead entries expire after repeated failed probes; a sighting resets the count
+        registry.update({"name": "Bedroom", "ip": "10.0.0.6", "identity": "addr:10.0.0.6"})
+        self.assertFalse(registry.mark_unreachable("10.0.0.6"))
+        registry.update({"name": "Bedroom", "ip": "10.0.0.6"})
+        results = [registry.mark_unreachable("10.0.0.6") for _ in range(3)]
+        self.assertEqual(results, [False, False, True])
+        self.assertEqual([d["ip"] for d in registry.devices()], ["10.0.0.9"])
+
+    def test_discovery_identity_merge(self):
+        """Test that one TV's service types merge into a single device and are evicted together."""
+        import socket
+        import tempfile
+        found, lost = [], []
+        registry = DeviceRegistry(Path(tempfile.mkdtemp()) / "devices.json", flush_delay=60)
+        discovery = DeviceDiscovery(found.append, lost.append, registry=registry)
+        addresses = [socket.inet_aton("10.0.0.5"), socket.inet_pton(socket.AF_INET6, "fe80::5")]
+        remote = ServiceInfo(SERVICE_V2, f"Living Room.{SERVICE_V2}", addresses=addresses,
+                             port=6466, properties={"bt": "AA:BB"}, server="tv.local.")
+        cast = ServiceInfo(SERVICE_CAST, f"Chromecast-1234.{SERVICE_CAST}", addresses=addresses[:1],
+                           port=8009, properties={"id": "1234", "fn": "Living Room"}, server="tv.local.")
+        discovery._process_service_info(cast)
+        discovery._process_service_info(remote)
+        
+        self.assertEqual(len(discovery.devices), 1)
+        self.assertEqual(found[-1]["port"], 6466)
+        self.assertEqual(found[-1]["addresses"], ["10.0.0.5", "fe80::5"])
+        
+        discovery._remove_service(remote.name)
+        self.assertEqual(lost, [])
+        discovery._remove_service(cast.name)
+        self.assertEqual(lost[0]["ip"], "10.0.0.5")
+
+        # A record whose keys match two known devices merges them into one row
+        found.clear(); lost.clear()
+        by_mac = ServiceInfo(SERVICE_V2, f"Bedroom.{SERVICE_V2}", addresses=[socket.inet_aton("10.0.0.7")],
+                             port=6466, properties={"bt": "CC:DD"}, server="bedroom.local.")
+        by_addr = ServiceInfo(SERVICE_CAST, f"Chromecast-9.{SERVICE_CAST}", addresses=[socket.inet_aton("10.0.0.8")],
+                              port=8009, properties={}, server="bedroom.local.")
+        discovery._process_service_info(by_mac)
+        discovery._process_service_info(by_addr)
+        self.assertEqual(len(discovery.devices), 2)
+        both = ServiceInfo(SERVICE_V2, f"Bedroom.{SERVICE_V2}", port=6466, properties={"bt": "CC:DD"},
+                           addresses=[socket.inet_aton("10.0.0.7"), socket.inet_aton("10.0.0.8")],
+                           server="bedroom.local.")
+        discovery._process_service_info(both)
+        self.assertEqual(len(discovery.devices), 1)
+        self.assertEqual([d["ip"] for d in lost], ["10.0.0.8"])  # Duplicate row withdrawn
+        self.assertEqual(sorted(discovery.discovered_devices), ["10.0.0.7"])
+        device = next(iter(discovery.devices.values()))
+        self.assertEqual(len(device["services"]), 2)
+
+    def test_discovery_prefilter(self):
+        """Test that speakers are filtered before resolving and TVs are not."""
+        self.assertTrue(looks_like_tv(SERVICE_V2, f"Google-Nest-Mini-1.{SERVICE_V2}"))
+        self.assertFalse(looks_like_tv(SERVICE_CAST, f"Google-Nest-Mini-1.{SERVICE_CAST}"))
+        self.assertTrue(looks_like_tv(SERVICE_CAST, f"Chromecast-1.{SERVICE_CAST}"))
+        self.assertFalse(looks_like_tv(SERVICE_CAST, f"Kitchen.{SERVICE_CAST}", {"ca": "2052"}))
+        self.assertTrue(looks_like_tv(SERVICE_CAST, f"BRAVIA-4K.{SERVICE_CAST}", {"ca": "201221"}))
+
+    def test_discovery_rate_limit(self):
+        """Test that only updates are rate-limited and a returning TV is resolved again."""
+        import tempfile
+        registry = DeviceRegistry(Path(tempfile.mkdtemp()) / "devices.json", flush_delay=60)
+        discovery = DeviceDiscovery(lambda d: None, lambda d: None, registry=registry)
+        name = f"Living Room.{SERVICE_V2}"
+        self.assertTrue(discovery._should_resolve(SERVICE_V2, name))
+        self.assertFalse(discovery._should_resolve(SERVICE_V2, name))  # Already in flight
+        discovery._resolving.discard(name)
+        self.assertFalse(discovery._should_resolve(SERVICE_V2, name, update=True))
+        
+        # Goodbye, then back within the rate-limit window
+        discovery._remove_service(name)
+        self.assertTrue(discovery._should_resolve(SERVICE_V2, name))
+
+    def test_config_external_merge(self):
+        """Test that two config instances merge each other's writes instead of clobbering."""
+        first, second = Config(), Config()
+        original = (first.get("theme"), first.get("audio_forwarding"))
+        changes = []
+        second.subscribe(lambda key, value: changes.append(key), ["theme"])
+        
+        first.set("theme", "light")
+        first.flush()
+        second.set("audio_forwarding", not original[1])
+        second.flush()
+        self.assertEqual(second.get("theme"), "light")
+        self.assertEqual(changes, ["theme"])
+        
+        reloaded = Config()
+        self.assertEqual(reloaded.get("theme"), "light")
+        self.assertEqual(reloaded.get("audio_forwarding"), not original[1])
+        
+        # Restore
+        reloaded.set("theme", original[0])
+        reloaded.set("audio_forwarding", original[1])
+        reloaded.flush()
+
+    def test_config_write_behind(self):
+        """Test debounced, capped and atomic config saves, and retry after a failed save."""
+        import json
+        import time
+        import tempfile
+        
+        class TempConfig(Config):
+            CONFIG_DIR = Path(tempfile.mkdtemp())
+            CONFIG_FILE = CONFIG_DIR / "config.json"
+            KEYS_DIR = CONFIG_DIR / "keys"
+            FLUSH_DELAY = 0.1
+            FLUSH_MAX_DELAY = 0.4
+        
+        config = TempConfig()
+        writes, inode = config.writes, TempConfig.CONFIG_FILE.stat().st_ino
+        
+        # A burst of changes is written once
+        for i in range(20):
+            config.set("theme", f"theme-{i}")
+        self.assertEqual(config.writes, writes)
+        time.sleep(0.3)
+        self.assertEqual(config.writes, writes + 1)
+        
+        # Written as a new file renamed over the old one, no temp file left behind
+        self.assertNotEqual(TempConfig.CONFIG_FILE.stat().st_ino, inode)
+        self.assertFalse(TempConfig.CONFIG_FILE.with_suffix(".tmp").exists())
+        self.assertEqual(json.loads(TempConfig.CONFIG_FILE.read_text())["theme"], "theme-19")
+        
+        # Changes that keep coming are still written within FLUSH_MAX_DELAY
+        writes = config.writes
+        for i in range(15):
+            config.set("theme", f"busy-{i}")
+            time.sleep(0.05)
+        self.assertGreater(config.writes, writes)
+        config.flush()
+        
+        # A failed save stays pending and the next flush writes it
+        config.set("theme", "light")
+        config.set("broken", object())
+        config.flush()
+        self.assertNotEqual(json.loads(TempConfig.CONFIG_FILE.read_text())["theme"], "light")
+        del config.settings["broken"]
+        config.flush()
+        self.assertEqual(json.loads(TempConfig.CONFIG_FILE.read_text())["theme"], "light")
+
+    def test_paired_registry_migration(self):
+        """Test migrating the flat paired list and following a TV to a new address."""
+        class MemoryConfig(dict):
+            def set(self, key, value):
+                self[key] = value
+        
+        config = MemoryConfig(paired_devices=["10.0.0.5", "10.0.0.6"])
+        paired = PairedDeviceRegistry(config)
+        self.assertEqual(len(paired), 2)
+        self.assertIsInstance(config["paired_devices"], dict)
+        self.assertTrue(paired.is_paired("10.0.0.5"))
+        
+        # Discovery links the identity, then the TV comes back on a new DHCP lease
+        paired.observe("bt:aa:bb", ["10.0.0.5"])
+        paired.observe("bt:aa:bb", ["10.0.0.42"])
+        self.assertTrue(paired.is_paired("10.0.0.42"))
+        self.assertFalse(paired.is_paired("10.0.0.7"))
+        
+        paired.record_connection("10.0.0.42", rtt_ms=12.34)
+        self.assertEqual(paired.get("bt:aa:bb")["last_address"], "10.0.0.42")
+        self.assertEqual(paired.get("10.0.0.5")["last_rtt_ms"], 12.3)
+        
+        # A different TV that DHCP hands a paired TV's old address is not paired
+        paired.mark_paired("10.0.0.9", "bt:aa:cc")
+        paired.observe("bt:dd:ee", ["10.0.0.9"])
+        self.assertFalse(paired.is_paired("bt:dd:ee"))
+        self.assertFalse(paired.is_paired("10.0.0.9"))
+        self.assertTrue(paired.is_paired("bt:aa:cc"))
+        
+        # Re-pairing refreshes paired_at even when nothing else changes
+        config["paired_devices"] = None
+        paired.mark_paired("10.0.0.42", "bt:aa:bb")
+        self.assertIsNotNone(config["paired_devices"])
+
+        # Another process still on the old build writes the legacy list format
+        paired._on_external_change("paired_devices", ["10.0.0.77"])
+        self.assertTrue(paired.is_paired("10.0.0.77"))
+        self.assertEqual(len(paired), 1)
+
+    def test_kinetic_flick(self):
+        """Test release velocity regression and decaying coast repeats."""
+        buffer = SampleBuffer(capacity=4)
+        for i in range(10):
+            buffer.add(i * 0.01, i * 10.0, 0.0)  # 1000 px/s right, ring wraps
+        self.assertEqual(len(buffer), 4)
+        vx, vy = buffer.velocity()
+        self.assertAlmostEqual(vx, 1000.0)
+        self.assertAlmostEqual(vy, 0.0)
+        
+        engine = KineticEngine()
+        engine.press(0.0, 0, 0)
+        for i in range(1, 6):
+            engine.move(i * 0.01, 0, -i * 15.0)
+        self.assertEqual(engine.release(0.06, 0, -90.0), "DPAD_UP")
+        due = []
+        while engine.scheduler.next_due() is not None:
+            at = engine.scheduler.next_due()
+            due.append(at)
+            self.assertEqual(engine.scheduler.pop_due(at), ["DPAD_UP"])
+        gaps = [b - a for a, b in zip(due, due[1:])]
+        self.assertGreater(len(due), 3)
+        self.assertEqual(gaps, sorted(gaps))  # Repeats slow down
+        
+        # A slow release does not coast, and a new touch cancels a coasting flick
+        engine.press(1.0, 0, 0)
+        self.assertIsNone(engine.release(1.5, 5, 0))
+        self.assertEqual(len(engine.scheduler), 0)
+
+    def test_gesture_replay(self):
+        """Test recording a gesture trace and replaying it through the recognizer."""
+        import tempfile
+        recorder = TraceRecorder()
+        recorder.record(100.0, "press", 50, 50)
+        for i in range(1, 31):
+            recorder.record(100.0 + i / 60, "move", 50 + i * 4, 50)  # Slow drag right
+        recorder.record(100.6, "release", 170, 50)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "drag.json"
+            recorder.save(path)
+            trace = load_trace(path)
+        self.assertEqual(trace[0][:2], [0.0, "press"])
+        
+        emitted = replay(trace)
+        self.assertEqual({(action, key) for _, action, key in emitted}, {("swipe", "DPAD_RIGHT")})
+        self.assertGreater(len(emitted), 1)  # First key plus accelerating repeats
+        
+        # Tap, right-click tap and long press
+        self.assertEqual([a for _, a, _ in replay([[0, "press", 5, 5, "left"], [0.05, "release", 6, 5, "left"]])], ["click"])
+        self.assertEqual([a for _, a, _ in replay([[0, "press", 5, 5, "right"], [0.05, "release", 5, 5, "right"]])], ["back"])
+        held = [a for _, a, _ in replay([[0, "press", 5, 5, "left"], [0.6, "release", 5, 5, "left"]])]
+        self.assertEqual(held[0], "long_click")
+        self.assertIn("click", held)
+        self.assertIsNone(GestureRecognizer().next_deadline())
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,181 @@
+# Copyright (c) 2025 Rex Ackermann. All rights reserved.
+# Licensed under the MIT License.
+import math
+import heapq
+import logging
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Samples older than this (relative to the newest) do not count towards the release velocity
+VELOCITY_WINDOW = 0.1  # seconds
+
+
+class SampleBuffer:
+    """Fixed-size ring buffer of (time, x, y) pointer samples."""
+
+    def __init__(self, capacity: int = 16):
+        self.capacity = capacity
+        self._t = [0.0] * capacity
+        self._x = [0.0] * capacity
+        self._y = [0.0] * capacity
+        self._next = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def clear(self):
+        self._next = 0
+        self._count = 0
+
+    def add(self, t: float, x: float, y: float):
+        i = self._next
+        self._t[i], self._x[i], self._y[i] = t, x, y
+        self._next = (i + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def latest(self, n: Optional[int] = None) -> List[Tuple[float, float, float]]:
+        """The newest `n` samples (all if None), oldest first."""
+        n = self._count if n is None else min(n, self._count)
+        start = self._next - n
+        return [(self._t[i], self._x[i], self._y[i]) for i in range(start, self._next)]
+
+    def velocity(self, samples: int = 6, window: float = VELOCITY_WINDOW) -> Tuple[float, float]:
+        """
+        Least-squares slope of x and y against time over the newest samples
+        within `window` seconds, in px/s. A regression is far less jittery than
+        the last two samples, which are often only a millisecond apart.
+        """
+        points = self.latest(samples)
+        if not points:
+            return 0.0, 0.0
+        newest = points[-1][0]
+        points = [p for p in points if newest - p[0] <= window]
+        n = len(points)
+        if n < 2:
+            return 0.0, 0.0
+        mean_t = sum(p[0] for p in points) / n
+        mean_x = sum(p[1] for p in points) / n
+        mean_y = sum(p[2] for p in points) / n
+        var_t = sum((p[0] - mean_t) ** 2 for p in points)
+        if var_t <= 0:
+            return 0.0, 0.0
+        vx = sum((p[0] - mean_t) * (p[1] - mean_x) for p in points) / var_t
+        vy = sum((p[0] - mean_t) * (p[2] - mean_y) for p in points) / var_t
+        return vx, vy
+
+
+class KeyScheduler:
+    """
+    Time-ordered queue of keys to send. The owner polls `pop_due(now)` and
+    arms its timer for `next_due()`, so keys are never fired from here directly.
+    """
+
+    def __init__(self):
+        self._queue = []  # (due, seq, key)
+        self._seq = 0
+        self.scheduled = 0
+        self.cancelled = 0
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def schedule(self, key: str, at: float):
+        self._seq += 1
+        heapq.heappush(self._queue, (at, self._seq, key))
+        self.scheduled += 1
+
+    def cancel(self):
+        self.cancelled += len(self._queue)
+        self._queue.clear()
+
+    def next_due(self) -> Optional[float]:
+        return self._queue[0][0] if self._queue else None
+
+    def pop_due(self, now: float) -> List[str]:
+        keys = []
+        while self._queue and self._queue[0][0] <= now:
+            keys.append(heapq.heappop(self._queue)[2])
+        return keys
+
+
+def direction_key(dx: float, dy: float) -> str:
+    """D-pad key for the dominant axis of a movement."""
+    if abs(dx) > abs(dy):
+        return "DPAD_RIGHT" if dx > 0 else "DPAD_LEFT"
+    return "DPAD_DOWN" if dy > 0 else "DPAD_UP"
+
+
+class KineticEngine:
+    """
+    Touchpad inertia without Qt. Pointer samples go into a ring buffer; on
+    release the velocity is estimated and the flick coasts on with
+    exponentially decaying speed (v0 * e^(-t/tau)). Every `step_px` of
+    virtual travel becomes one D-pad key, scheduled on the KeyScheduler,
+    so repeats start fast and spread out as the flick slows down.
+    """
+
+    def __init__(self, scheduler: Optional[KeyScheduler] = None, step_px: float = 40.0,
+                 tau: float = 0.35, min_velocity: float = 400.0, max_repeats: int = 12,
+                 capacity: int = 16):
+        self.scheduler = scheduler or KeyScheduler()
+        self.samples = SampleBuffer(capacity)
+        self.step_px = step_px
+        self.tau = tau
+        self.min_velocity = min_velocity
+        self.max_repeats = max_repeats
+
+        # Stats
+        self.flicks = 0
+        self.repeats = 0
+
+    def press(self, t: float, x: float, y: float):
+        """A new touch stops any coasting flick, like on a phone."""
+        self.scheduler.cancel()
+        self.samples.clear()
+        self.samples.add(t, x, y)
+
+    def move(self, t: float, x: float, y: float):
+        self.samples.add(t, x, y)
+
+    def release(self, t: float, x: float, y: float) -> Optional[str]:
+        """
+        End the touch and schedule the coasting repeats.
+        Returns the flick direction, or None if the release was too slow.
+        """
+        self.samples.add(t, x, y)
+        vx, vy = self.samples.velocity()
+        self.samples.clear()
+        speed = max(abs(vx), abs(vy))
+        if speed < self.min_velocity:
+            return None
+
+        key = direction_key(vx, vy)
+        delays = self.repeat_delays(speed)
+        for delay in delays:
+            self.scheduler.schedule(key, t + delay)
+        self.flicks += 1
+        self.repeats += len(delays)
+        return key
+
+    def repeat_delays(self, speed: float) -> List[float]:
+        """
+        Delays after release at which the coasting travel crosses each
+        `step_px`: solves v0*tau*(1 - e^(-t/tau)) = n*step for t.
+        """
+        travel = speed * self.tau  # Total distance the flick coasts (never quite reached)
+        count = min(math.ceil(travel / self.step_px) - 1, self.max_repeats)
+        return [-self.tau * math.log(1 - n * self.step_px / travel) for n in range(1, count + 1)]
+
+    def stop(self):
+        self.scheduler.cancel()
+        self.samples.clear()
+
+    def stats(self) -> dict:
+        return {
+            "flicks": self.flicks,
+            "repeats": self.repeats,
+            "pending": len(self.scheduler),
+            "cancelled": self.scheduler.cancelled,
+        }
@@ -1,7 +1,14 @@
 from PyQt6.QtWidgets import QWidget, QLabel
-from PyQt6.QtCore import Qt, pyqtSignal, QPointF, QTimer
-from PyQt6.QtGui import QPainter, QBrush, QColor, QPen, QFont, QLinearGradient
+from PyQt6.QtCore import Qt, pyqtSignal, QPointF, QTimer, QEvent
+from PyQt6.QtGui import QPainter, QBrush, QColor, QPen, QFont, QLinearGradient, QPixmap, QPolygonF
+import math
 import time
+from pathlib import Path
+from typing import Optional
+from gesture_recognizer import GestureRecognizer, TraceRecorder
+
+BUTTON_NAMES = {Qt.MouseButton.LeftButton: "left", Qt.MouseButton.RightButton: "right"}
+DIRECTION_VECTORS = {"DPAD_UP": (0, -1), "DPAD_DOWN": (0, 1), "DPAD_LEFT": (-1, 0), "DPAD_RIGHT": (1, 0)}
 
 class TouchpadWidget(QWidget):
     """
@@ -12,63 +19,117 @@ class TouchpadWidget(QWidget):
     clickSignal = pyqtSignal()     # DPAD_CENTER
     longClickSignal = pyqtSignal() # Long Press Action
     backSignal = pyqtSignal()      # BACK button
+    pointerSignal = pyqtSignal(str, float, float)  # down/move/up, normalized x, y
     
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setMinimumSize(250, 180)
         self.setCursor(Qt.CursorShape.PointingHandCursor)
         
-        self.last_pos = None
-        self.press_pos = None
-        self.press_time = 0
-        self.direction_start_time = 0 # To reset acceleration on reversal
-        self.is_dragging = False
-        self.long_press_triggered = False
-        
-        # UX Thresholds
-        self.swipe_threshold = 30
-        self.tap_timeout = 0.2  # Seconds
-        self.long_press_timeout = 350 # ms
+        # Gesture recognition (thresholds, reversal, acceleration, inertia) lives
+        # in the Qt-free recognizer; one timer drives its deadlines
+        self.recognizer = GestureRecognizer()
+        self.gesture_timer = QTimer(self)
+        self.gesture_timer.setSingleShot(True)
+        self.gesture_timer.timeout.connect(self._on_gesture_timer)
+
+        # Set a directory to record every gesture as a replayable trace
+        self.trace_dir: Optional[Path] = None
+        self.recorder: Optional[TraceRecorder] = None
         
-        self.long_press_timer = QTimer(self)
-        self.long_press_timer.setSingleShot(True)
-        self.long_press_timer.timeout.connect(self._handle_long_press)
-
-        self.repeat_timer = QTimer(self)
-        self.repeat_timer.timeout.connect(self._handle_repeat)
-        self.repeat_key = None
-
-    def _handle_long_press(self):
-        if not self.is_dragging:
-            self.long_press_triggered = True
-            self.longClickSignal.emit()
-            # Start repeating the click for long-press
-            self.repeat_key = "CLICK"
-            self.direction_start_time = time.time()
-            self.repeat_timer.start(100) # Fast repeat for OK
-
-    def _handle_repeat(self):
-        if self.repeat_key == "CLICK":
-            self.clickSignal.emit()
-        elif self.repeat_key:
-            # Multi-dimensional acceleration: Distance + Time (In Current Direction)
-            elapsed = time.time() - self.direction_start_time
-            # Distance factor from initial press
-            delta = self.last_pos - self.press_pos
-            dist = delta.manhattanLength()
-            
-            # Base interval from distance (Physics)
-            dist_interval = max(50, 350 - (dist * 3.0))
-            
-            # Add time-based acceleration (decay by ~125ms per second)
-            time_factor = elapsed * 125
-            final_interval = max(30, int(dist_interval - time_factor))
-            
-            self.repeat_timer.setInterval(final_interval)
-            self.swipeSignal.emit(self.repeat_key)
+        # Pointer mode: forward raw touches instead of D-pad gestures
+        self.pointer_mode = False
 
-    def paintEvent(self, event):
-        painter = QPainter(self)
+        # Static background cache (see _cached_background)
+        self._background = None
+        self._background_dpr = 0.0
+        self.background_renders = 0
+
+    def set_pointer_mode(self, enabled: bool):
+        self.pointer_mode = enabled
+        self.gesture_timer.stop()
+        self.recognizer.reset()
+        self.setCursor(Qt.CursorShape.CrossCursor if enabled else Qt.CursorShape.PointingHandCursor)
+        self._invalidate_background()
+        self.update()
+
+    def _emit_pointer(self, action, pos):
+        self.pointerSignal.emit(action, pos.x() / max(1, self.width()), pos.y() / max(1, self.height()))
+
+    def set_trace_dir(self, path):
+        self.trace_dir = Path(path) if path else None
+
+    def _feed(self, kind: str, event):
+        """Pass one mouse event to the recognizer and emit what it recognized."""
+        t = time.monotonic()
+        x, y = event.pos().x(), event.pos().y()
+        button = BUTTON_NAMES.get(event.button(), "other")
+        if self.trace_dir:
+            if kind == "press":
+                self.recorder = TraceRecorder()
+            if self.recorder:
+                self.recorder.record(t, kind, x, y, button)
+
+        # Deliver anything that fell due before this sample (timers can lag)
+        self._dispatch(self.recognizer.tick(t))
+        if kind == "press":
+            actions = self.recognizer.press(t, x, y)
+        elif kind == "move":
+            actions = self.recognizer.move(t, x, y)
+        else:
+            actions = self.recognizer.release(t, x, y, button)
+        self._dispatch(actions)
+        self._arm_gesture_timer()
+        self.update()  # Trail overlay; the background comes from the cache
+
+        if kind == "release" and self.recorder:
+            self.recorder.save(self.trace_dir / f"gesture-{int(time.time() * 1000)}.json")
+            self.recorder = None
+
+    def _dispatch(self, actions):
+        for action, key in actions:
+            if action == "swipe":
+                self.swipeSignal.emit(key)
+            elif action == "click":
+                self.clickSignal.emit()
+            elif action == "long_click":
+                self.longClickSignal.emit()
+            elif action == "back":
+                self.backSignal.emit()
+
+    def _arm_gesture_timer(self):
+        deadline = self.recognizer.next_deadline()
+        if deadline is None:
+            self.gesture_timer.stop()
+        else:
+            self.gesture_timer.start(max(0, math.ceil((deadline - time.monotonic()) * 1000)))
+
+    def _on_gesture_timer(self):
+        self._dispatch(self.recognizer.tick(time.monotonic()))
+        self._arm_gesture_timer()
+        self.update()
+
+    def _invalidate_background(self):
+        self._background = None
+
+    def _cached_background(self) -> QPixmap:
+        """
+        Background and label rendered once at device resolution; rebuilt on
+        resize, theme/font change, mode switch or a move to a screen with a
+        different pixel ratio.
+        """
+        dpr = self.devicePixelRatioF()
+        if self._background is None or self._background_dpr != dpr:
+            self._background = self._render_background(dpr)
+            self._background_dpr = dpr
+            self.background_renders += 1
+        return self._background
+
+    def _render_background(self, dpr: float) -> QPixmap:
+        pixmap = QPixmap(max(1, round(self.width() * dpr)), max(1, round(self.height() * dpr)))
+        pixmap.setDevicePixelRatio(dpr)
+        pixmap.fill(Qt.GlobalColor.transparent)
+        painter = QPainter(pixmap)
         painter.setRenderHint(QPainter.RenderHint.Antialiasing)
         
         # Draw background (Premium Glassmorphism)
@@ -94,106 +155,61 @@ class TouchpadWidget(QWidget):
         
         # Center text with slight transparency
         painter.setOpacity(0.7)
-        painter.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter, 
-                         "TOUCHPAD\nSwipe to Navigate • Tap to OK\nHold & Pull to Scroll")
-        painter.setOpacity(1.0)
+        label = ("POINTER MODE\nTouch & Drag on the TV Screen" if self.pointer_mode
+                 else "TOUCHPAD\nSwipe to Navigate • Tap to OK\nHold & Pull to Scroll")
+        painter.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter, label)
+        painter.end()
+        return pixmap
+
+    def _paint_overlay(self, painter: QPainter):
+        """Dynamic feedback over the cached background: drag trail and repeat direction."""
+        trail = self.recognizer.kinetics.samples.latest()
+        direction = DIRECTION_VECTORS.get(self.recognizer.repeat_key)
+        if len(trail) < 2 and not direction:
+            return
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        if len(trail) >= 2:
+            painter.setPen(QPen(QColor(88, 166, 255, 110), 3, Qt.PenStyle.SolidLine,
+                                Qt.PenCapStyle.RoundCap, Qt.PenJoinStyle.RoundJoin))
+            painter.drawPolyline(QPolygonF([QPointF(x, y) for _, x, y in trail]))
+        if direction:
+            # Dot near the edge the D-pad is repeating towards
+            center = QPointF(self.rect().center())
+            dx, dy = direction
+            dot = center + QPointF(dx * (self.width() / 2 - 18), dy * (self.height() / 2 - 18))
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(QColor("#58a6ff"))
+            painter.drawEllipse(dot, 5, 5)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.drawPixmap(0, 0, self._cached_background())
+        self._paint_overlay(painter)
+
+    def resizeEvent(self, event):
+        self._invalidate_background()
+        super().resizeEvent(event)
+
+    def changeEvent(self, event):
+        if event.type() in (QEvent.Type.PaletteChange, QEvent.Type.StyleChange, QEvent.Type.FontChange):
+            self._invalidate_background()
+            self.update()
+        super().changeEvent(event)
 
     def mousePressEvent(self, event):
-        self.last_pos = event.pos()
-        self.press_pos = event.pos()
-        self.press_time = time.time()
-        self.direction_start_time = time.time()
-        self.is_dragging = False
-        self.long_press_triggered = False
-        self.repeat_key = None
-        self.repeat_timer.stop()
-        self.long_press_timer.start(self.long_press_timeout)
+        if self.pointer_mode:
+            self._emit_pointer("down", event.pos())
+            return
+        self._feed("press", event)
 
     def mouseMoveEvent(self, event):
-        if not self.last_pos:
+        if self.pointer_mode:
+            self._emit_pointer("move", event.pos())
             return
-            
-        current_pos = event.pos()
-        delta_total = current_pos - self.press_pos
-        delta_instant = current_pos - self.last_pos
-        dist_total = delta_total.manhattanLength()
-        
-        if dist_total > 15:
-            self.is_dragging = True
-            self.long_press_timer.stop()
-            
-            # 1. Determine direction based on TOTAL delta from press_pos
-            new_key = None
-            if abs(delta_total.x()) > abs(delta_total.y()):
-                if abs(delta_total.x()) > self.swipe_threshold:
-                    new_key = "DPAD_RIGHT" if delta_total.x() > 0 else "DPAD_LEFT"
-            else:
-                if abs(delta_total.y()) > self.swipe_threshold:
-                    new_key = "DPAD_DOWN" if delta_total.y() > 0 else "DPAD_UP"
-            
-            # 2. Check for REVERSAL based on INSTANT movement
-            # If the user moves significantly in the opposite direction, we flip even if total delta is still original
-            if self.repeat_key and self.repeat_key != "CLICK":
-                reversal = False
-                if self.repeat_key == "DPAD_RIGHT" and delta_instant.x() < -10: reversal = True
-                if self.repeat_key == "DPAD_LEFT" and delta_instant.x() > 10: reversal = True
-                if self.repeat_key == "DPAD_UP" and delta_instant.y() > 10: reversal = True
-                if self.repeat_key == "DPAD_DOWN" and delta_instant.y() < -10: reversal = True
-                
-                if reversal:
-                    # Determine new direction from the instant push
-                    if abs(delta_instant.x()) > abs(delta_instant.y()):
-                        new_key = "DPAD_RIGHT" if delta_instant.x() > 0 else "DPAD_LEFT"
-                    else:
-                        new_key = "DPAD_DOWN" if delta_instant.y() > 0 else "DPAD_UP"
-            
-            if new_key:
-                # If direction flipped while holding, update it and reset acceleration
-                if new_key != self.repeat_key and self.repeat_key != "CLICK":
-                    self.repeat_key = new_key
-                    # Move the press_pos to current pos to reset distance-based physics
-                    self.press_pos = current_pos 
-                    self.direction_start_time = time.time() # RESET TIME ACCELERATION
-                    self.swipeSignal.emit(new_key)
-                    
-                # Ensure timer is running at baseline
-                if not self.repeat_timer.isActive():
-                    self.repeat_timer.start(250)
-        
-        self.last_pos = current_pos
+        self._feed("move", event)
 
     def mouseReleaseEvent(self, event):
-        self.long_press_timer.stop()
-        had_repeat = self.repeat_timer.isActive() or self.repeat_key is not None
-        self.repeat_timer.stop()
-        
-        if self.long_press_triggered or had_repeat:
-            self.repeat_key = None
+        if self.pointer_mode:
+            self._emit_pointer("up", event.pos())
             return
-
-        release_time = time.time()
-        release_pos = event.pos()
-        
-        delta_x = release_pos.x() - self.press_pos.x()
-        delta_y = release_pos.y() - self.press_pos.y()
-        
-        duration = release_time - self.press_time
-        
-        if duration < self.tap_timeout and abs(delta_x) < 10 and abs(delta_y) < 10:
-            if event.button() == Qt.MouseButton.LeftButton:
-                self.clickSignal.emit()
-            elif event.button() == Qt.MouseButton.RightButton:
-                self.backSignal.emit()
-            return
-            
-        # Fallback for quick flicks (Physics: rate = fast)
-        if abs(delta_x) > abs(delta_y):
-            if abs(delta_x) > self.swipe_threshold:
-                self.swipeSignal.emit("DPAD_RIGHT" if delta_x > 0 else "DPAD_LEFT")
-        else:
-            if abs(delta_y) > self.swipe_threshold:
-                self.swipeSignal.emit("DPAD_DOWN" if delta_y > 0 else "DPAD_UP")
-        
-        self.last_pos = None
-        self.repeat_key = None
-
+        self._feed("release", event)
@@ -9,19 +9,30 @@ import qasync
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                             QHBoxLayout, QPushButton, QLabel, QListWidget, 
                             QMessageBox, QInputDialog, QLineEdit, QGroupBox,
-                            QTabWidget, QCheckBox, QStatusBar, QScrollArea, QFrame, QScroller)
+                            QTabWidget, QCheckBox, QStatusBar, QScrollArea, QFrame, QScroller,
+                            QComboBox)
 from PyQt6.QtCore import Qt, QTimer, pyqtSlot, pyqtSignal, QPoint
 from PyQt6.QtGui import QIcon, QFont, QKeyEvent, QColor, QBrush, QLinearGradient
 
 from config import cfg
 from android_tv_controller import AndroidTVController
 from device_discovery import DeviceDiscovery
+from device_registry import DeviceRegistry
 from adb_controller import ADBController
-from scrcpy_manager import ScrcpyManager
+from scrcpy_manager import MirrorSupervisor
 from touchpad_widget import TouchpadWidget
+from screen_capture import CapturePipeline
+from screen_preview import ScreenPreviewWidget
+from log_view import LogViewWidget
+from scrcpy_profiles import PROFILES as MIRROR_PROFILES
 
 logger = logging.getLogger(__name__)
 
+# scrcpy can print the same ERROR many times a second; warn at most this often
+MIRROR_WARNING_INTERVAL = 10.0
+# Arrowing through the device list should not probe every TV on the way
+PREWARM_DELAY_MS = 1000
+
 class LongPressButton(QPushButton):
     """Button that distinguishes between short clicks and long presses."""
     longPressed = pyqtSignal()
@@ -67,6 +78,8 @@ class AndroidTVRemoteApp(QMainWindow):
     # Signals for thread-safe UI updates from discovery thread
     device_found_sig = pyqtSignal(dict)
     device_lost_sig = pyqtSignal(dict)
+    mirror_event_sig = pyqtSignal(dict)
+    config_changed_sig = pyqtSignal(str, object)
 
     def __init__(self):
         super().__init__()
@@ -78,12 +91,24 @@ class AndroidTVRemoteApp(QMainWindow):
         # Controllers
         self.tv_controller = AndroidTVController()
         self.adb_controller = ADBController()
-        self.scrcpy_manager = ScrcpyManager()
-        self.discovery = DeviceDiscovery(self.on_device_found, self.on_device_lost)
+        self.mirror_supervisor = MirrorSupervisor(self.adb_controller)
+        self.device_registry = DeviceRegistry()
+        self.discovery = DeviceDiscovery(self.on_device_found, self.on_device_lost,
+                                         registry=self.device_registry)
 
         # Connect Signals
         self.device_found_sig.connect(self._add_device_sub)
         self.device_lost_sig.connect(self._remove_device_sub)
+        self.mirror_event_sig.connect(self._handle_mirror_event)
+        self.mirror_supervisor.add_listener(self.mirror_event_sig.emit)
+        self.config_changed_sig.connect(self._apply_config_change)
+        cfg.subscribe(self.config_changed_sig.emit, ["screen_mirroring", "paired_devices"])
+
+        self.capture_pipeline: Optional[CapturePipeline] = None
+        self.preview_widget: Optional[ScreenPreviewWidget] = None
+        self.pointer_injector = None
+        self._mirror_warned_at = 0.0
+        self._mirror_warnings_suppressed = 0
 
         # Keyboard State
         self._last_text = ""
@@ -116,7 +141,7 @@ class AndroidTVRemoteApp(QMainWindow):
             self.update_status("Scanning for devices...")
 
     def setup_ui(self):
-        # Tabs: Remote | Devices | Settings
+        # Tabs: Devices | Remote | Settings | Logs
         self.tabs = QTabWidget()
         self.main_layout.addWidget(self.tabs)
         
@@ -126,6 +151,10 @@ class AndroidTVRemoteApp(QMainWindow):
         
         self.device_list_widget = QListWidget()
         self.device_list_widget.itemDoubleClicked.connect(self.connect_to_selected_device)
+        self.prewarm_timer = QTimer(self)
+        self.prewarm_timer.setSingleShot(True)
+        self.prewarm_timer.timeout.connect(self._prewarm_now)
+        self.device_list_widget.currentItemChanged.connect(self._prewarm_selected_device)
         
         dev_list_header = QHBoxLayout()
         dev_list_header.addWidget(QLabel("Available Devices:"))
@@ -324,6 +353,8 @@ class AndroidTVRemoteApp(QMainWindow):
         self.touchpad.clickSignal.connect(lambda: self.tv_controller.send_key("DPAD_CENTER"))
         self.touchpad.longClickSignal.connect(lambda: self.tv_controller.send_key("SETTINGS"))
         self.touchpad.backSignal.connect(lambda: self.tv_controller.send_key("BACK"))
+        self.touchpad.pointerSignal.connect(self._forward_pointer)
+        self.touchpad.set_trace_dir(cfg.get("input", {}).get("trace_dir"))
         touch_layout.addWidget(self.touchpad)
         
         main_remote_layout.addWidget(touch_group)
@@ -378,15 +409,33 @@ class AndroidTVRemoteApp(QMainWindow):
         self.chk_mirror.stateChanged.connect(self.toggle_mirroring)
         adv_layout.addWidget(self.chk_mirror)
         
+        profile_row = QHBoxLayout()
+        profile_row.addWidget(QLabel("Mirroring Profile:"))
+        self.cmb_mirror_profile = QComboBox()
+        self.cmb_mirror_profile.addItems(list(MIRROR_PROFILES))
+        self.cmb_mirror_profile.setCurrentText(cfg.get("screen_mirroring").get("profile", "balanced"))
+        self.cmb_mirror_profile.currentTextChanged.connect(self.change_mirror_profile)
+        profile_row.addWidget(self.cmb_mirror_profile)
+        adv_layout.addLayout(profile_row)
+        
         self.chk_adb_keyboard = QCheckBox("Use ADB for Keyboard (More Reliable)")
         self.chk_adb_keyboard.setToolTip("Uses ADB 'input text' commands. Guaranteed stability but requires ADB.")
         adv_layout.addWidget(self.chk_adb_keyboard)
         
+        self.chk_pointer = QCheckBox("Touchpad Pointer Mode (Requires ADB)")
+        self.chk_pointer.setToolTip("Sends touch/drag events for browsers and apps that need pointer input.")
+        self.chk_pointer.stateChanged.connect(self.toggle_pointer_mode)
+        adv_layout.addWidget(self.chk_pointer)
+        
         btn_screenshot_settings = QPushButton("Capture TV Screenshot")
         btn_screenshot_settings.clicked.connect(self.take_screenshot_action)
         btn_screenshot_settings.setProperty("class", "accent")
         adv_layout.addWidget(btn_screenshot_settings)
         
+        self.btn_timelapse = QPushButton("Start Timelapse Capture")
+        self.btn_timelapse.clicked.connect(self.toggle_timelapse_action)
+        adv_layout.addWidget(self.btn_timelapse)
+        
         sets_layout.addWidget(adv_group)
         
         # Troubleshooting
@@ -402,6 +451,11 @@ class AndroidTVRemoteApp(QMainWindow):
         sets_layout.addStretch()
         self.tabs.addTab(self.settings_tab, "Settings")
 
+        # -- LOGS TAB --
+        self.log_view = LogViewWidget()
+        self.log_view.startRequested.connect(self.start_logcat_action)
+        self.tabs.addTab(self.log_view, "Logs")
+
     def setup_callbacks(self):
         self.tv_controller.on_connect_callback = self.handle_connected
         self.tv_controller.on_disconnect_callback = self.handle_disconnected
@@ -429,6 +483,8 @@ class AndroidTVRemoteApp(QMainWindow):
     def _add_device_sub(self, device_info):
         ip = device_info['ip']
         port = device_info.get('port')
+        # Keeps pairing attached to the TV when DHCP hands it a new address
+        self.tv_controller.paired.observe(device_info.get('identity'), device_info.get('addresses', [ip]))
         
         # Determine status
         is_connected = self.tv_controller.is_connected and self.tv_controller.ip_address == ip
@@ -437,6 +493,9 @@ class AndroidTVRemoteApp(QMainWindow):
         status_text = "Discovered"
         color = QColor("#888888") # Gray
         
+        if device_info.get("cached"):
+            status_text = "Seen before"
+            color = QColor("#555555") # Dim gray until confirmed
         if is_connected:
             status_text = "Connected"
             color = QColor("#4CAF50") # Bright Green
@@ -464,7 +523,7 @@ class AndroidTVRemoteApp(QMainWindow):
             logger.info(f"Added device to UI: {display_text}")
         else:
             # Update existing item with better info/status if found
-            if port == 6466 or is_connected or is_paired:
+            if port == 6466 or is_connected or is_paired or not device_info.get("cached"):
                 existing_item.setText(display_text)
                 existing_item.setForeground(QBrush(color))
                 logger.info(f"Updated existing device info: {display_text}")
@@ -477,13 +536,17 @@ class AndroidTVRemoteApp(QMainWindow):
 
     def refresh_discovery(self):
         self.update_status("Refreshing discovery...")
-        self.device_list_widget.clear()
-        self.discovery.stop_discovery()
-        self.discovery = DeviceDiscovery(self.on_device_found, self.on_device_lost)
-        self.discovery.start_discovery()
+        self.discovery.refresh()
 
-    def on_device_lost(self, device_info):
-        pass # Remove if needed
+    def _prewarm_selected_device(self, current, previous=None):
+        """Warm ADB and mirroring caches once the selection settles on a device."""
+        self.prewarm_timer.start(PREWARM_DELAY_MS)
+
+    def _prewarm_now(self):
+        item = self.device_list_widget.currentItem()
+        ip = item.data(Qt.ItemDataRole.UserRole) if item else None
+        if ip:
+            self.mirror_supervisor.prewarm(ip)
 
     # -- Connection Logic --
     @qasync.asyncSlot()
@@ -677,20 +740,25 @@ class AndroidTVRemoteApp(QMainWindow):
             self.update_status(f"Pairing failed: {e}")
             self.show_error_message("Pairing Error", str(e))
 
+    async def _ensure_adb(self, purpose: str) -> bool:
+        """Connect ADB to the current TV if needed."""
+        if self.adb_controller.connected_device_ip:
+            return True
+        # Try to connect ADB if not connected
+        ip = self.tv_controller.ip_address
+        if not ip:
+            self.show_warning_message("Not Connected", "Please connect to a TV first.")
+            return False
+        self.update_status(f"Connecting ADB for {purpose}...")
+        if not await self.adb_controller.async_connect(ip):
+            self.show_error_message("ADB Error", "Failed to connect to TV via ADB. Is ADB debugging enabled?")
+            return False
+        return True
+
     @qasync.asyncSlot()
     async def take_screenshot_action(self):
-        if not self.adb_controller.connected_device_ip:
-            # Try to connect ADB if not connected
-            ip = self.tv_controller.ip_address
-            if ip:
-                self.update_status("Connecting ADB for screenshot...")
-                success = self.adb_controller.connect(ip)
-                if not success:
-                    self.show_error_message("ADB Error", "Failed to connect to TV via ADB. Is ADB debugging enabled?")
-                    return
-            else:
-                self.show_warning_message("Not Connected", "Please connect to a TV first.")
-                return
+        if not await self._ensure_adb("screenshot"):
+            return
 
         import datetime
         from pathlib import Path
@@ -702,13 +770,100 @@ class AndroidTVRemoteApp(QMainWindow):
         filename = ss_dir / f"screenshot_{timestamp}.png"
         
         self.update_status("Capturing screenshot...")
-        success = self.adb_controller.take_screenshot(str(filename))
+        png = await self.adb_controller.async_take_screenshot(str(filename))
         
-        if success:
+        if png:
             self.show_info_message("Screenshot", f"Saved: {filename.name}")
         else:
             self.show_error_message("Screenshot Error", "Failed to capture screenshot.")
 
+    @qasync.asyncSlot()
+    async def toggle_timelapse_action(self):
+        if self.capture_pipeline:
+            await self._stop_timelapse()
+            return
+
+        if not await self._ensure_adb("timelapse"):
+            return
+
+        capture_cfg = cfg.get("capture", {})
+        stream = await self.adb_controller.async_open_frame_stream(capture_cfg.get("interval", 1.0))
+        if not stream or self.capture_pipeline:
+            return
+
+        import datetime
+        out_dir = f"screenshots/timelapse_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        self.capture_pipeline = CapturePipeline(
+            stream, out_dir,
+            queue_size=capture_cfg.get("queue_size", 8),
+            encoders=capture_cfg.get("encoders", 2)
+        )
+        pipeline = self.capture_pipeline
+        await pipeline.start()
+        self.btn_timelapse.setText("Stop Timelapse Capture")
+        self.update_status(f"Timelapse capturing to {out_dir}")
+        asyncio.create_task(self._watch_timelapse(pipeline))
+
+    async def _watch_timelapse(self, pipeline: CapturePipeline):
+        """Reset the UI when the stream ends on its own (e.g. the device went away)."""
+        await pipeline.wait()
+        if self.capture_pipeline is pipeline:
+            logger.warning("Timelapse stream ended")
+            await self._stop_timelapse()
+
+    async def _stop_timelapse(self):
+        pipeline = self.capture_pipeline
+        self.capture_pipeline = None
+        self.btn_timelapse.setText("Start Timelapse Capture")
+        await pipeline.stop()
+        stats = pipeline.stats()
+        logger.info(f"Timelapse finished: {stats}")
+        self.show_info_message(
+            "Timelapse",
+            f"{stats['written']} frames @ {stats['fps']} fps, "
+            f"{stats['duplicates']} unchanged, {stats['dropped']} dropped"
+        )
+
+    @qasync.asyncSlot()
+    async def start_logcat_action(self):
+        if not await self._ensure_adb("logcat"):
+            return
+        self.log_view.start(self.adb_controller)
+
+    # -- Pointer Mode --
+    @qasync.asyncSlot(int)
+    async def toggle_pointer_mode(self, state):
+        if state != Qt.CheckState.Checked.value:
+            await self._stop_pointer_mode()
+            return
+
+        if not await self._ensure_adb("pointer mode"):
+            self.chk_pointer.setChecked(False)
+            return
+        injector = await self.adb_controller.async_open_pointer_injector()
+        if not injector or not await injector.start():
+            self.show_error_message("Pointer Mode", "Could not start the touch injector on the TV.")
+            self.chk_pointer.setChecked(False)
+            return
+        if not self.chk_pointer.isChecked():
+            await injector.stop()  # Switched off while starting
+            return
+        self.pointer_injector = injector
+        self.touchpad.set_pointer_mode(True)
+        self.update_status("Pointer mode enabled")
+
+    async def _stop_pointer_mode(self):
+        self.touchpad.set_pointer_mode(False)
+        injector = self.pointer_injector
+        self.pointer_injector = None
+        if injector:
+            logger.info(f"Pointer injection stats: {injector.stats()}")
+            await injector.stop()
+
+    def _forward_pointer(self, action, nx, ny):
+        if self.pointer_injector:
+            self.pointer_injector.submit(action, nx, ny)
+
     # -- Mirroring --
     def toggle_mirroring(self, state):
         if not self.tv_controller.is_connected or not self.tv_controller.ip_address:
@@ -721,7 +876,8 @@ class AndroidTVRemoteApp(QMainWindow):
         if state == Qt.CheckState.Checked.value:
             self.start_mirroring()
         else:
-            self.scrcpy_manager.stop_mirroring()
+            self.mirror_supervisor.stop(self.tv_controller.ip_address)
+            self.stop_preview()
 
     def start_mirroring(self):
         ip = self.tv_controller.ip_address
@@ -730,11 +886,81 @@ class AndroidTVRemoteApp(QMainWindow):
             
         success = self.adb_controller.connect(ip)
         if success:
-            self.scrcpy_manager.start_mirroring(ip)
+            if self.mirror_supervisor.is_available() and self.mirror_supervisor.start(ip):
+                return
+            # No scrcpy: fall back to the in-app screencap preview
+            self.show_warning_message("Scrcpy Missing", "scrcpy not found, using low-FPS preview instead.")
+            self.start_preview()
         else:
             self.show_warning_message("ADB Error", "Failed to connect via ADB. Ensure ADB Debugging is enabled on TV.")
             self.chk_mirror.setChecked(False)
 
+    def _handle_mirror_event(self, event):
+        """Mirroring events from scrcpy's output (delivered via signal from reader threads)."""
+        manager = self.mirror_supervisor.manager(event["ip"])
+        if event["ip"] != self.tv_controller.ip_address or not manager:
+            return  # Background session on another device
+        if event["type"] == "error":
+            now = time.monotonic()
+            if now - self._mirror_warned_at < MIRROR_WARNING_INTERVAL:
+                self._mirror_warnings_suppressed += 1
+                return
+            message = event["message"]
+            if self._mirror_warnings_suppressed:
+                message += f" (+{self._mirror_warnings_suppressed} more)"
+            self._mirror_warned_at = now
+            self._mirror_warnings_suppressed = 0
+            self.show_warning_message("Mirroring", message)
+        elif event["type"] == "exit" and not event["expected"]:
+            logger.error(f"scrcpy exited ({event['returncode']}): {manager.log_tail()[-5:]}")
+            if event.get("gave_up"):
+                self.show_error_message("Mirroring", f"scrcpy exited unexpectedly (code {event['returncode']})")
+                self.chk_mirror.setChecked(False)
+            else:
+                self.update_status("Mirroring interrupted, restarting...")
+        elif event["type"] == "orphaned":
+            self.update_status("Mirroring stopped: ADB connection lost")
+            self.chk_mirror.setChecked(False)
+        elif event["type"] == "fps":
+            metrics = manager.metrics()
+            self.update_status(f"Mirroring: {metrics['fps']} fps ({metrics['frames_skipped']} skipped)")
+
+    def _apply_config_change(self, key, value):
+        """Another instance changed the config; refresh only the affected widgets."""
+        if key == "screen_mirroring":
+            self.cmb_mirror_profile.blockSignals(True)
+            self.cmb_mirror_profile.setCurrentText(value.get("profile", "balanced"))
+            self.cmb_mirror_profile.blockSignals(False)
+        elif key == "paired_devices":
+            self._refresh_device_list_ui()
+
+    def change_mirror_profile(self, profile):
+        mirror_cfg = cfg.get("screen_mirroring")
+        mirror_cfg["profile"] = profile
+        cfg.set("screen_mirroring", mirror_cfg)
+        # Apply immediately if mirroring is running
+        ip = self.tv_controller.ip_address
+        if ip and self.mirror_supervisor.is_running(ip):
+            self.mirror_supervisor.stop(ip)
+            self.mirror_supervisor.start(ip, profile)
+
+    @qasync.asyncSlot()
+    async def start_preview(self):
+        stream = await self.adb_controller.async_open_frame_stream(interval=None)
+        if not stream:
+            return
+        if not self.preview_widget:
+            self.preview_widget = ScreenPreviewWidget()
+            self.preview_widget.resize(800, 450)
+        self.preview_widget.show()
+        self.preview_widget.start(stream)
+
+    def stop_preview(self):
+        if self.preview_widget:
+            logger.info(f"Preview stats: {self.preview_widget.stats()}")
+            asyncio.create_task(self.preview_widget.stop())
+            self.preview_widget.hide()
+
     # -- Keyboard --
     def on_realtime_text(self, text):
         if self._ignore_sync:
@@ -860,9 +1086,16 @@ class AndroidTVRemoteApp(QMainWindow):
         super().keyPressEvent(event)
 
     def closeEvent(self, event):
-        self.discovery.stop_discovery()
-        self.scrcpy_manager.stop_mirroring()
+        if self.capture_pipeline:
+            asyncio.create_task(self.capture_pipeline.stop())
+        self.discovery.stop_discovery(close_engine=True)
+        self.mirror_supervisor.stop_all()
+        self.stop_preview()
+        self.log_view.stop()
+        if self.pointer_injector:
+            asyncio.create_task(self._stop_pointer_mode())
         self.adb_controller.close()
+        cfg.flush()
         asyncio.create_task(self.tv_controller.disconnect())
         event.accept()
 
@@ -1024,6 +1257,7 @@ def main():
     loop = qasync.QEventLoop(app)
     asyncio.set_event_loop(loop)
     
+    cfg.watch()  # Pick up changes from the CLI or other running instances
     window = AndroidTVRemoteApp()
     window.show()
     